@@ -0,0 +1,208 @@
+"""
+Non-blocking logging pipeline.
+
+When enabled, the handlers that dictConfig attached to the application loggers are
+moved behind a single bounded in-memory queue. Logging calls only enqueue the record;
+a background listener thread drains the queue into the real sinks (console, file,
+Graylog), so a slow or stalled sink no longer throttles the batch.
+
+Enable it either from log-config.yaml:
+
+    async_logging:
+      enabled: true
+      queue_size: 10000
+      overflow: drop-debug-first
+
+or with the LOG_ASYNC / LOG_ASYNC_QUEUE_SIZE / LOG_ASYNC_OVERFLOW environment
+variables, which take precedence over the file.
+"""
+
+import copy
+import logging
+import logging.handlers
+import os
+import queue
+import threading
+
+OVERFLOW_BLOCK = "block"
+OVERFLOW_DROP_OLDEST = "drop-oldest"
+OVERFLOW_DROP_DEBUG_FIRST = "drop-debug-first"
+OVERFLOW_POLICIES = (OVERFLOW_BLOCK, OVERFLOW_DROP_OLDEST, OVERFLOW_DROP_DEBUG_FIRST)
+
+DEFAULT_QUEUE_SIZE = 10000
+
+CONFIG_KEY = "async_logging"
+
+_TRUE_VALUES = ("1", "true", "yes", "on")
+
+
+def load_async_settings(config_dict):
+    """
+    Resolve the async logging settings.
+
+    Reads the optional `async_logging` section of a logging config dict, then applies
+    the environment variable overrides. Returns a dict with enabled, queue_size and
+    overflow keys.
+    """
+    section = {}
+    if isinstance(config_dict, dict) and isinstance(config_dict.get(CONFIG_KEY), dict):
+        section = config_dict[CONFIG_KEY]
+
+    settings = {
+        "enabled": bool(section.get("enabled", False)),
+        "queue_size": int(section.get("queue_size", DEFAULT_QUEUE_SIZE)),
+        "overflow": section.get("overflow", OVERFLOW_BLOCK),
+    }
+
+    if os.environ.get("LOG_ASYNC"):
+        settings["enabled"] = os.environ["LOG_ASYNC"].strip().lower() in _TRUE_VALUES
+    if os.environ.get("LOG_ASYNC_QUEUE_SIZE"):
+        settings["queue_size"] = int(os.environ["LOG_ASYNC_QUEUE_SIZE"])
+    if os.environ.get("LOG_ASYNC_OVERFLOW"):
+        settings["overflow"] = os.environ["LOG_ASYNC_OVERFLOW"].strip()
+
+    if settings["overflow"] not in OVERFLOW_POLICIES:
+        raise ValueError(
+            f"Unknown async logging overflow policy: {settings['overflow']}"
+        )
+    if settings["queue_size"] <= 0:
+        raise ValueError("Async logging queue_size must be greater than 0")
+
+    return settings
+
+
+class _PipelineQueueHandler(logging.handlers.QueueHandler):
+    """Queue handler standing in for one logger's original handlers."""
+
+    def __init__(self, pipeline, targets):
+        super().__init__(pipeline.queue)
+        self.pipeline = pipeline
+        self.targets = targets
+
+    def prepare(self, record):
+        # Merge args and render the traceback now (the record crosses a thread), but keep
+        # msg free of the traceback so formatters and GELF full_message still work.
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            if not record.exc_text:
+                record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record):
+        self.pipeline.put((self.targets, record))
+
+
+class _PipelineListener(logging.handlers.QueueListener):
+    """Dispatches each queued record to the handlers of the logger that produced it."""
+
+    def handle(self, item):
+        targets, record = item
+        for handler in targets:
+            if record.levelno >= handler.level:
+                handler.handle(record)
+
+    def enqueue_sentinel(self):
+        # Never drop the sentinel, even when the queue is full
+        self.queue.put(self._sentinel)
+
+
+class AsyncLoggingPipeline:
+    """
+    Bounded queue plus background listener shared by the application loggers.
+
+    `queued` counts records accepted into the queue and `dropped` counts records lost
+    to the overflow policy.
+    """
+
+    def __init__(self, queue_size=DEFAULT_QUEUE_SIZE, overflow=OVERFLOW_BLOCK):
+        if overflow not in OVERFLOW_POLICIES:
+            raise ValueError(f"Unknown async logging overflow policy: {overflow}")
+        self.queue = queue.Queue(queue_size)
+        self.overflow = overflow
+        self.queued = 0
+        self.dropped = 0
+        self._counter_lock = threading.Lock()
+        self._listener = None
+        self._installed = []
+
+    def put(self, item):
+        """Enqueue an item, applying the overflow policy when the queue is full."""
+        if self.overflow == OVERFLOW_DROP_OLDEST:
+            while True:
+                try:
+                    self.queue.put_nowait(item)
+                    break
+                except queue.Full:
+                    try:
+                        self.queue.get_nowait()
+                        self._count(dropped=1)
+                    except queue.Empty:
+                        pass
+        elif self.overflow == OVERFLOW_DROP_DEBUG_FIRST:
+            try:
+                self.queue.put_nowait(item)
+            except queue.Full:
+                if item[1].levelno <= logging.DEBUG:
+                    self._count(dropped=1)
+                    return
+                if self._replace_debug_record(item):
+                    self._count(dropped=1)
+                else:
+                    # Nothing left that may be dropped: wait for room
+                    self.queue.put(item)
+        else:
+            self.queue.put(item)
+        self._count(queued=1)
+
+    def _replace_debug_record(self, item):
+        q = self.queue
+        with q.mutex:
+            for index, queued_item in enumerate(q.queue):
+                if queued_item is not None and queued_item[1].levelno <= logging.DEBUG:
+                    del q.queue[index]
+                    q.queue.append(item)
+                    q.not_empty.notify()
+                    return True
+        return False
+
+    def _count(self, queued=0, dropped=0):
+        with self._counter_lock:
+            self.queued += queued
+            self.dropped += dropped
+
+    @property
+    def running(self):
+        return self._listener is not None
+
+    def start(self, logger_names):
+        """Move the handlers of the given loggers behind the queue and start the listener."""
+        if self.running:
+            return
+        for name in logger_names:
+            logger = logging.getLogger(name)
+            targets = tuple(logger.handlers)
+            if not targets:
+                continue
+            queue_handler = _PipelineQueueHandler(self, targets)
+            logger.handlers = [queue_handler]
+            self._installed.append((logger, targets))
+
+        self._listener = _PipelineListener(self.queue, respect_handler_level=False)
+        self._listener.start()
+
+    def stop(self):
+        """
+        Drain the queue, stop the listener and put the original handlers back.
+
+        Returns a dict with the queued and dropped counters.
+        """
+        if self._listener is not None:
+            self._listener.stop()
+            self._listener = None
+        for logger, targets in self._installed:
+            logger.handlers = list(targets)
+        self._installed = []
+        return {"queued": self.queued, "dropped": self.dropped}
@@ -0,0 +1,179 @@
+"""
+Checkpoints of processed work units and a high-water mark per (team, env).
+
+    store = CheckpointStore("checkpoints.db", interval=100)
+    checkpoint = store.checkpoint("acad", "dev")
+    for unit in checkpoint.pending(units):   # skips units done by an earlier run
+        process(unit)
+        checkpoint.mark_done(unit, watermark=unit_time)
+    checkpoint.commit()
+
+The store is a local SQLite database. Completed units are buffered and committed
+every `interval` units (and on commit()/close()), so a run that fails halfway loses
+at most `interval` units of progress and the next run resumes from the last commit.
+
+The watermark is the highest value (timestamp, id, partition...) below which every
+unit is done. In incremental mode the application only fetches records newer than it.
+It only advances while units complete in order without a failure.
+"""
+
+import json
+import sqlite3
+import threading
+import time
+
+DEFAULT_INTERVAL = 100
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS units (
+    team TEXT NOT NULL,
+    env TEXT NOT NULL,
+    unit TEXT NOT NULL,
+    done_at REAL NOT NULL,
+    PRIMARY KEY (team, env, unit)
+);
+CREATE TABLE IF NOT EXISTS watermarks (
+    team TEXT NOT NULL,
+    env TEXT NOT NULL,
+    watermark TEXT NOT NULL,
+    updated_at REAL NOT NULL,
+    PRIMARY KEY (team, env)
+);
+"""
+
+
+def unit_key(unit):
+    """The key a unit is recorded under (its JSON form, so 1 and "1" differ)"""
+    return json.dumps(unit, sort_keys=True, default=str)
+
+
+class Checkpoint:
+    """The checkpoint of one team/env combination"""
+
+    def __init__(self, store, team, env, done, watermark):
+        self.store = store
+        self.team = team
+        self.env = env
+        self.watermark = watermark
+        self._done = done
+        self._pending = []
+        self._pending_watermark = None
+        self._failed = False
+
+    def is_done(self, unit):
+        return unit_key(unit) in self._done
+
+    def pending(self, units):
+        """The units not recorded as done (all of them when the store does not resume)"""
+        if not self.store.resume:
+            return list(units)
+        return [unit for unit in units if not self.is_done(unit)]
+
+    @property
+    def done_count(self):
+        return len(self._done)
+
+    def mark_done(self, unit, watermark=None):
+        """Record a completed unit; commits once `interval` units are buffered"""
+        key = unit_key(unit)
+        self._done.add(key)
+        self._pending.append(key)
+        if watermark is not None and not self._failed:
+            if self.watermark is None or watermark > self.watermark:
+                self.watermark = watermark
+                self._pending_watermark = watermark
+        if len(self._pending) >= self.store.interval:
+            self.commit()
+
+    def mark_failed(self, unit):
+        """Stop advancing the watermark: records before later units are not all done"""
+        self._failed = True
+
+    def commit(self):
+        """Write the buffered units and watermark to the store"""
+        if not self._pending and self._pending_watermark is None:
+            return
+        self.store._commit(self.team, self.env, self._pending, self._pending_watermark)
+        self._pending = []
+        self._pending_watermark = None
+
+
+class CheckpointStore:
+    """
+    SQLite-backed checkpoints, safe to share between tenant threads.
+
+    :param path: database file
+    :param interval: completed units buffered between commits
+    :param resume: skip units recorded as done by earlier runs
+    :param incremental: hand the watermark to the application so it only fetches
+        newer records
+    """
+
+    def __init__(self, path, interval=DEFAULT_INTERVAL, resume=True, incremental=False):
+        self.path = path
+        self.interval = max(1, interval)
+        self.resume = resume
+        self.incremental = incremental
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        self._connection.executescript(_SCHEMA)
+
+    def checkpoint(self, team, env):
+        """Load the checkpoint of a team/env combination"""
+        with self._lock:
+            done = {
+                row[0]
+                for row in self._connection.execute(
+                    "SELECT unit FROM units WHERE team = ? AND env = ?", (team, env)
+                )
+            }
+            row = self._connection.execute(
+                "SELECT watermark FROM watermarks WHERE team = ? AND env = ?",
+                (team, env),
+            ).fetchone()
+        return Checkpoint(self, team, env, done, json.loads(row[0]) if row else None)
+
+    def reset(self, team, env):
+        """Forget the units and watermark of a team/env combination"""
+        with self._lock, self._connection:
+            self._connection.execute(
+                "DELETE FROM units WHERE team = ? AND env = ?", (team, env)
+            )
+            self._connection.execute(
+                "DELETE FROM watermarks WHERE team = ? AND env = ?", (team, env)
+            )
+
+    def _commit(self, team, env, units, watermark):
+        now = time.time()
+        with self._lock, self._connection:
+            self._connection.executemany(
+                "INSERT OR REPLACE INTO units VALUES (?, ?, ?, ?)",
+                [(team, env, unit, now) for unit in units],
+            )
+            if watermark is not None:
+                self._connection.execute(
+                    "INSERT OR REPLACE INTO watermarks VALUES (?, ?, ?, ?)",
+                    (team, env, json.dumps(watermark, default=str), now),
+                )
+
+    def close(self):
+        with self._lock:
+            self._connection.close()
+
+
+def open_checkpoint_store(
+    path,
+    tenants,
+    interval=DEFAULT_INTERVAL,
+    resume=True,
+    reset=False,
+    incremental=False,
+):
+    """Open the store for a run (None without a path), resetting the tenants if asked"""
+    if not path:
+        return None
+    store = CheckpointStore(path, interval, resume, incremental)
+    if reset:
+        for env, team in tenants:
+            store.reset(team, env)
+    return store
@@ -0,0 +1,526 @@
+"""
+Resident daemon mode.
+
+`test-daemon serve` keeps a warm process listening on a local Unix socket. Imports,
+logging, the property cache and the Athena properties are initialized once.
+`test-daemon submit -- <main options>` forwards its arguments to the daemon, streams
+the job's log lines back and exits with the job's exit code. When no daemon is
+listening, submit runs the job in-process instead (unless --no-fallback).
+
+Wire format, one JSON object per line:
+
+    client -> daemon   {"argv": ["--env", "dev", "--team", "acad"]}
+    daemon -> client   {"log": "...", "level": "INFO"} ... then {"exit": 0}
+
+The socket lives in a directory only the current user can access (by default a
+per-user 0700 directory under the temp dir). The daemon refuses to replace anything
+at its path that is not a socket of the current user, and only accepts connections
+from that user; submit refuses a socket owned by anyone else.
+
+Options that only make sense for a separate process (--profile, --memory-report,
+--startup-report, --shutdown-timeout, --watch-config) are rejected for submitted
+jobs, and --help is sent back to the client.
+
+Jobs run on a bounded thread pool (--max-jobs). Properties are kept for
+--refresh-interval seconds, `--refresh-config` in a submission forces a fetch and
+SIGHUP drops every cached property and reloads the logging config. The daemon exits
+after --idle-timeout seconds without jobs, or on SIGTERM/SIGINT.
+"""
+
+import json
+import logging
+import os
+import signal
+import socket
+import stat
+import struct
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import click
+from click.core import ParameterSource
+
+import main
+from startup import report
+from structured_log import bound, get_logger, new_run_id
+from tracing import tracer
+
+DEFAULT_MAX_JOBS = 4
+DEFAULT_IDLE_TIMEOUT = 600.0
+DEFAULT_REFRESH_INTERVAL = 300.0
+MAX_REQUEST_BYTES = 64 * 1024
+
+STREAM_FORMAT = "%(asctime)s %(levelname)-8s [%(filename)s %(lineno)d] : %(message)s"
+
+
+# main options a submitted job cannot honour: they act on the daemon process
+DAEMON_UNSUPPORTED_OPTIONS = (
+    "startup_report",
+    "shutdown_timeout",
+    "watch_config",
+    "memory_report",
+    "memory_snapshot",
+    "profile",
+    "profile_output",
+)
+
+
+def default_socket_path():
+    """TEST_DAEMON_SOCKET or a socket in a per-user directory under the temp dir"""
+    return os.environ.get("TEST_DAEMON_SOCKET") or os.path.join(
+        tempfile.gettempdir(), f"test-daemon-{os.getuid()}", "daemon.sock"
+    )
+
+
+def _check_private_dir(directory):
+    """Create the socket's directory 0700 and refuse one others own or can write to"""
+    os.makedirs(directory, mode=0o700, exist_ok=True)
+    st = os.lstat(directory)
+    if not stat.S_ISDIR(st.st_mode) or st.st_uid != os.getuid():
+        raise click.ClickException(f"{directory} is not owned by the current user")
+    if st.st_mode & (stat.S_IWGRP | stat.S_IWOTH):
+        raise click.ClickException(f"{directory} is writable by other users")
+
+
+def _check_own_socket(path):
+    """Raise PermissionError unless path is a socket owned by the current user"""
+    st = os.lstat(path)
+    if not stat.S_ISSOCK(st.st_mode) or st.st_uid != os.getuid():
+        raise PermissionError(f"{path} is not a socket owned by the current user")
+
+
+def _peer_uid(conn):
+    """User id of the process on the other end of a Unix socket (None if unknown)"""
+    if not hasattr(socket, "SO_PEERCRED"):
+        return None
+    creds = conn.getsockopt(
+        socket.SOL_SOCKET, socket.SO_PEERCRED, struct.calcsize("3i")
+    )
+    return struct.unpack("3i", creds)[2]
+
+
+class _JobStreamHandler(logging.Handler):
+    """Forwards the records of one job (matched on its bound job_id) to the client"""
+
+    def __init__(self, job_id, send):
+        super().__init__()
+        self.job_id = job_id
+        self.send = send
+        self.setFormatter(logging.Formatter(STREAM_FORMAT))
+
+    def filter(self, record):
+        return getattr(record, "job_id", None) == self.job_id
+
+    def emit(self, record):
+        try:
+            self.send({"log": self.format(record), "level": record.levelname})
+        except OSError:
+            # The client went away; the job still runs to completion
+            pass
+        except Exception:
+            self.handleError(record)
+
+
+class DaemonServer:
+    """Warm process running submitted jobs"""
+
+    def __init__(
+        self,
+        socket_path,
+        max_jobs=DEFAULT_MAX_JOBS,
+        idle_timeout=DEFAULT_IDLE_TIMEOUT,
+        refresh_interval=DEFAULT_REFRESH_INTERVAL,
+    ):
+        self.socket_path = socket_path
+        self.max_jobs = max_jobs
+        self.idle_timeout = idle_timeout
+        self.refresh_interval = refresh_interval
+        self.base_logger = None
+        self._sock = None
+        self._jobs = None
+        self._fetches = None
+        self._properties = {}
+        self._properties_lock = threading.Lock()
+        self._active = 0
+        self._active_lock = threading.Lock()
+        self._last_activity = self._started = time.monotonic()
+        self._stop = threading.Event()
+        self._refresh = threading.Event()
+        self.stats = {"jobs": 0, "failed": 0, "property_fetches": 0}
+
+    def start(self):
+        """Initialize logging and caches and start listening"""
+        self.base_logger = main.configure_logging()
+        main.open_athena_fetcher()
+        main.open_property_cache()
+        main._load_pythena()
+        self._jobs = ThreadPoolExecutor(
+            max_workers=self.max_jobs, thread_name_prefix="daemon-job"
+        )
+        self._fetches = ThreadPoolExecutor(
+            max_workers=self.max_jobs, thread_name_prefix="athena-prefetch"
+        )
+        self._sock = _listen(self.socket_path)
+        self.base_logger.info(
+            "Daemon listening on %s with %d job slots", self.socket_path, self.max_jobs
+        )
+
+    def serve_forever(self):
+        """Accept submissions until stopped or idle for idle_timeout seconds"""
+        self._sock.settimeout(0.5)
+        while not self._stop.is_set():
+            if self._refresh.is_set():
+                self._refresh_if_idle()
+            try:
+                conn, _ = self._sock.accept()
+            except TimeoutError:
+                if self._idle_expired():
+                    self.base_logger.info("Daemon idle, shutting down")
+                    break
+                continue
+            except OSError:
+                break
+            if _peer_uid(conn) not in (None, os.getuid()):
+                self.base_logger.warning(
+                    "Daemon refused a connection from another user"
+                )
+                conn.close()
+                continue
+            with self._active_lock:
+                self._active += 1
+                self._last_activity = time.monotonic()
+            self._jobs.submit(self._handle, conn)
+        self.close()
+
+    def _idle_expired(self):
+        if not self.idle_timeout:
+            return False
+        with self._active_lock:
+            idle = time.monotonic() - self._last_activity
+            return self._active == 0 and idle >= self.idle_timeout
+
+    def stop(self):
+        self._stop.set()
+
+    def refresh(self):
+        """
+        Drop cached properties now and reload the logging config (SIGHUP).
+
+        The logging config is only reloaded once no job is running, since dictConfig
+        replaces the handlers the jobs are logging to.
+        """
+        with self._properties_lock:
+            self._properties.clear()
+        self._refresh.set()
+
+    def _refresh_if_idle(self):
+        with self._active_lock:
+            if self._active:
+                return
+            self._refresh.clear()
+            main.stop_async_logging()
+            self.base_logger = main.configure_logging()
+        self.base_logger.info("Daemon refreshed: properties dropped, logging reloaded")
+
+    def properties(self, env, team, refresh=False):
+        """Properties for a tenant, fetched again after refresh_interval seconds"""
+        key = (env, team)
+        with self._properties_lock:
+            cached = self._properties.get(key)
+        if (
+            cached is not None
+            and not refresh
+            and time.monotonic() - cached[1] < self.refresh_interval
+        ):
+            return cached[0]
+        store = main.fetch_tenant_properties(env, team, refresh)
+        with self._properties_lock:
+            self.stats["property_fetches"] += 1
+            if store is not None:
+                self._properties[key] = (store, time.monotonic())
+        return store
+
+    def _handle(self, conn):
+        send_lock = threading.Lock()
+
+        def send(message):
+            data = (json.dumps(message) + "\n").encode("utf-8")
+            with send_lock:
+                conn.sendall(data)
+
+        exit_code = 1
+        try:
+            with conn:
+                request = json.loads(_read_line(conn))
+                exit_code = self.run_job(request.get("argv", []), send)
+                send({"exit": exit_code})
+        except (OSError, ValueError) as e:
+            self.base_logger.warning("Daemon submission failed: %s", e)
+        finally:
+            self._job_finished(exit_code)
+
+    def _job_finished(self, exit_code):
+        with self._active_lock:
+            self.stats["jobs"] += 1
+            self.stats["failed"] += exit_code != 0
+            self._active -= 1
+            self._last_activity = time.monotonic()
+            if self._active == 0:
+                # Keep the per-run timing state from growing in a long-lived process
+                tracer.reset()
+                report.phases.clear()
+
+    def run_job(self, argv, send):
+        """Run one submission with main's options and return its exit code"""
+        from checkpoint import open_checkpoint_store
+        from prefetch import PropertyFetch
+        from tenants import expand_tenants
+
+        argv = list(argv)
+        help_names = click.Context(main.main).help_option_names
+        if any(arg in help_names for arg in argv):
+            help_text = main.main.get_help(click.Context(main.main, info_name="test"))
+            for line in help_text.splitlines():
+                send({"log": line, "level": "INFO"})
+            return 0
+        try:
+            ctx = main.main.make_context("test", argv)
+            params = ctx.params
+            for name in DAEMON_UNSUPPORTED_OPTIONS:
+                if ctx.get_parameter_source(name) == ParameterSource.COMMANDLINE:
+                    option = "--" + name.replace("_", "-")
+                    raise click.UsageError(
+                        f"{option} is not supported by the daemon; run the job "
+                        "directly (test ...) instead."
+                    )
+            teams = main.TEAMS if params["all_teams"] else list(params["team"])
+            if not teams:
+                raise click.UsageError("Missing option '--team' (or use --all-teams).")
+        except click.exceptions.Exit as e:
+            return e.exit_code
+        except click.ClickException as e:
+            send({"log": f"Error: {e.format_message()}", "level": "ERROR"})
+            return e.exit_code
+
+        job_id = new_run_id()
+        handler = _JobStreamHandler(job_id, send)
+        app_logger = logging.getLogger("test")
+        app_logger.addHandler(handler)
+        checkpoints = None
+        try:
+            with bound(run_id=job_id, job_id=job_id):
+                tenants = expand_tenants(teams, params["env"])
+                checkpoints = open_checkpoint_store(
+                    params["checkpoint"],
+                    tenants,
+                    params["checkpoint_interval"],
+                    resume=params["resume"],
+                    reset=params["reset_checkpoint"],
+                    incremental=params["incremental"],
+                )
+                fetches = {
+                    (env, team): PropertyFetch(
+                        self._fetches,
+                        lambda env=env, team=team: self.properties(
+                            env, team, params["refresh_config"]
+                        ),
+                    )
+                    for env, team in tenants
+                }
+                if len(tenants) == 1:
+                    env, team = tenants[0]
+                    return main.run_tenant(
+                        self.base_logger,
+                        env,
+                        team,
+                        fetches[tenants[0]],
+                        workers=params["workers"],
+                        checkpoints=checkpoints,
+                        property_refresh=params["property_refresh"],
+                    )
+                return main.run_all_tenants(
+                    self.base_logger,
+                    tenants,
+                    fetches,
+                    params["max_workers"],
+                    params["workers"],
+                    checkpoints,
+                    params["property_refresh"],
+                )
+        except Exception as e:
+            get_logger(self.base_logger).exception("Daemon job failed: %s", e)
+            return 1
+        finally:
+            if checkpoints is not None:
+                checkpoints.close()
+            app_logger.removeHandler(handler)
+
+    def close(self):
+        """Stop accepting, finish running jobs and shut logging down"""
+        from shutdown import shutdown_handlers, unique_handlers
+
+        if self._sock is None:
+            return
+        self._sock.close()
+        self._sock = None
+        if os.path.exists(self.socket_path):
+            os.unlink(self.socket_path)
+        self._jobs.shutdown(wait=True)
+        self._fetches.shutdown(wait=False, cancel_futures=True)
+        main.close_property_cache(self.base_logger)
+        main.close_athena_fetcher(self.base_logger)
+        self.base_logger.info(
+            "Daemon stopped after %d jobs (%d failed, %d property fetches)",
+            self.stats["jobs"],
+            self.stats["failed"],
+            self.stats["property_fetches"],
+        )
+        main.flush_log_filters()
+        async_stats = main.stop_async_logging()
+        handlers = unique_handlers(logging.root, logging.getLogger("test"))
+        shutdown_handlers(handlers)
+        main.close_metrics(handlers, async_stats, time.monotonic() - self._started)
+
+
+def _listen(path):
+    """Bind the Unix socket, replacing a stale one left by a dead daemon"""
+    _check_private_dir(os.path.dirname(os.path.abspath(path)))
+    if os.path.lexists(path):
+        try:
+            _check_own_socket(path)
+        except PermissionError as e:
+            raise click.ClickException(f"Refusing to replace {path}: {e}") from None
+        probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            probe.connect(path)
+        except OSError:
+            os.unlink(path)
+        else:
+            probe.close()
+            raise click.ClickException(f"A daemon is already listening on {path}")
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    old_umask = os.umask(0o177)
+    try:
+        # Only the owner may submit jobs
+        sock.bind(path)
+    finally:
+        os.umask(old_umask)
+    sock.listen()
+    return sock
+
+
+def _read_line(conn):
+    data = b""
+    while not data.endswith(b"\n"):
+        chunk = conn.recv(4096)
+        if not chunk:
+            break
+        data += chunk
+        if len(data) > MAX_REQUEST_BYTES:
+            raise ValueError("Submission too large")
+    return data.decode("utf-8")
+
+
+def submit_job(socket_path, argv, out=None):
+    """
+    Send a submission and stream its log lines to `out`.
+
+    Returns the job's exit code. Raises OSError when no daemon is listening and
+    PermissionError when the socket is not the current user's.
+    """
+    out = out or sys.stdout
+    # Raises FileNotFoundError when there is no daemon, PermissionError when the
+    # socket belongs to someone else
+    _check_own_socket(socket_path)
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        sock.connect(socket_path)
+        sock.sendall((json.dumps({"argv": list(argv)}) + "\n").encode("utf-8"))
+        with sock.makefile("r", encoding="utf-8") as lines:
+            for line in lines:
+                message = json.loads(line)
+                if "exit" in message:
+                    return message["exit"]
+                print(message.get("log", ""), file=out, flush=True)
+    print("Daemon closed the connection before the job finished", file=out)
+    return 1
+
+
+@click.group()
+def cli():
+    """Run jobs in a resident, pre-initialized process."""
+
+
+@cli.command()
+@click.option(
+    "--socket",
+    "socket_path",
+    default=default_socket_path,
+    show_default="TEST_DAEMON_SOCKET or <tmp>/test-daemon-<uid>/daemon.sock",
+    help="Unix socket to listen on.",
+)
+@click.option(
+    "--max-jobs",
+    type=click.IntRange(min=1),
+    default=DEFAULT_MAX_JOBS,
+    show_default=True,
+    help="Maximum number of submissions run concurrently.",
+)
+@click.option(
+    "--idle-timeout",
+    type=click.FloatRange(min=0),
+    default=DEFAULT_IDLE_TIMEOUT,
+    show_default=True,
+    help="Exit after this many seconds without jobs (0 = never).",
+)
+@click.option(
+    "--refresh-interval",
+    type=click.FloatRange(min=0),
+    default=DEFAULT_REFRESH_INTERVAL,
+    show_default=True,
+    help="Seconds Athena properties are reused before being fetched again.",
+)
+def serve(socket_path, max_jobs, idle_timeout, refresh_interval):
+    """Keep a warm process listening for submissions."""
+    server = DaemonServer(socket_path, max_jobs, idle_timeout, refresh_interval)
+    server.start()
+    signal.signal(signal.SIGTERM, lambda signum, frame: server.stop())
+    signal.signal(signal.SIGINT, lambda signum, frame: server.stop())
+    signal.signal(signal.SIGHUP, lambda signum, frame: server.refresh())
+    server.serve_forever()
+
+
+@cli.command(context_settings={"ignore_unknown_options": True})
+@click.option(
+    "--socket",
+    "socket_path",
+    default=default_socket_path,
+    help="Unix socket of the daemon.",
+)
+@click.option(
+    "--fallback/--no-fallback",
+    default=True,
+    show_default=True,
+    help="Run the job in-process when no daemon is listening.",
+)
+@click.argument("argv", nargs=-1, type=click.UNPROCESSED)
+def submit(socket_path, fallback, argv):
+    """Run a job (main's options, after --) on the daemon."""
+    try:
+        exit_code = submit_job(socket_path, argv)
+    except PermissionError as e:
+        raise click.ClickException(f"Refusing to submit: {e}") from None
+    except (FileNotFoundError, ConnectionRefusedError):
+        if not fallback:
+            raise click.ClickException(
+                f"No daemon listening on {socket_path}"
+            ) from None
+        main.main.main(args=list(argv), prog_name="test")
+        return
+    sys.exit(exit_code)
+
+
+if __name__ == "__main__":
+    cli()
@@ -0,0 +1,162 @@
+"""
+Drop-in logging.Formatter with a cached timestamp, a precompiled format and JSON lines.
+
+    formatters:
+      simple:
+        class: fast_formatter.FastFormatter
+        format: "%(asctime)s %(levelname)-8s [%(filename)s %(lineno)d] : %(message)s"
+      json:
+        (): fast_formatter.FastFormatter
+        output: json
+
+Compared with logging.Formatter:
+
+- asctime is rendered with strftime once per second and reused for every record in
+  that second (only the milliseconds change).
+- The %-style format string is compiled once into a function that builds the value
+  tuple straight from the record's attributes, instead of formatting against the
+  record's __dict__.
+- output: json renders one compact JSON object per line: time, level, logger, message,
+  the structured fields (env, team, run_id and logging kwargs) and the exception.
+"""
+
+import json
+import logging
+import re
+import time
+
+OUTPUTS = ("text", "json")
+
+# %(name)<flags><width><.precision><conversion>
+_FIELD = re.compile(r"%\((\w+)\)([#0+ -]*\d*(?:\.\d+)?[diouxXeEfFgGcrsa])")
+
+# LogRecord attributes; the remaining ones are the structured fields
+_RECORD_FIELDS = frozenset(logging.LogRecord("", 0, "", 0, "", None, None).__dict__) | {
+    "message",
+    "asctime",
+}
+
+
+def _compile(fmt, defaults):
+    """Turn a %(name)s format into (positional template, tuple builder, field names)"""
+    fields = []
+
+    def positional(match):
+        fields.append(match.group(1))
+        return "%" + match.group(2)
+
+    template = _FIELD.sub(positional, fmt.replace("%%", "\0")).replace("\0", "%%")
+    values = []
+    for name in fields:
+        if name in ("asctime", "message"):
+            values.append(name)
+        elif name in defaults:
+            values.append(f"getattr(record, {name!r}, defaults[{name!r}])")
+        else:
+            values.append(f"record.{name}")
+    source = (
+        f"def build(record, asctime, message):\n"
+        f"    return ({', '.join(values)}{',' if values else ''})\n"
+    )
+    namespace = {"defaults": defaults}
+    # Safe to exec: the field names were matched as \w+ identifiers
+    exec(source, namespace)
+    return template, namespace["build"], frozenset(fields)
+
+
+class FastFormatter(logging.Formatter):
+    """
+    logging.Formatter for %-style formats, plus a JSON lines output.
+
+    :param output: "text" (fmt) or "json" (one object per record)
+    :param caller: also add file/line/function to JSON output
+    """
+
+    def __init__(
+        self,
+        fmt=None,
+        datefmt=None,
+        style="%",
+        validate=True,
+        *,
+        defaults=None,
+        output="text",
+        caller=False,
+    ):
+        if style != "%":
+            raise ValueError("FastFormatter only supports %-style formats")
+        if output not in OUTPUTS:
+            raise ValueError(f"Unknown formatter output: {output!r}")
+        super().__init__(fmt, datefmt, style, validate, defaults=defaults)
+        self.output = output
+        self._json = output == "json"
+        self.caller = caller
+        self._template, self._build, self.fields = _compile(
+            self._fmt, dict(defaults or {})
+        )
+        self._uses_time = "asctime" in self.fields or output == "json"
+        # (second, rendered strftime text); replaced as a whole, so threads never see
+        # a second paired with another second's text
+        self._time_cache = (None, None)
+        self._encode = json.JSONEncoder(
+            ensure_ascii=False, separators=(",", ":"), default=str
+        ).encode
+
+    def usesTime(self):
+        return self._uses_time
+
+    def formatTime(self, record, datefmt=None):
+        second = int(record.created)
+        cached_second, text = self._time_cache
+        if second != cached_second:
+            text = time.strftime(
+                datefmt or self.default_time_format, self.converter(record.created)
+            )
+            self._time_cache = (second, text)
+        if datefmt:
+            return text
+        return self.default_msec_format % (text, record.msecs)
+
+    def format(self, record):
+        record.message = message = record.getMessage()
+        asctime = None
+        if self._uses_time:
+            # formatTime() inlined for the common case: same second, default datefmt
+            second, text = self._time_cache
+            if int(record.created) == second and not self.datefmt:
+                asctime = self.default_msec_format % (text, record.msecs)
+            else:
+                asctime = self.formatTime(record, self.datefmt)
+            record.asctime = asctime
+        if self._json:
+            return self._format_json(record)
+
+        s = self._template % self._build(record, asctime, message)
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            s = s + "\n" + record.exc_text
+        if record.stack_info:
+            s = s + "\n" + self.formatStack(record.stack_info)
+        return s
+
+    def _format_json(self, record):
+        data = {
+            "time": record.asctime,
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.message,
+        }
+        if self.caller:
+            data["file"] = record.pathname
+            data["line"] = record.lineno
+            data["function"] = record.funcName
+        for key in record.__dict__.keys() - _RECORD_FIELDS:
+            data[key] = record.__dict__[key]
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            data["exception"] = record.exc_text
+        if record.stack_info:
+            data["stack"] = self.formatStack(record.stack_info)
+        return self._encode(data)
@@ -0,0 +1,285 @@
+"""
+Buffered file handler with size/time rotation and background gzip of rotated files.
+
+logging.FileHandler writes (and flushes) every record with its own write syscall.
+This handler appends formatted records to an in-memory block and writes the block
+with one syscall when it reaches `buffer_bytes`, when `flush_interval` seconds have
+passed (on a background thread), or at once for records at `flush_level` (ERROR by
+default) and above, so an error is on disk before the job goes on to fail.
+
+The file rotates when it would grow past `max_bytes` and/or at the `when`/`interval`
+boundary (the TimedRotatingFileHandler units: S, M, H, D or midnight). Rotating only
+renames the file to `<filename>.<timestamp>`; a compressor thread gzips the rotated
+file and prunes the oldest beyond `backup_count`, so logging never waits on gzip.
+
+Drop-in replacement for logging.FileHandler in log-config.yaml:
+
+    logfile:
+      class: file_sink.BufferedRotatingFileHandler
+      filename: test.log
+      max_bytes: 52428800
+      when: midnight
+      backup_count: 14
+"""
+
+import contextlib
+import glob
+import gzip
+import logging
+import os
+import queue
+import shutil
+import threading
+import time
+
+DEFAULT_BUFFER_BYTES = 64 * 1024
+TIMESTAMP_FORMAT = "%Y%m%d-%H%M%S"
+
+# Seconds per TimedRotatingFileHandler `when` unit
+_WHEN_SECONDS = {"S": 1, "M": 60, "H": 3600, "D": 86400, "MIDNIGHT": 86400}
+
+
+def _next_midnight(now):
+    t = time.localtime(now)
+    return time.mktime((t.tm_year, t.tm_mon, t.tm_mday + 1, 0, 0, 0, 0, 0, -1))
+
+
+class BufferedRotatingFileHandler(logging.Handler):
+    """
+    File handler that writes records in blocks and rotates/compresses the file.
+
+    :param buffer_bytes: buffered bytes that trigger a write
+    :param flush_interval: maximum seconds a record waits in the buffer (0: only the
+        size threshold, flush_level and flush() write)
+    :param flush_level: records at this level or above are written immediately
+    :param max_bytes: rotate before the file grows past this size (0: never)
+    :param when: time rotation unit, S, M, H, D or midnight (None: never)
+    :param interval: number of `when` units between time rotations
+    :param backup_count: rotated files kept (0: keep all)
+    :param compress: gzip rotated files on the compressor thread
+    :param close_timeout: seconds close() waits for pending compressions
+    """
+
+    def __init__(
+        self,
+        filename,
+        mode="a",
+        encoding="utf-8",
+        buffer_bytes=DEFAULT_BUFFER_BYTES,
+        flush_interval=1.0,
+        flush_level=logging.ERROR,
+        max_bytes=0,
+        when=None,
+        interval=1,
+        backup_count=7,
+        compress=True,
+        close_timeout=10.0,
+    ):
+        super().__init__()
+        self.baseFilename = os.path.abspath(os.fspath(filename))
+        self.mode = mode
+        self.encoding = encoding
+        self.buffer_bytes = int(buffer_bytes)
+        self.flush_interval = float(flush_interval)
+        self.flush_level = logging._checkLevel(flush_level)
+        self.max_bytes = int(max_bytes)
+        self.when = when.upper() if when else None
+        if self.when is not None and self.when not in _WHEN_SECONDS:
+            raise ValueError(f"Invalid rotation interval: {when!r}")
+        self.interval = int(interval)
+        self.backup_count = int(backup_count)
+        self.compress = compress
+        self.close_timeout = close_timeout
+        self.stats = {"writes": 0, "bytes": 0, "rotations": 0, "compressed": 0}
+
+        # The handler lock (held by handle() around emit) also guards the buffer,
+        # the stream and rotation
+        self._buffer = []
+        self._buffer_bytes = 0
+        self._stream = self._open()
+        self._size = self._stream.tell()
+        # From the existing file's age, as TimedRotatingFileHandler does: a short job
+        # started every day would otherwise never reach the boundary it computed
+        self._rollover_at = self._compute_rollover(
+            os.fstat(self._stream.fileno()).st_mtime
+        )
+        # (timestamp, counter) of the last rotated name, so names keep increasing even
+        # after the compressor pruned the file that used a name before
+        self._last_rotated = None
+        self._closed = False
+        self._stop = threading.Event()
+
+        self._compress_queue = queue.Queue()
+        self._compressor = threading.Thread(
+            target=self._compress_loop, name="log-file-compressor", daemon=True
+        )
+        self._compressor.start()
+        self._flusher = None
+        if self.flush_interval > 0:
+            self._flusher = threading.Thread(
+                target=self._flush_loop, name="log-file-flusher", daemon=True
+            )
+            self._flusher.start()
+
+    def _open(self):
+        # Unbuffered binary: the block built in emit() is the buffer
+        return open(self.baseFilename, self.mode + "b", buffering=0)
+
+    def _compute_rollover(self, now):
+        if self.when is None:
+            return None
+        if self.when == "MIDNIGHT":
+            rollover = _next_midnight(now)
+            return rollover + (self.interval - 1) * _WHEN_SECONDS["D"]
+        return now + self.interval * _WHEN_SECONDS[self.when]
+
+    def emit(self, record):
+        try:
+            data = (self.format(record) + "\n").encode(self.encoding)
+        except Exception:
+            self.handleError(record)
+            return
+        with self.lock:
+            self._buffer.append(data)
+            self._buffer_bytes += len(data)
+            if (
+                self._buffer_bytes >= self.buffer_bytes
+                or record.levelno >= self.flush_level
+            ):
+                try:
+                    self.flush()
+                except Exception:
+                    self.handleError(record)
+
+    def flush(self):
+        """Write what is buffered (rotating first when due)"""
+        with self.lock:
+            if self._stream is None or not (self._buffer or self._rollover_at):
+                return
+            block = b"".join(self._buffer)
+            self._buffer = []
+            self._buffer_bytes = 0
+            if self._rotation_due(len(block)):
+                self._rotate()
+            if block:
+                self._stream.write(block)
+                self._size += len(block)
+                self.stats["writes"] += 1
+                self.stats["bytes"] += len(block)
+
+    def pending_records(self):
+        """Records buffered but not yet written"""
+        return len(self._buffer)
+
+    def _flush_loop(self):
+        while not self._stop.wait(self.flush_interval):
+            try:
+                self.flush()
+            except Exception:
+                # Reported by the next emit/flush that hits the same error
+                pass
+
+    def _rotation_due(self, incoming):
+        if self.max_bytes and self._size and self._size + incoming > self.max_bytes:
+            return True
+        return self._rollover_at is not None and time.time() >= self._rollover_at
+
+    def _rotated_name(self, now):
+        stamp = time.strftime(TIMESTAMP_FORMAT, time.localtime(now))
+        name = f"{self.baseFilename}.{stamp}"
+        n = 0
+        if self._last_rotated is not None and self._last_rotated[0] == stamp:
+            n = self._last_rotated[1] + 1
+        while True:
+            candidate = f"{name}.{n}" if n else name
+            if not (os.path.exists(candidate) or os.path.exists(candidate + ".gz")):
+                break
+            n += 1
+        self._last_rotated = (stamp, n)
+        return candidate
+
+    def _rotate(self):
+        now = time.time()
+        self._stream.close()
+        if self._size:
+            rotated = self._rotated_name(now)
+            os.replace(self.baseFilename, rotated)
+            self._compress_queue.put(rotated)
+            self.stats["rotations"] += 1
+        self._stream = open(self.baseFilename, "wb", buffering=0)
+        self._size = 0
+        if self._rollover_at is not None:
+            self._rollover_at = self._compute_rollover(now)
+
+    def _compress_loop(self):
+        while True:
+            path = self._compress_queue.get()
+            try:
+                if path is None:
+                    return
+                if self.compress:
+                    self._gzip(path)
+                self._prune()
+            except OSError:
+                # The rotated file stays uncompressed; logging must not fail for it
+                pass
+            finally:
+                self._compress_queue.task_done()
+
+    def _gzip(self, path):
+        tmp = path + ".gz.tmp"
+        with open(path, "rb") as src, gzip.open(tmp, "wb", compresslevel=6) as dst:
+            shutil.copyfileobj(src, dst, 1024 * 1024)
+        os.replace(tmp, path + ".gz")
+        os.remove(path)
+        self.stats["compressed"] += 1
+
+    def rotated_files(self):
+        """Rotated files, oldest first"""
+        pattern = glob.escape(self.baseFilename) + ".[0-9]*"
+        return sorted(
+            (p for p in glob.glob(pattern) if not p.endswith(".tmp")),
+            key=self._rotation_order,
+        )
+
+    def _rotation_order(self, path):
+        # <filename>.<timestamp>[.<n>][.gz]: by timestamp, then collision counter
+        name = path[len(self.baseFilename) + 1 :].removesuffix(".gz")
+        stamp, _, n = name.partition(".")
+        return stamp, int(n) if n.isdigit() else 0
+
+    def _prune(self):
+        if self.backup_count <= 0:
+            return
+        rotated = self.rotated_files()
+        for path in rotated[: max(0, len(rotated) - self.backup_count)]:
+            with contextlib.suppress(FileNotFoundError):
+                os.remove(path)
+
+    def wait_for_compression(self, timeout=None):
+        """Wait until the rotated files queued so far are compressed and pruned"""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while self._compress_queue.unfinished_tasks:
+            if deadline is not None and time.monotonic() > deadline:
+                return False
+            time.sleep(0.01)
+        return True
+
+    def close(self):
+        with self.lock:
+            if self._closed:
+                return
+            self._closed = True
+        self._stop.set()
+        if self._flusher is not None:
+            self._flusher.join()
+        try:
+            self.flush()
+        finally:
+            with self.lock:
+                if self._stream is not None:
+                    self._stream.close()
+                    self._stream = None
+            self._compress_queue.put(None)
+            self._compressor.join(self.close_timeout)
+            super().close()
@@ -0,0 +1,361 @@
+"""
+GELF TCP handler that spools to disk while Graylog is unreachable.
+
+Records are sent straight to Graylog while a connection is up. The first record
+opens the connection (waiting at most connect_timeout). When that connect or a later
+send fails (or times out), the record is appended to a local append-only segment file
+instead and every following record goes to the spool too, so ordering is kept. From
+then on a background drainer owns reconnecting and replays the spool in large batches
+once Graylog answers, so logging calls do not wait on a connect during an outage.
+Segments left behind by a previous run are picked up and replayed by the next one.
+
+The spool is capped at max_spool_bytes: during a long outage the oldest segments are
+dropped (and counted in stats["dropped"]) rather than filling the disk.
+
+Drop-in replacement for pygelf.GelfTcpHandler in log-config.yaml:
+
+    gelf:
+      class: gelf_spool.SpoolingGelfTcpHandler
+      host: vulogs.app.vanderbilt.edu
+      port: 4545
+      spool_dir: /ext-vol/gelf-spool     # default: GELF_SPOOL_DIR or default_spool_dir()
+      max_spool_bytes: 268435456
+"""
+
+import os
+import tempfile
+import threading
+import time
+
+from pygelf import GelfTcpHandler
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - not available on Windows
+    fcntl = None
+
+DEFAULT_MAX_SPOOL_BYTES = 256 * 1024 * 1024
+SEGMENT_SUFFIX = ".seg"
+OFFSET_SUFFIX = ".offset"
+
+
+def default_spool_dir():
+    """GELF_SPOOL_DIR, else a per-user directory in the temp dir (not the cwd)"""
+    configured = os.environ.get("GELF_SPOOL_DIR")
+    if configured:
+        return configured
+    name = "test-gelf-spool"
+    if hasattr(os, "getuid"):
+        name += f"-{os.getuid()}"
+    return os.path.join(tempfile.gettempdir(), name)
+
+
+def _try_lock(f):
+    """Take an exclusive, non-blocking lock on an open file. True if we hold it."""
+    if fcntl is None:
+        return True
+    try:
+        fcntl.flock(f.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+        return True
+    except OSError:
+        return False
+
+
+def _read_offset(path):
+    """Replayed bytes of a segment, committed in its .offset file"""
+    try:
+        with open(path + OFFSET_SUFFIX) as of:
+            return int(of.read().strip() or 0)
+    except FileNotFoundError:
+        return 0
+
+
+def _count_frames(f, offset):
+    f.seek(offset)
+    return sum(chunk.count(b"\x00") for chunk in iter(lambda: f.read(1024 * 1024), b""))
+
+
+class GelfSpool:
+    """
+    Directory of append-only segment files holding null-terminated GELF frames.
+
+    The segment being written is locked so that other processes sharing the spool
+    directory never replay it while it is still growing. With max_bytes, the oldest
+    segments are dropped once the spool grows past it.
+    """
+
+    def __init__(self, directory, segment_max_bytes, max_bytes=0):
+        self.directory = directory
+        self.segment_max_bytes = segment_max_bytes
+        self.max_bytes = max_bytes
+        self.lock = threading.Lock()
+        self.dropped_frames = 0
+        self._active = None
+        self._active_path = None
+        self._active_size = 0
+        # Spooled records are log content: keep a directory we create private
+        os.makedirs(directory, mode=0o700, exist_ok=True)
+        # Segments from a previous run count as pending work
+        self.pending = bool(self._segment_paths())
+        # Upper bound of the bytes on disk (replayed segments are only subtracted
+        # when the cap is checked against the directory)
+        self._spooled_bytes = self._disk_bytes()
+
+    def _segment_paths(self):
+        names = sorted(
+            n for n in os.listdir(self.directory) if n.endswith(SEGMENT_SUFFIX)
+        )
+        return [os.path.join(self.directory, n) for n in names]
+
+    def _disk_bytes(self):
+        total = 0
+        for path in self._segment_paths():
+            try:
+                total += os.path.getsize(path)
+            except OSError:
+                continue
+        return total
+
+    def append(self, frame):
+        """Append a frame. Returns True when the spool went from empty to pending."""
+        with self.lock:
+            if self._active is None:
+                name = f"{time.time_ns():020d}-{os.getpid()}{SEGMENT_SUFFIX}"
+                self._active_path = os.path.join(self.directory, name)
+                self._active = open(self._active_path, "ab")
+                _try_lock(self._active)
+                self._active_size = 0
+            self._active.write(frame)
+            self._active.flush()
+            self._active_size += len(frame)
+            self._spooled_bytes += len(frame)
+            if self._active_size >= self.segment_max_bytes:
+                self._close_active()
+            if self.max_bytes and self._spooled_bytes > self.max_bytes:
+                self._enforce_cap()
+            became_pending = not self.pending
+            self.pending = True
+            return became_pending
+
+    def _enforce_cap(self):
+        # Called with the lock held: drop the oldest segments until under the cap
+        self._spooled_bytes = self._disk_bytes()
+        for path in self._segment_paths():
+            if self._spooled_bytes <= self.max_bytes:
+                break
+            if path == self._active_path:
+                self._close_active()
+            try:
+                size = os.path.getsize(path)
+                with open(path, "rb") as f:
+                    # Being replayed (or written by another process): leave it
+                    if not _try_lock(f):
+                        continue
+                    frames = _count_frames(f, _read_offset(path))
+                    os.unlink(path)
+            except OSError:
+                continue
+            if os.path.exists(path + OFFSET_SUFFIX):
+                os.unlink(path + OFFSET_SUFFIX)
+            self.dropped_frames += frames
+            self._spooled_bytes -= size
+
+    def _close_active(self):
+        if self._active is not None:
+            self._active.close()
+            self._active = None
+            self._active_path = None
+
+    def seal(self):
+        """Close the segment being written and return every segment ready to replay"""
+        with self.lock:
+            self._close_active()
+            return self._segment_paths()
+
+    def finish_if_empty(self):
+        """Clear the pending flag when nothing is left to replay. True if cleared."""
+        with self.lock:
+            if self._active is None and not self._segment_paths():
+                self.pending = False
+            return not self.pending
+
+    def replay(self, path, batch_bytes, send, deadline=None):
+        """
+        Send a sealed segment in batches of whole frames.
+
+        The replayed offset is committed after every batch so a failure or a restart
+        resumes where it left off. The segment is deleted once fully sent. Returns False
+        when the segment is still locked by another writer; raises TimeoutError when the
+        deadline passes.
+        """
+        offset_path = path + OFFSET_SUFFIX
+        with open(path, "rb") as f:
+            if not _try_lock(f):
+                return False
+            offset = _read_offset(path)
+            f.seek(offset)
+            carry = b""
+            while True:
+                if deadline is not None and time.monotonic() > deadline:
+                    raise TimeoutError("Spool replay deadline passed")
+                chunk = f.read(batch_bytes)
+                if not chunk:
+                    break
+                data = carry + chunk
+                cut = data.rfind(b"\x00") + 1
+                if cut == 0:
+                    carry = data
+                    continue
+                send(data[:cut])
+                carry = data[cut:]
+                offset += cut
+                with open(offset_path, "w") as of:
+                    of.write(str(offset))
+
+        os.unlink(path)
+        if os.path.exists(offset_path):
+            os.unlink(offset_path)
+        return True
+
+    def pending_frames(self):
+        """Number of frames still waiting in the spool (reads every segment)"""
+        count = 0
+        for path in self._segment_paths():
+            try:
+                with open(path, "rb") as f:
+                    count += _count_frames(f, _read_offset(path))
+            except (OSError, ValueError):
+                continue
+        return count
+
+    def close(self):
+        with self.lock:
+            self._close_active()
+
+
+class SpoolingGelfTcpHandler(GelfTcpHandler):
+    """
+    pygelf.GelfTcpHandler with a durable disk spool and batched replay.
+
+    :param spool_dir: spool directory, defaults to default_spool_dir()
+    :param connect_timeout: seconds to wait for the TCP connect
+    :param send_timeout: seconds a send may block before the record is spooled instead
+    :param segment_max_bytes: size at which a new segment file is started
+    :param max_spool_bytes: spool size past which the oldest segments are dropped
+        (0: unlimited)
+    :param batch_bytes: amount of spooled data sent per write during replay
+    :param drain_interval: seconds between replay attempts while Graylog is down
+    :param close_timeout: seconds close() spends replaying before leaving the spool for the next run
+    """
+
+    def __init__(
+        self,
+        host,
+        port,
+        spool_dir=None,
+        connect_timeout=1.0,
+        send_timeout=2.0,
+        segment_max_bytes=16 * 1024 * 1024,
+        max_spool_bytes=DEFAULT_MAX_SPOOL_BYTES,
+        batch_bytes=1024 * 1024,
+        drain_interval=5.0,
+        close_timeout=5.0,
+        **kwargs,
+    ):
+        super().__init__(host, port, **kwargs)
+        self.connect_timeout = connect_timeout
+        self.send_timeout = send_timeout
+        self.batch_bytes = batch_bytes
+        self.drain_interval = drain_interval
+        self.close_timeout = close_timeout
+        self.spool = GelfSpool(
+            spool_dir or default_spool_dir(),
+            segment_max_bytes,
+            max_spool_bytes,
+        )
+        self._send_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._closed = False
+        # The first record connects; after that only the drainer does
+        self._connect_attempted = False
+        self._drainer = threading.Thread(
+            target=self._drain_loop, name="gelf-spool-drainer", daemon=True
+        )
+        self._drainer.start()
+        if self.spool.pending:
+            self._wake.set()
+
+    def emit(self, record):
+        try:
+            frame = self.makePickle(record)
+            if not self.spool.pending:
+                try:
+                    # Reconnecting is left to the drainer so callers never wait on it
+                    self._send_now(frame, connect=not self._connect_attempted)
+                    return
+                except OSError:
+                    pass
+            if self.spool.append(frame):
+                self._wake.set()
+        except Exception:
+            self.handleError(record)
+
+    def _send_now(self, data, connect=True):
+        """Send over the persistent connection, raising OSError on any failure"""
+        with self._send_lock:
+            if self.sock is None:
+                if not connect:
+                    raise ConnectionError("Not connected to Graylog")
+                self._connect_attempted = True
+                self.sock = self.makeSocket(timeout=self.connect_timeout)
+                self.sock.settimeout(self.send_timeout)
+            try:
+                self.sock.sendall(data)
+            except OSError:
+                self.sock.close()
+                self.sock = None
+                raise
+
+    def drain(self, deadline=None):
+        """Replay the spool. Returns True when it is empty afterwards."""
+        try:
+            for path in self.spool.seal():
+                # Segments still being written by another process are skipped for now
+                self.spool.replay(path, self.batch_bytes, self._send_now, deadline)
+        except OSError:
+            return False
+        return self.spool.finish_if_empty()
+
+    def _drain_loop(self):
+        while not self._stop.is_set():
+            self._wake.wait(self.drain_interval)
+            self._wake.clear()
+            if self._stop.is_set():
+                break
+            while self.spool.pending and not self._stop.is_set():
+                if not self.drain():
+                    break
+
+    @property
+    def stats(self):
+        return {"dropped": self.spool.dropped_frames}
+
+    def pending_records(self):
+        """Records spooled but not yet replayed to Graylog"""
+        return self.spool.pending_frames() if self.spool.pending else 0
+
+    def close(self):
+        if self._closed:
+            return
+        self._closed = True
+        # One deadline for the drainer and the last replay together
+        deadline = time.monotonic() + self.close_timeout
+        self._stop.set()
+        self._wake.set()
+        self._drainer.join(self.close_timeout)
+        if self.spool.pending and time.monotonic() < deadline:
+            # Last attempt; whatever is left is replayed by the next run
+            self.drain(deadline=deadline)
+        self.spool.close()
+        super().close()
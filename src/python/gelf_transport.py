@@ -0,0 +1,293 @@
+"""
+Batching GELF handler with a persistent TCP connection or chunked, compressed UDP.
+
+pygelf's handlers serialize and send one record per logging call. This handler only
+serializes in the logging call and appends the frame to an in-memory buffer; a sender
+thread ships the buffer when it reaches `batch_bytes` / `batch_records` or every
+`flush_interval` seconds, whichever comes first.
+
+- tcp: every batch is written with a single sendall() on one persistent connection.
+  Graylog does not accept compressed GELF over TCP, so `compress` is rejected there.
+- udp: fire-and-forget datagrams, optionally zlib or gzip compressed and split into
+  GELF chunks of `chunk_size` bytes.
+
+When Graylog cannot be reached the handler reconnects with exponential backoff (with
+jitter) and keeps buffering up to `max_buffer_bytes`, dropping the oldest records
+beyond that. Delivery over TCP is at-least-once: a batch that failed half way is
+sent again in full.
+
+Drop-in replacement for pygelf.GelfTcpHandler in log-config.yaml:
+
+    gelf:
+      class: gelf_transport.BatchingGelfHandler
+      host: vulogs.app.vanderbilt.edu
+      port: 4545
+      protocol: tcp
+      include_extra_fields: true
+      _appName: test
+"""
+
+import gzip
+import logging
+import random
+import socket
+import threading
+import time
+import zlib
+from collections import deque
+
+from pygelf import gelf
+from pygelf.handlers import BaseHandler
+
+PROTOCOLS = ("tcp", "udp")
+COMPRESSIONS = ("zlib", "gzip")
+# Graylog drops messages made of more chunks than this
+MAX_CHUNKS = 128
+
+
+class BatchingGelfHandler(BaseHandler, logging.Handler):
+    """
+    GELF handler that coalesces records into batches sent from a background thread.
+
+    :param protocol: "tcp" (persistent connection) or "udp" (chunked datagrams)
+    :param compress: "zlib", "gzip" or None; UDP only (True means zlib)
+    :param batch_bytes: buffered bytes that trigger a send before flush_interval
+    :param batch_records: buffered records that trigger a send before flush_interval
+    :param flush_interval: maximum seconds a record waits in the buffer
+    :param max_buffer_bytes: buffer bound while Graylog is unreachable (oldest dropped)
+    :param chunk_size: maximum UDP datagram size, should stay below the MTU
+    :param connect_timeout: seconds to wait for the TCP connect
+    :param send_timeout: seconds a TCP send may block
+    :param backoff_initial: first reconnect delay in seconds, doubled on every failure
+    :param backoff_max: upper bound of the reconnect delay
+    :param close_timeout: seconds close() spends sending what is still buffered
+    """
+
+    def __init__(
+        self,
+        host,
+        port,
+        protocol="tcp",
+        compress=None,
+        batch_bytes=64 * 1024,
+        batch_records=1000,
+        flush_interval=0.2,
+        max_buffer_bytes=8 * 1024 * 1024,
+        chunk_size=1300,
+        connect_timeout=1.0,
+        send_timeout=2.0,
+        backoff_initial=0.5,
+        backoff_max=30.0,
+        close_timeout=5.0,
+        **kwargs,
+    ):
+        protocol = str(protocol).lower()
+        if protocol not in PROTOCOLS:
+            raise ValueError(f"Unsupported GELF protocol: {protocol!r}")
+        if compress is True:
+            compress = "zlib"
+        if compress and compress not in COMPRESSIONS:
+            raise ValueError(f"Unsupported GELF compression: {compress!r}")
+        if compress and protocol == "tcp":
+            raise ValueError("Graylog does not accept compressed GELF over TCP")
+
+        logging.Handler.__init__(self)
+        # Frames are compressed here, per protocol, rather than by pygelf
+        BaseHandler.__init__(self, compress=False, **kwargs)
+        self.host = host
+        self.port = int(port)
+        self.protocol = protocol
+        self.compression = compress or None
+        self.batch_bytes = batch_bytes
+        self.batch_records = batch_records
+        self.flush_interval = flush_interval
+        self.max_buffer_bytes = max_buffer_bytes
+        self.chunk_size = chunk_size
+        self.connect_timeout = connect_timeout
+        self.send_timeout = send_timeout
+        self.backoff_initial = backoff_initial
+        self.backoff_max = backoff_max
+        self.close_timeout = close_timeout
+        self.stats = {
+            "sent": 0,
+            "batches": 0,
+            "dropped": 0,
+            "connects": 0,
+            "connect_failures": 0,
+        }
+
+        self._buffer = deque()
+        self._buffer_bytes = 0
+        self._cond = threading.Condition()
+        # Held while a batch is taken and sent so batches go out in order
+        self._send_lock = threading.Lock()
+        self._sock = None
+        self._backoff = backoff_initial
+        self._next_connect = 0.0
+        self._stop = threading.Event()
+        self._closed = False
+        self._sender = threading.Thread(
+            target=self._run, name="gelf-batch-sender", daemon=True
+        )
+        self._sender.start()
+
+    def emit(self, record):
+        try:
+            frame = self.convert_record_to_gelf(record)
+        except Exception:
+            self.handleError(record)
+            return
+        with self._cond:
+            self._buffer.append(frame)
+            self._buffer_bytes += len(frame)
+            self._trim_buffer()
+            if self._batch_ready():
+                self._cond.notify()
+
+    def _batch_ready(self):
+        return (
+            self._buffer_bytes >= self.batch_bytes
+            or len(self._buffer) >= self.batch_records
+        )
+
+    def _trim_buffer(self):
+        while self._buffer_bytes > self.max_buffer_bytes and len(self._buffer) > 1:
+            self._buffer_bytes -= len(self._buffer.popleft())
+            self.stats["dropped"] += 1
+
+    def _take_batch(self):
+        batch = []
+        size = 0
+        with self._cond:
+            while self._buffer and len(batch) < self.batch_records:
+                if batch and size + len(self._buffer[0]) > self.batch_bytes:
+                    break
+                frame = self._buffer.popleft()
+                self._buffer_bytes -= len(frame)
+                size += len(frame)
+                batch.append(frame)
+        return batch
+
+    def _requeue(self, batch):
+        with self._cond:
+            self._buffer.extendleft(reversed(batch))
+            self._buffer_bytes += sum(len(frame) for frame in batch)
+            self._trim_buffer()
+
+    def _run(self):
+        while not self._stop.is_set():
+            with self._cond:
+                if not self._batch_ready():
+                    self._cond.wait(self.flush_interval)
+            if self._stop.is_set():
+                break
+            if not self.send_pending():
+                # Wait out the reconnect backoff; close() interrupts the wait
+                self._stop.wait(max(self.flush_interval, self._backoff_remaining()))
+
+    def send_pending(self, deadline=None, force_connect=False):
+        """Send everything buffered. Returns False when Graylog could not be reached."""
+        while True:
+            if deadline is not None and time.monotonic() > deadline:
+                return False
+            with self._send_lock:
+                batch = self._take_batch()
+                if not batch:
+                    return True
+                if not self._send_batch(batch, force_connect):
+                    self._requeue(batch)
+                    return False
+            force_connect = False
+
+    def _backoff_remaining(self):
+        return max(0.0, self._next_connect - time.monotonic())
+
+    def _connection_failed(self):
+        self.stats["connect_failures"] += 1
+        self._next_connect = time.monotonic() + self._backoff * random.uniform(0.5, 1.0)
+        self._backoff = min(self._backoff * 2, self.backoff_max)
+
+    def _connect(self, force):
+        if self._sock is not None:
+            return True
+        if not force and self._backoff_remaining() > 0:
+            return False
+        try:
+            if self.protocol == "tcp":
+                sock = socket.create_connection(
+                    (self.host, self.port), timeout=self.connect_timeout
+                )
+                sock.settimeout(self.send_timeout)
+            else:
+                # A connected UDP socket resolves the host once instead of per datagram
+                sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+                sock.connect((self.host, self.port))
+        except OSError:
+            self._connection_failed()
+            return False
+        self._sock = sock
+        self._backoff = self.backoff_initial
+        self.stats["connects"] += 1
+        return True
+
+    def _send_batch(self, batch, force_connect=False):
+        if not self._connect(force_connect):
+            return False
+        try:
+            if self.protocol == "tcp":
+                # TCP frames are null terminated
+                self._sock.sendall(b"\x00".join(batch) + b"\x00")
+            else:
+                for frame in batch:
+                    self._send_datagrams(frame)
+        except OSError:
+            self._sock.close()
+            self._sock = None
+            self._connection_failed()
+            return False
+        self.stats["sent"] += len(batch)
+        self.stats["batches"] += 1
+        return True
+
+    def _send_datagrams(self, frame):
+        if self.compression == "zlib":
+            frame = zlib.compress(frame)
+        elif self.compression == "gzip":
+            frame = gzip.compress(frame)
+        if len(frame) <= self.chunk_size:
+            self._sock.send(frame)
+            return
+        if -(-len(frame) // self.chunk_size) > MAX_CHUNKS:
+            self.stats["dropped"] += 1
+            return
+        for chunk in gelf.split(frame, self.chunk_size):
+            self._sock.send(chunk)
+
+    def pending_records(self):
+        """Records buffered but not yet sent"""
+        return len(self._buffer)
+
+    def flush(self):
+        """Send what is buffered, waiting at most send_timeout"""
+        self.send_pending(deadline=time.monotonic() + self.send_timeout)
+
+    def close(self):
+        if self._closed:
+            return
+        self._closed = True
+        self._stop.set()
+        with self._cond:
+            self._cond.notify()
+        self._sender.join(self.close_timeout)
+        # One last attempt regardless of the backoff; what is left is lost
+        self.send_pending(
+            deadline=time.monotonic() + self.close_timeout, force_connect=True
+        )
+        with self._cond:
+            self.stats["dropped"] += len(self._buffer)
+            self._buffer.clear()
+            self._buffer_bytes = 0
+        if self._sock is not None:
+            self._sock.close()
+            self._sock = None
+        logging.Handler.close(self)
@@ -0,0 +1,207 @@
+"""
+Compiled cache of the logging configuration.
+
+Parsing log-config.yaml means importing yaml and running safe_load on every start,
+followed by a walk over the dictConfig schema to validate it. This module keeps the
+parsed and validated dict as JSON in a cache directory so warm starts skip both.
+
+An entry is used as-is while the source file's mtime and size are unchanged. When
+they change, the content hash decides: same bytes (e.g. a touched file) only refresh
+the stored mtime, different bytes mean a full parse and validation. Config dicts (the
+built-in default) are keyed by their content hash, so validation runs only once per
+distinct default.
+
+The cache lives in LOG_CONFIG_CACHE_DIR, or a per-user directory under the system temp
+dir. Cached entries are fed to dictConfig, which can instantiate any "()" factory, so
+the directory is created 0700 and only used while it is owned by the current user and
+not writable by anyone else. Cache problems never stop logging from being configured;
+they only cost a cold load.
+"""
+
+import contextlib
+import hashlib
+import json
+import os
+import stat
+import tempfile
+
+from startup import report
+
+HIT = "hit"
+REVALIDATED = "revalidated"
+MISS = "miss"
+
+_CACHE_VERSION = 1
+
+
+def cache_dir():
+    configured = os.environ.get("LOG_CONFIG_CACHE_DIR")
+    if configured:
+        return configured
+    name = "test-log-config-cache"
+    if hasattr(os, "getuid"):
+        name += f"-{os.getuid()}"
+    return os.path.join(tempfile.gettempdir(), name)
+
+
+def _trusted_cache_dir(create=False):
+    """cache_dir() when it is safe to read and write, else None"""
+    path = cache_dir()
+    try:
+        if create:
+            os.makedirs(path, mode=0o700, exist_ok=True)
+        st = os.lstat(path)
+    except OSError:
+        return None
+    if not stat.S_ISDIR(st.st_mode) or st.st_mode & (stat.S_IWGRP | stat.S_IWOTH):
+        return None
+    if hasattr(os, "getuid") and st.st_uid != os.getuid():
+        return None
+    return path
+
+
+def validate_log_config(config_dict):
+    """
+    Check the parts of the dictConfig schema that would otherwise fail half way
+    through configuring logging. Raises ValueError on the first problem found.
+    """
+    if not isinstance(config_dict, dict):
+        raise ValueError("Logging config must be a mapping")
+    if config_dict.get("version") != 1:
+        raise ValueError("Logging config must have version: 1")
+
+    sections = {}
+    for section in ("formatters", "filters", "handlers", "loggers"):
+        value = config_dict.get(section) or {}
+        if not isinstance(value, dict):
+            raise ValueError(f"Logging config section '{section}' must be a mapping")
+        sections[section] = value
+
+    for name, handler in sections["handlers"].items():
+        if not isinstance(handler, dict) or not ("class" in handler or "()" in handler):
+            raise ValueError(f"Handler '{name}' needs a class")
+        formatter = handler.get("formatter")
+        if formatter is not None and formatter not in sections["formatters"]:
+            raise ValueError(f"Handler '{name}' uses unknown formatter '{formatter}'")
+        _check_refs(
+            f"Handler '{name}'", handler.get("filters"), sections["filters"], "filter"
+        )
+
+    loggers = dict(sections["loggers"])
+    if isinstance(config_dict.get("root"), dict):
+        loggers["root"] = config_dict["root"]
+    for name, logger in loggers.items():
+        if not isinstance(logger, dict):
+            raise ValueError(f"Logger '{name}' must be a mapping")
+        _check_refs(
+            f"Logger '{name}'", logger.get("handlers"), sections["handlers"], "handler"
+        )
+        _check_refs(
+            f"Logger '{name}'", logger.get("filters"), sections["filters"], "filter"
+        )
+
+
+def _check_refs(owner, refs, known, kind):
+    for ref in refs or []:
+        if isinstance(ref, str) and ref not in known:
+            raise ValueError(f"{owner} uses unknown {kind} '{ref}'")
+
+
+def load_log_config(source):
+    """
+    Return (config_dict, status) for a config file path or a config dict.
+
+    status is one of HIT, REVALIDATED or MISS.
+    """
+    if isinstance(source, dict):
+        return _load_dict(source)
+    return _load_file(source)
+
+
+def _entry_path(directory, key):
+    return os.path.join(
+        directory, hashlib.sha256(key.encode("utf-8")).hexdigest() + ".json"
+    )
+
+
+def _read_entry(key):
+    directory = _trusted_cache_dir()
+    if directory is None:
+        return None
+    try:
+        with open(_entry_path(directory, key)) as f:
+            entry = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if not isinstance(entry, dict) or entry.get("cache_version") != _CACHE_VERSION:
+        return None
+    return entry
+
+
+def _write_entry(key, entry):
+    entry["cache_version"] = _CACHE_VERSION
+    directory = _trusted_cache_dir(create=True)
+    if directory is None:
+        return
+    tmp_path = None
+    try:
+        fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+        with os.fdopen(fd, "w") as f:
+            json.dump(entry, f)
+        os.replace(tmp_path, _entry_path(directory, key))
+    except (OSError, TypeError, ValueError):
+        # Not JSON-serializable or not writable: the next start just loads cold again
+        if tmp_path is not None:
+            with contextlib.suppress(OSError):
+                os.unlink(tmp_path)
+
+
+def _load_file(path):
+    abs_path = os.path.abspath(path)
+    stat = os.stat(abs_path)
+    entry = _read_entry(abs_path)
+    if (
+        entry
+        and entry["mtime_ns"] == stat.st_mtime_ns
+        and entry["size"] == stat.st_size
+    ):
+        return entry["config"], HIT
+
+    with open(abs_path, "rb") as f:
+        content = f.read()
+    digest = hashlib.sha256(content).hexdigest()
+    if entry and entry["sha256"] == digest:
+        entry.update(mtime_ns=stat.st_mtime_ns, size=stat.st_size)
+        _write_entry(abs_path, entry)
+        return entry["config"], REVALIDATED
+
+    yaml = report.timed_import("yaml")
+    config_dict = yaml.safe_load(content)
+    validate_log_config(config_dict)
+    _write_entry(
+        abs_path,
+        {
+            "mtime_ns": stat.st_mtime_ns,
+            "size": stat.st_size,
+            "sha256": digest,
+            "config": config_dict,
+        },
+    )
+    return config_dict, MISS
+
+
+def _load_dict(config_dict):
+    try:
+        digest = hashlib.sha256(
+            json.dumps(config_dict, sort_keys=True).encode("utf-8")
+        ).hexdigest()
+    except (TypeError, ValueError):
+        validate_log_config(config_dict)
+        return config_dict, MISS
+
+    key = f"dict:{digest}"
+    if _read_entry(key):
+        return config_dict, HIT
+    validate_log_config(config_dict)
+    _write_entry(key, {"sha256": digest})
+    return config_dict, MISS
@@ -0,0 +1,271 @@
+"""
+Filters that keep a flood of repeated records from swamping the handlers.
+
+Usable from log-config.yaml (attach them to the `test` logger, so summaries reach
+every handler once):
+
+    filters:
+      dedup:
+        (): log_filters.DedupFilter
+        window: 10
+      ratelimit:
+        (): log_filters.RateLimitFilter
+        rate: 5          # records per second per message template
+        burst: 50
+      sample_debug:
+        (): log_filters.SamplingFilter
+        rate: 0.1
+        max_level: INFO
+
+    loggers:
+      test:
+        filters: [dedup, ratelimit]
+
+- DedupFilter drops consecutive identical records (same logger, level and formatted
+  message). When the run of duplicates ends, one "repeated N times in T s" summary is
+  logged.
+- RateLimitFilter is a token bucket per message template (the unformatted msg, so
+  "Bad row %s" is limited whatever the row). When a template that was limited logs
+  again, a "suppressed N records" summary comes first.
+- SamplingFilter keeps a random `rate` share of the records at or below `max_level`.
+
+Records at or above `exempt_level` (ERROR by default) always pass, untouched.
+Summaries still pending when the run ends are logged by flush_summaries(), which
+main() calls before the handlers are closed.
+"""
+
+import abc
+import logging
+import random
+import threading
+import time
+import weakref
+from collections import OrderedDict
+
+DEFAULT_EXEMPT_LEVEL = logging.ERROR
+DEFAULT_MAX_KEYS = 1000
+
+# Summary records carry this attribute so the filters let them through
+SUMMARY_ATTR = "log_filter_summary"
+
+_filters = weakref.WeakSet()
+
+
+def _level(value):
+    if isinstance(value, str):
+        level = logging.getLevelName(value.upper())
+        if not isinstance(level, int):
+            raise ValueError(f"Unknown log level: {value}")
+        return level
+    return int(value)
+
+
+def _summary_record(record, msg, args):
+    summary = logging.makeLogRecord(
+        {
+            "name": record.name,
+            "levelno": record.levelno,
+            "levelname": record.levelname,
+            "pathname": record.pathname,
+            "filename": record.filename,
+            "module": record.module,
+            "lineno": record.lineno,
+            "funcName": record.funcName,
+            "msg": msg,
+            "args": args,
+            SUMMARY_ATTR: True,
+        }
+    )
+    # Keep the structured context (env, team, run_id...) of the summarized records
+    for key, value in record.__dict__.items():
+        if key not in summary.__dict__:
+            setattr(summary, key, value)
+    return summary
+
+
+def _emit(summary):
+    logging.getLogger(summary.name).handle(summary)
+
+
+class _FloodFilter(logging.Filter, abc.ABC):
+    """Common exemption handling and summary bookkeeping"""
+
+    def __init__(self, exempt_level=DEFAULT_EXEMPT_LEVEL):
+        super().__init__()
+        self.exempt_level = _level(exempt_level)
+        self.dropped = 0
+        self._lock = threading.Lock()
+        _filters.add(self)
+
+    def filter(self, record):
+        if record.levelno >= self.exempt_level or getattr(record, SUMMARY_ATTR, False):
+            return True
+        keep, summaries = self._check(record)
+        for summary in summaries:
+            _emit(summary)
+        return keep
+
+    @abc.abstractmethod
+    def _check(self, record):
+        """(keep the record, summary records to log first), under the subclass's rules"""
+
+    def pending_summaries(self):
+        """Summary records for suppressed runs that have not been reported yet"""
+        return []
+
+
+class DedupFilter(_FloodFilter):
+    """
+    Collapses consecutive identical records into the first one plus a summary.
+
+    :param window: seconds after which a repeat is let through again (and the run so
+        far summarized), so a long flood still shows up periodically
+    """
+
+    def __init__(self, window=10.0, exempt_level=DEFAULT_EXEMPT_LEVEL):
+        super().__init__(exempt_level)
+        self.window = float(window)
+        self._last_key = None
+        self._last_record = None
+        self._repeats = 0
+        self._first_seen = 0.0
+
+    def _check(self, record):
+        key = (record.name, record.levelno, record.getMessage())
+        now = time.monotonic()
+        with self._lock:
+            if key == self._last_key and now - self._first_seen < self.window:
+                self._repeats += 1
+                self._last_record = record
+                self.dropped += 1
+                return False, []
+            summaries = self._take_summary(now)
+            self._last_key = key
+            self._last_record = record
+            self._repeats = 0
+            self._first_seen = now
+        return True, summaries
+
+    def _take_summary(self, now):
+        if not self._repeats:
+            return []
+        summary = _summary_record(
+            self._last_record,
+            "%s (repeated %d times in %.1f s)",
+            (self._last_record.getMessage(), self._repeats, now - self._first_seen),
+        )
+        summary.repeated = self._repeats
+        self._repeats = 0
+        return [summary]
+
+    def pending_summaries(self):
+        with self._lock:
+            summaries = self._take_summary(time.monotonic())
+            self._last_key = None
+        return summaries
+
+
+class RateLimitFilter(_FloodFilter):
+    """
+    Token bucket per (logger, level, message template).
+
+    :param rate: records per second let through once the burst is spent
+    :param burst: records let through at once before limiting starts
+    :param max_keys: templates tracked (least recently used ones are forgotten)
+    """
+
+    def __init__(
+        self,
+        rate=10.0,
+        burst=100,
+        exempt_level=DEFAULT_EXEMPT_LEVEL,
+        max_keys=DEFAULT_MAX_KEYS,
+    ):
+        super().__init__(exempt_level)
+        self.rate = float(rate)
+        self.burst = float(burst)
+        self.max_keys = max_keys
+        # key -> [tokens, last refill, suppressed count, first suppressed at, record]
+        self._buckets = OrderedDict()
+
+    def _check(self, record):
+        key = (record.name, record.levelno, str(record.msg))
+        now = time.monotonic()
+        summaries = []
+        with self._lock:
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                bucket = self._buckets[key] = [self.burst, now, 0, 0.0, None]
+                if len(self._buckets) > self.max_keys:
+                    _, evicted = self._buckets.popitem(last=False)
+                    summaries += self._take_summary(evicted, now)
+            else:
+                self._buckets.move_to_end(key)
+                bucket[0] = min(self.burst, bucket[0] + (now - bucket[1]) * self.rate)
+                bucket[1] = now
+            if bucket[0] < 1:
+                if not bucket[2]:
+                    bucket[3] = now
+                bucket[2] += 1
+                bucket[4] = record
+                self.dropped += 1
+                return False, summaries
+            bucket[0] -= 1
+            summaries += self._take_summary(bucket, now)
+        return True, summaries
+
+    @staticmethod
+    def _take_summary(bucket, now):
+        suppressed, since, record = bucket[2], bucket[3], bucket[4]
+        if not suppressed:
+            return []
+        bucket[2], bucket[4] = 0, None
+        summary = _summary_record(
+            record,
+            "Suppressed %d records like %r in %.1f s (rate limit)",
+            (suppressed, str(record.msg), now - since),
+        )
+        summary.suppressed = suppressed
+        return [summary]
+
+    def pending_summaries(self):
+        now = time.monotonic()
+        with self._lock:
+            return [
+                summary
+                for bucket in self._buckets.values()
+                for summary in self._take_summary(bucket, now)
+            ]
+
+
+class SamplingFilter(_FloodFilter):
+    """
+    Keeps a random share of the low-level records.
+
+    :param rate: share of the records at or below max_level that pass (0 to 1)
+    :param max_level: records above it always pass
+    """
+
+    def __init__(self, rate=0.1, max_level="INFO", exempt_level=DEFAULT_EXEMPT_LEVEL):
+        super().__init__(exempt_level)
+        if not 0 <= float(rate) <= 1:
+            raise ValueError("Sampling rate must be between 0 and 1")
+        self.rate = float(rate)
+        self.max_level = _level(max_level)
+
+    def _check(self, record):
+        if record.levelno > self.max_level or random.random() < self.rate:
+            return True, []
+        with self._lock:
+            self.dropped += 1
+        return False, []
+
+
+def flush_summaries():
+    """Log the summaries still pending in every live filter; returns how many"""
+    count = 0
+    for flood_filter in list(_filters):
+        for summary in flood_filter.pending_summaries():
+            _emit(summary)
+            count += 1
+    return count
@@ -1,11 +1,34 @@
+import contextlib
 import logging
-import logging.config
 import os
 import sys
+import threading
+import time
 
-import click
-import yaml
-from vuit.adi.commons.config.pythena import Pythena
+from memory import memory
+from startup import report
+from structured_log import bind, bound, get_logger, new_run_id, reset
+from tracing import tracer
+
+# Only what --help needs is imported at module load. yaml, logging.config and Pythena
+# are imported on first use (see _load_pythena and configure_logging) and pygelf only
+# when the logging config references a GELF handler.
+click = report.timed_import("click")
+
+# Background queue pipeline, only set when async logging is enabled
+_async_pipeline = None
+# Local Athena property cache, only set when ATHENA_CACHE_DIR is configured
+_property_cache = None
+# Deadlines, retries, hedging and circuit breaker around the Athena calls
+_athena_fetcher = None
+# Logging config last applied, restored if a live reload cannot be applied
+_log_config_dict = None
+# The prefetch threads of a multi-tenant run all load Pythena at once
+_pythena_lock = threading.Lock()
+
+
+TEAMS = ["acad", "admsol", "ident"]
+ENVS = ["prd", "uat", "dev"]
 
 
 # This allows us to have extra args like Automic/docker_run adds (exec_time...)
@@ -13,59 +36,520 @@ from vuit.adi.commons.config.pythena import Pythena
     context_settings={"ignore_unknown_options": True, "allow_extra_args": True}
 )
 @click.option(
-    "--env", type=click.Choice(["prd", "uat", "dev"]), default="dev", help="Environment"
+    "--env",
+    type=click.Choice(ENVS),
+    default=["dev"],
+    multiple=True,
+    help="Environment. Repeat to run several environments.",
 )
 @click.option(
     "--team",
-    type=click.Choice(["acad", "admsol", "ident"]),
-    required=True,
-    help="Team name (for athena). You must set the ATHENA_SECRET environment variable.",
+    type=click.Choice(TEAMS),
+    multiple=True,
+    help="Team name (for athena). You must set the ATHENA_SECRET environment variable. "
+    "Repeat to run several teams.",
+)
+@click.option(
+    "--all-teams",
+    is_flag=True,
+    default=False,
+    help="Run every team (instead of --team).",
+)
+@click.option(
+    "--max-workers",
+    type=click.IntRange(min=1),
+    default=4,
+    show_default=True,
+    help="Maximum number of team/env combinations run concurrently.",
+)
+@click.option(
+    "--workers",
+    type=click.IntRange(min=1),
+    default=1,
+    show_default=True,
+    help="Processes used for the partitioned application logic (see workers.py).",
+)
+@click.option(
+    "--checkpoint",
+    type=click.Path(dir_okay=False),
+    envvar="TEST_CHECKPOINT",
+    help="SQLite checkpoint database. Records completed work units so a failed run "
+    "can be resumed.",
+)
+@click.option(
+    "--resume/--no-resume",
+    default=True,
+    show_default=True,
+    help="Skip the work units the checkpoint records as done.",
+)
+@click.option(
+    "--reset-checkpoint",
+    is_flag=True,
+    default=False,
+    help="Forget the checkpoint of the selected teams/envs before running.",
+)
+@click.option(
+    "--incremental",
+    is_flag=True,
+    default=False,
+    help="Only process records newer than the checkpointed watermark.",
+)
+@click.option(
+    "--checkpoint-interval",
+    type=click.IntRange(min=1),
+    default=100,
+    show_default=True,
+    help="Completed work units between checkpoint commits.",
+)
+@click.option(
+    "--refresh-config",
+    is_flag=True,
+    default=False,
+    help="Bypass the local Athena property cache and fetch fresh properties.",
+)
+@click.option(
+    "--startup-report",
+    is_flag=True,
+    default=False,
+    help="Print per-import and per-phase startup timings to stderr.",
 )
-def main(env: str, team: str) -> None:
+@click.option(
+    "--shutdown-timeout",
+    type=click.FloatRange(min=0),
+    default=5.0,
+    show_default=True,
+    envvar="LOG_SHUTDOWN_TIMEOUT",
+    help="Seconds allowed for flushing and closing the log handlers at exit.",
+)
+@click.option(
+    "--watch-config",
+    is_flag=True,
+    default=False,
+    help="Re-apply the logging config file whenever it changes (long-running jobs).",
+)
+@click.option(
+    "--property-refresh",
+    type=click.FloatRange(min=0),
+    default=0,
+    show_default=True,
+    help="Seconds between background Athena property refreshes (0 disables).",
+)
+@click.option(
+    "--memory-report",
+    is_flag=True,
+    default=False,
+    help="Log RSS and tracemalloc deltas per phase and the top allocation sites.",
+)
+@click.option(
+    "--memory-snapshot",
+    type=click.Path(dir_okay=False, writable=True),
+    help="Also write the final tracemalloc snapshot to this file "
+    "(implies --memory-report).",
+)
+@click.option(
+    "--profile",
+    is_flag=True,
+    default=False,
+    help="Run under cProfile and write a pstats file (see --profile-output).",
+)
+@click.option(
+    "--profile-output",
+    type=click.Path(dir_okay=False, writable=True),
+    default="test.pstats",
+    show_default=True,
+    help="Where --profile writes its pstats file.",
+)
+def main(
+    env: tuple[str, ...],
+    team: tuple[str, ...],
+    all_teams: bool,
+    max_workers: int,
+    workers: int,
+    checkpoint: str | None,
+    resume: bool,
+    reset_checkpoint: bool,
+    incremental: bool,
+    checkpoint_interval: int,
+    refresh_config: bool,
+    startup_report: bool,
+    shutdown_timeout: float,
+    watch_config: bool,
+    property_refresh: float,
+    memory_report: bool,
+    memory_snapshot: str | None,
+    profile: bool,
+    profile_output: str,
+) -> None:
+    report.mark("module load")
+    run_start = time.perf_counter()
+    tracer.reset()
+    teams = TEAMS if all_teams else list(team)
+    if not teams:
+        raise click.UsageError("Missing option '--team' (or use --all-teams).")
+    profiler = None
+    if profile:
+        from tracing import start_profiler
+
+        profiler = start_profiler()
+    if memory_report or memory_snapshot:
+        memory.start()
+
+    from prefetch import start_prefetch
+    from tenants import expand_tenants
+
+    # Start the Athena round trips now so they overlap with the logging setup
+    tenants = expand_tenants(teams, env)
+    open_athena_fetcher()
+    open_property_cache()
+    prefetcher, fetches = start_prefetch(
+        tenants,
+        lambda tenant_env, tenant_team: fetch_tenant_properties(
+            tenant_env, tenant_team, refresh_config
+        ),
+        max_workers,
+    )
 
     # Get the base logger
-    base_logger = configure_logging()
+    setup_start = time.perf_counter()
+    with tracer.span("configure_logging"):
+        base_logger = configure_logging()
+    from metrics import metrics
 
-    # Create a context-aware logger.
-    # Just adds env and team to all logs so they can be filtered on in graylog.
-    context = {"env": env, "team": team}
-    logger = logging.LoggerAdapter(base_logger, context)
+    metrics.gauge("logging_setup_seconds", time.perf_counter() - setup_start)
+    report.mark("configure logging")
+    memory.mark("configure_logging")
+    watcher = start_config_watcher(base_logger) if watch_config else None
 
-    logger.info(" **** Starting test ***")
+    from checkpoint import open_checkpoint_store
 
-    profiles = team + "," + env
-    # get Config file from athena
+    checkpoints = open_checkpoint_store(
+        checkpoint,
+        tenants,
+        checkpoint_interval,
+        resume=resume,
+        reset=reset_checkpoint,
+        incremental=incremental,
+    )
+
+    # Every record of this run carries the run id (see structured_log)
+    run_token = bind(run_id=new_run_id())
     try:
-        pythenaObj = Pythena("test", env, team, profiles)
-        properties_from_athena = pythenaObj.get_properties()
-        if properties_from_athena is None:
-            logger.error(
-                "Can't get athena properties. Check environment variable ATHENA_SECRET."
+        if len(tenants) == 1:
+            tenant_env, tenant_team = tenants[0]
+            exit_code = run_tenant(
+                base_logger,
+                tenant_env,
+                tenant_team,
+                fetches[tenants[0]],
+                mark_phases=True,
+                workers=workers,
+                checkpoints=checkpoints,
+                property_refresh=property_refresh,
             )
-            sys.exit(1)
+        else:
+            exit_code = run_all_tenants(
+                base_logger,
+                tenants,
+                fetches,
+                max_workers,
+                workers,
+                checkpoints,
+                property_refresh,
+            )
+        if exit_code:
+            sys.exit(exit_code)
 
-        # Example of getting a property. Update as needed.
-        prop_value = pythenaObj.get_property_value(
-            "property.name", properties_from_athena
-        )
+    finally:
+        if watcher is not None:
+            watcher.stop()
+        prefetcher.shutdown(wait=False, cancel_futures=True)
+        if checkpoints is not None:
+            checkpoints.close()
+        with tracer.span("shutdown_drain", base_logger):
+            close_property_cache(base_logger)
+            close_athena_fetcher(base_logger)
+            flush_log_filters()
+            # Drain the async logging queue (if enabled) so every record reaches its sink
+            async_stats = stop_async_logging()
+        tracer.log_summary(base_logger)
+        if memory.enabled:
+            memory.log_report(base_logger)
+            if memory_snapshot:
+                memory.dump(memory_snapshot)
+            memory.stop()
+        # Flush and close every handler (root and your logger) once, concurrently,
+        # under one deadline so a hung sink cannot hold the container open.
+        # Nothing can be logged after this, so problems are reported on stderr.
+        from shutdown import shutdown_handlers, unique_handlers
 
-        # Your application logic here...
-        logger.info(f"Property value: {prop_value}")
+        handlers = unique_handlers(logging.root, logging.getLogger("test"))
+        with tracer.span("shutdown_close"):
+            sinks = shutdown_handlers(handlers, shutdown_timeout)
+        for sink in sinks:
+            if not sink.ok or sink.pending:
+                click.echo(f"Log shutdown: {sink.describe()}", err=True)
+        close_metrics(handlers, async_stats, time.perf_counter() - run_start)
+        report.mark("shutdown")
+        if startup_report:
+            click.echo(report.render(), err=True)
+        if profiler is not None:
+            from tracing import stop_profiler
 
-        logger.info(" **** Finished test ***")
-    except Exception as e:
-        logger.exception(f"Unhandled exception occurred: {e}")
-        sys.exit(1)
+            stop_profiler(profiler, profile_output)
+            click.echo(f"Profile written to {profile_output}", err=True)
+        reset(run_token)
+
+
+def run_tenant(
+    base_logger,
+    env,
+    team,
+    properties_fetch,
+    mark_phases=False,
+    workers=1,
+    checkpoints=None,
+    property_refresh=0,
+):
+    """
+    Run the job for one team/env combination and return its exit code.
+
+    `properties_fetch` is the background Athena fetch started by main(); it is only
+    waited on here, where the properties are first needed. Runs on the main thread for
+    a single tenant and on a pool thread in multi-tenant mode. `checkpoints` is the
+    run's CheckpointStore, or None when --checkpoint is not set. With
+    `property_refresh` seconds the properties are refetched in the background.
+    """
+    # Bind env and team to all logs (as GELF extra fields) so they can be filtered on
+    # in graylog. The context is a contextvar, so it follows the call into threads
+    # started with structured_log.submit_with_context.
+    logger = get_logger(base_logger)
+    with bound(env=env, team=team):
+        logger.info(" **** Starting test ***")
+
+        # get Config file from athena
+        live = None
+        try:
+            with tracer.span("athena_fetch", logger):
+                properties = properties_fetch.result()
+            logger.info(properties_fetch.timings())
+            # The fetch started before logging (and metrics) were set up
+            from metrics import metrics
+
+            metrics.observe(
+                "athena_fetch_seconds",
+                properties_fetch.fetch_seconds,
+                env=env,
+                team=team,
+            )
+            if mark_phases:
+                report.mark("athena fetch wait")
+                memory.mark("athena_fetch")
+            if properties is None:
+                logger.error(
+                    "Can't get athena properties. Check environment variable ATHENA_SECRET."
+                )
+                return 1
+            if property_refresh:
+                from reload import LiveProperties
+
+                # Reads go to the latest snapshot (see reload.LiveProperties)
+                properties = live = LiveProperties(
+                    properties,
+                    lambda: fetch_tenant_properties(env, team, True),
+                    property_refresh,
+                    logger,
+                ).start()
+
+            with tracer.span("application", logger):
+                # Example of getting a property. Update as needed.
+                # properties is a PropertyStore: O(1) lookups, typed accessors such as
+                # properties.get_int("batch.size") and prefix queries such as
+                # properties.namespace("database").
+                prop_value = properties.get("property.name")
 
+                # Your application logic here...
+                # Messages are formatted lazily; keyword arguments become GELF fields.
+                logger.info("Property value: %s", prop_value)
+
+                # CPU-heavy steps: spread the work units over --workers processes.
+                # With --checkpoint, units done by an earlier run are skipped and
+                # --incremental hands over the watermark of the last run.
+                checkpoint = None
+                since = None
+                if checkpoints is not None:
+                    checkpoint = checkpoints.checkpoint(team, env)
+                    if checkpoints.incremental:
+                        since = checkpoint.watermark
+                units = application_units(properties, since)
+                if units:
+                    run_units(units, properties, workers, logger, checkpoint)
+
+                # Large inputs: stream them through a bounded pipeline
+                pipeline = application_pipeline(properties)
+                if pipeline is not None:
+                    with tracer.span("pipeline", logger):
+                        pipeline.run(logger)
+
+            logger.info(" **** Finished test ***")
+            if mark_phases:
+                report.mark("application logic")
+                memory.mark("application")
+            return 0
+        except Exception as e:
+            logger.exception("Unhandled exception occurred: %s", e)
+            return 1
+        finally:
+            if live is not None:
+                live.stop()
+
+
+def run_units(units, properties, workers, logger, checkpoint=None):
+    """Run the work units, recording progress in the tenant's checkpoint if any"""
+    from workers import run_partitioned
+
+    if checkpoint is None:
+        return run_partitioned(process_unit, units, properties, workers, logger)
+
+    pending = checkpoint.pending(units)
+    if len(pending) < len(units):
+        logger.info(
+            "Resuming from checkpoint: %d of %d units already done",
+            len(units) - len(pending),
+            len(units),
+            units_skipped=len(units) - len(pending),
+        )
+
+    def on_done(unit, error):
+        if error is None:
+            checkpoint.mark_done(unit, unit_watermark(unit))
+        else:
+            checkpoint.mark_failed(unit)
+
+    try:
+        return run_partitioned(
+            process_unit, pending, properties, workers, logger, on_done=on_done
+        )
     finally:
-        # Properly close all handlers to flush buffers
-        for handler in logging.root.handlers:
-            handler.flush()
-            handler.close()
-        # Additional specific closure for your logger
-        for handler in logging.getLogger("test").handlers:
-            handler.flush()
-            handler.close()
+        checkpoint.commit()
+
+
+def run_all_tenants(
+    base_logger,
+    tenants,
+    fetches,
+    max_workers,
+    workers=1,
+    checkpoints=None,
+    property_refresh=0,
+):
+    """Run every team/env combination concurrently and return the aggregated exit code"""
+    from tenants import run_tenants, summarize
+
+    logger = get_logger(base_logger)
+    logger.info(
+        "Running %d team/env combinations with up to %d workers",
+        len(tenants),
+        max_workers,
+    )
+    results = run_tenants(
+        tenants,
+        lambda env, team: run_tenant(
+            base_logger,
+            env,
+            team,
+            fetches[(env, team)],
+            workers=workers,
+            checkpoints=checkpoints,
+            property_refresh=property_refresh,
+        ),
+        max_workers=max_workers,
+    )
+    report.mark("tenants")
+    memory.mark("tenants")
+
+    exit_code, lines = summarize(results)
+    for line in lines:
+        if exit_code:
+            logger.error(line)
+        else:
+            logger.info(line)
+    return exit_code
+
+
+def application_units(properties, since=None):
+    """
+    Split the application work into independent units. Update as needed.
+
+    Each unit is passed to process_unit in a worker process, so it must be picklable.
+    With --checkpoint it must also be JSON-serializable (it is the checkpoint key).
+    In --incremental mode `since` is the watermark of the last run: only return units
+    for records newer than it.
+    """
+    return []
+
+
+def process_unit(unit, properties):
+    """
+    Process one work unit in a worker process. Update as needed.
+
+    `properties` is the tenant's PropertyStore, handed to each worker once. Log with
+    structured_log.get_logger("test"); records reach the parent's handlers with the
+    env/team context.
+    """
+    return unit
+
+
+def unit_watermark(unit):
+    """
+    The watermark a completed unit moves the checkpoint to (e.g. the date of its
+    partition), or None. Update as needed; values must be comparable and keep their
+    type through JSON (ints, ISO date strings...).
+    """
+    return None
+
+
+def application_pipeline(properties):
+    """
+    Build a streaming pipeline.Pipeline for inputs too large for memory, or return
+    None. Update as needed, e.g.:
+
+        from pipeline import Pipeline, SqliteSink, map_rows, read_jsonl
+        return Pipeline(read_jsonl(path), [map_rows(fn)], SqliteSink(db, table, cols))
+    """
+    return None
+
+
+def fetch_tenant_properties(env, team, refresh_config):
+    """
+    Fetch a tenant's properties from Athena and index them in a PropertyStore.
+
+    Returns None when Athena returned no properties.
+    """
+    from property_store import PropertyStore
+
+    profiles = team + "," + env
+    pythenaObj = _load_pythena()("test", env, team, profiles)
+    properties_from_athena = fetch_properties(
+        pythenaObj, ("test", env, team, profiles), refresh_config
+    )
+    return PropertyStore.from_athena(properties_from_athena)
+
+
+def __getattr__(name):
+    # Lazy module attributes (PEP 562), e.g. main.Pythena
+    if name == "Pythena":
+        return _load_pythena()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+def _load_pythena():
+    """Import the Pythena client on first use"""
+    with _pythena_lock:
+        pythena = globals().get("Pythena")
+        if pythena is None:
+            pythena = report.timed_import("vuit.adi.commons.config.pythena").Pythena
+            globals()["Pythena"] = pythena
+        return pythena
 
 
 # Look for log config in multiple locations with priority order
@@ -99,7 +583,8 @@ def get_log_config_path():
         "disable_existing_loggers": False,
         "formatters": {
             "simple": {
-                "format": "%(asctime)s %(levelname)-8s [%(filename)s %(lineno)d] : %(message)s"
+                "class": "fast_formatter.FastFormatter",
+                "format": "%(asctime)s %(levelname)-8s [%(filename)s %(lineno)d] : %(message)s",
             }
         },
         "handlers": {
@@ -110,7 +595,7 @@ def get_log_config_path():
                 "stream": "ext://sys.stdout",
             },
             "gelf": {
-                "class": "pygelf.GelfTcpHandler",
+                "class": "gelf_spool.SpoolingGelfTcpHandler",
                 "host": "vulogs.app.vanderbilt.edu",
                 "port": 4545,
                 "level": "INFO",
@@ -137,17 +622,22 @@ def configure_logging():
     config = get_log_config_path()
 
     try:
+        from log_config_cache import load_log_config
+
         if isinstance(config, str) and os.path.exists(config):
-            # It's a file path
-            with open(config) as f:
-                config_dict = yaml.safe_load(f.read())
-            logging.config.dictConfig(config_dict)
-            logging.getLogger(logger_name).debug(f"Logging configured from {config}")
+            # It's a file path (parsed and validated YAML is cached by mtime/hash)
+            config_dict, cache_status = load_log_config(config)
+            apply_log_config(config_dict, [logger_name, "root"])
+            logging.getLogger(logger_name).debug(
+                "Logging configured from %s (config cache %s)", config, cache_status
+            )
         elif isinstance(config, dict):
             # It's a default config dictionary
-            logging.config.dictConfig(config)
+            config_dict, cache_status = load_log_config(config)
+            apply_log_config(config_dict, [logger_name, "root"])
             logging.getLogger(logger_name).debug(
-                "Logging configured with default settings"
+                "Logging configured with default settings (config cache %s)",
+                cache_status,
             )
         else:
             raise ValueError("Invalid configuration returned")
@@ -158,11 +648,322 @@ def configure_logging():
             format="%(asctime)s %(levelname)-8s [%(filename)s %(lineno)d] : %(message)s",
             stream=sys.stdout,
         )
-        logging.error(f"Error configuring logging: {e}")
+        logging.error("Error configuring logging: %s", e)
 
     # Return the logger for this application
     return logging.getLogger(logger_name)
 
 
+def apply_log_config(config_dict, logger_names):
+    """dictConfig the config and start the metrics and async logging it asks for"""
+    _apply_handlers(config_dict)
+    start_metrics(config_dict, logger_names)
+    start_async_logging(config_dict, logger_names)
+
+
+def _apply_handlers(config_dict):
+    global _log_config_dict
+
+    logging_config = report.timed_import("logging.config")
+    logging_config.dictConfig(_dict_config_only(config_dict))
+    _log_config_dict = config_dict
+
+
+def reload_log_config(path, logger_names=("test", "root")):
+    """
+    Re-apply the logging config file at `path` in a running process.
+
+    The file is parsed and validated before anything changes. Records queued by async
+    logging are delivered to the current handlers, which dictConfig then flushes and
+    closes. Handlers the config did not create (the worker log forwarders, the daemon's
+    job streams) stay open and attached, and loggers created since startup stay
+    enabled. If the new config cannot be applied, the previous one is put back. The
+    metrics exporter keeps running (and counting) across reloads; only the new
+    handlers are instrumented.
+    """
+    from log_config_cache import load_log_config
+    from metrics import instrument_handlers, metrics
+    from shutdown import unique_handlers
+
+    config_dict, _ = load_log_config(path)
+    config_dict = dict(config_dict, disable_existing_loggers=False)
+    previous = _log_config_dict
+    stop_async_logging()
+    with _foreign_handlers_kept():
+        try:
+            _apply_handlers(config_dict)
+        except Exception:
+            if previous is not None:
+                _apply_handlers(dict(previous, disable_existing_loggers=False))
+                start_async_logging(previous, list(logger_names))
+            raise
+    if metrics.enabled:
+        instrument_handlers(
+            unique_handlers(*(logging.getLogger(name) for name in logger_names))
+        )
+    start_async_logging(config_dict, list(logger_names))
+
+
+@contextlib.contextmanager
+def _foreign_handlers_kept():
+    """
+    Keep the handlers the logging config did not create across a dictConfig.
+
+    dictConfig closes every handler in logging's shutdown list and takes the handlers
+    off the loggers it configures; those it created itself are the named ones.
+    """
+    configured = {id(handler) for handler in logging._handlers.values()}
+    with logging._lock:
+        loggers = [logging.root, *logging.Logger.manager.loggerDict.values()]
+        foreign = [
+            ref
+            for ref in logging._handlerList
+            if ref() is not None and id(ref()) not in configured
+        ]
+        kept = {id(ref) for ref in foreign}
+        logging._handlerList[:] = [
+            ref for ref in logging._handlerList if id(ref) not in kept
+        ]
+    attached = [
+        (logger, handler)
+        for logger in loggers
+        if isinstance(logger, logging.Logger)
+        for handler in logger.handlers
+        if id(handler) not in configured
+    ]
+    try:
+        yield
+    finally:
+        with logging._lock:
+            logging._handlerList.extend(foreign)
+        for logger, handler in attached:
+            logger.addHandler(handler)
+
+
+def start_config_watcher(logger):
+    """Watch the log config file for --watch-config; returns the watcher or None"""
+    from metrics import metrics
+    from reload import ConfigWatcher
+
+    logger = get_logger(logger)
+    config = get_log_config_path()
+    if not isinstance(config, str) or not os.path.exists(config):
+        logger.warning("--watch-config: no logging config file to watch")
+        return None
+
+    def on_change(path):
+        start = time.perf_counter()
+        try:
+            reload_log_config(path)
+        except Exception as e:
+            metrics.increment("config_reloads", status="failed")
+            logger.error(
+                "Logging config reload from %s failed, keeping the current config: %s",
+                path,
+                e,
+                reload_status="failed",
+            )
+            return
+        metrics.increment("config_reloads", status="ok")
+        reload_ms = (time.perf_counter() - start) * 1000
+        logger.info(
+            "Logging config reloaded from %s in %.1f ms",
+            path,
+            reload_ms,
+            reload_status="ok",
+            reload_ms=round(reload_ms, 1),
+        )
+
+    watcher = ConfigWatcher(config, on_change, logger=logger).start()
+    logger.info("Watching %s for logging config changes (%s)", config, watcher.mode)
+    return watcher
+
+
+def fetch_properties(pythenaObj, cache_key, refresh):
+    """
+    Get the athena properties, going through the local property cache when enabled.
+
+    The cache is keyed by (app, env, team, profiles) and turned on with ATHENA_CACHE_DIR.
+    Athena calls go through the resilient fetcher (deadlines, retries, hedging and a
+    circuit breaker) once open_athena_fetcher() has run; when the breaker is open or
+    the deadlines pass, the cache falls back to its last-known-good snapshot.
+    """
+    fetch = pythenaObj.get_properties
+    fetcher = _athena_fetcher
+    if fetcher is not None:
+
+        def fetch():
+            return fetcher.fetch(cache_key, pythenaObj.get_properties)
+
+    if _property_cache is None:
+        return fetch()
+    return _property_cache.get_or_fetch(cache_key, fetch, refresh=refresh)
+
+
+def open_athena_fetcher():
+    """Set up the resilient Athena fetcher (tuned with the ATHENA_* env variables)"""
+    global _athena_fetcher
+    from resilient_fetch import open_resilient_fetcher
+
+    _athena_fetcher = open_resilient_fetcher()
+    return _athena_fetcher
+
+
+def close_athena_fetcher(logger):
+    """Log the fetcher stats when a fetch needed retries, hedging or failed"""
+    global _athena_fetcher
+    if _athena_fetcher is None:
+        return None
+
+    stats = _athena_fetcher.stats
+    _athena_fetcher = None
+    if stats["attempts"] > stats["fetches"] or stats["failures"] or stats["rejected"]:
+        logger.warning(
+            "Athena fetches: %d attempts for %d fetches, %d retries, %d hedged "
+            "(%d won), %d timeouts, %d failed, %d rejected by the circuit breaker",
+            stats["attempts"],
+            stats["fetches"],
+            stats["retries"],
+            stats["hedges"],
+            stats["hedge_wins"],
+            stats["timeouts"],
+            stats["failures"],
+            stats["rejected"],
+        )
+    return stats
+
+
+def open_property_cache():
+    """Open the local property cache (shared by all tenants) if it is enabled"""
+    global _property_cache
+    from property_cache import open_property_cache as open_cache
+
+    _property_cache = open_cache()
+    return _property_cache
+
+
+def close_property_cache(logger):
+    """Wait for background property revalidation and log the cache stats"""
+    global _property_cache
+    if _property_cache is None:
+        return None
+
+    _property_cache.close()
+    stats = _property_cache.stats
+    _property_cache = None
+    logger.info(
+        "Property cache: %d hits, %d misses, %d stale fallbacks, %d revalidations, %d errors",
+        stats["hits"],
+        stats["misses"],
+        stats["stale_fallbacks"],
+        stats["revalidations"],
+        stats["errors"],
+    )
+    return stats
+
+
+def _dict_config_only(config_dict):
+    """Strip our own top-level sections so only the dictConfig schema is passed on"""
+    from async_logging import CONFIG_KEY as ASYNC_KEY
+    from metrics import CONFIG_KEY as METRICS_KEY
+
+    return {
+        key: value
+        for key, value in config_dict.items()
+        if key not in (ASYNC_KEY, METRICS_KEY)
+    }
+
+
+def flush_log_filters():
+    """Log the "repeated N times" summaries still held by the log_filters filters"""
+    # Only loaded when the log config references one of them
+    log_filters = sys.modules.get("log_filters")
+    if log_filters is not None:
+        log_filters.flush_summaries()
+
+
+def start_metrics(config_dict, logger_names):
+    """
+    Start the metrics exporter when one is configured and count the records each
+    configured handler emits.
+
+    Opt in with a `metrics` section in the log config or the METRICS_EXPORTER env var.
+    """
+    from metrics import (
+        build_exporter,
+        instrument_handlers,
+        load_metrics_settings,
+        metrics,
+    )
+    from shutdown import unique_handlers
+
+    settings = load_metrics_settings(config_dict)
+    exporter = build_exporter(settings)
+    if exporter is None:
+        return None
+    metrics.configure(exporter, settings["flush_interval"])
+    instrument_handlers(
+        unique_handlers(*(logging.getLogger(name) for name in logger_names))
+    )
+    return metrics
+
+
+def close_metrics(handlers, async_stats, run_seconds):
+    """Record the dropped log records and run duration, then export a last time"""
+    from metrics import metrics, record_dropped
+
+    if not metrics.enabled:
+        return
+    record_dropped(handlers, async_stats)
+    metrics.gauge("run_duration_seconds", run_seconds)
+    metrics.close()
+
+
+def start_async_logging(config_dict, logger_names):
+    """
+    Move the configured handlers behind a bounded queue when async logging is enabled.
+
+    Opt in with an `async_logging` section in the log config or the LOG_ASYNC env var.
+    """
+    global _async_pipeline
+    from async_logging import AsyncLoggingPipeline, load_async_settings
+
+    stop_async_logging()
+    settings = load_async_settings(config_dict)
+    if not settings["enabled"]:
+        return None
+
+    _async_pipeline = AsyncLoggingPipeline(settings["queue_size"], settings["overflow"])
+    _async_pipeline.start(logger_names)
+    from metrics import metrics
+
+    if metrics.enabled:
+        metrics.add_collector(_sample_log_queue_depth)
+    return _async_pipeline
+
+
+def _sample_log_queue_depth():
+    from metrics import metrics
+
+    if _async_pipeline is not None:
+        metrics.gauge("log_queue_depth", _async_pipeline.queue.qsize())
+
+
+def stop_async_logging():
+    """Drain and stop the async logging pipeline, logging its counters"""
+    global _async_pipeline
+    if _async_pipeline is None:
+        return None
+
+    stats = _async_pipeline.stop()
+    _async_pipeline = None
+    logging.getLogger("test").info(
+        "Async logging drained: %d records queued, %d dropped",
+        stats["queued"],
+        stats["dropped"],
+    )
+    return stats
+
+
 if __name__ == "__main__":
     main()
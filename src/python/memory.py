@@ -0,0 +1,197 @@
+"""
+Opt-in memory instrumentation for the --memory-report option.
+
+    memory.start()
+    ...
+    memory.mark("configure_logging")
+    ...
+    memory.log_report(logger)
+    memory.dump("test.tracemalloc")  # load with tracemalloc.Snapshot.load
+
+At each phase boundary the process RSS and a tracemalloc snapshot are taken, so the
+report shows how much each phase added. The end of the run logs the peak RSS and
+the allocation sites that grew most since start(). Every line carries GELF fields
+(mem_phase, mem_rss_mb, mem_traced_delta_mb, alloc_site...) with the bound
+env/team/run_id context, so memory use can be graphed and compared in Graylog.
+
+Tracing allocations slows Python code down noticeably; leave it off for normal runs.
+While it is not started, mark() does nothing.
+"""
+
+import os
+import sys
+
+from structured_log import StructuredLogger, get_logger
+
+DEFAULT_TOP = 10
+DEFAULT_FRAMES = 1
+
+_MIB = 1024 * 1024
+
+
+def current_rss():
+    """Resident set size of this process in bytes (None when it can't be read)"""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        return peak_rss()
+
+
+def peak_rss():
+    """Peak resident set size of this process in bytes (None when unavailable)"""
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports KiB, macOS bytes
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+def _mib(value):
+    return round(value / _MIB, 2) if value is not None else None
+
+
+class MemoryPhase:
+    """RSS and traced memory at the end of one phase, with the change since the last"""
+
+    def __init__(self, name, rss, rss_delta, traced, traced_delta):
+        self.name = name
+        self.rss = rss
+        self.rss_delta = rss_delta
+        self.traced = traced
+        self.traced_delta = traced_delta
+
+
+class MemoryTracker:
+    """Records memory at phase boundaries while tracemalloc runs"""
+
+    def __init__(self):
+        self.phases = []
+        self.top = DEFAULT_TOP
+        self._first = None
+        self._last = None
+        self._last_rss = None
+        self._started_tracing = False
+
+    @property
+    def enabled(self):
+        return self._first is not None
+
+    def start(self, top=DEFAULT_TOP, frames=DEFAULT_FRAMES):
+        """Start tracing allocations and take the baseline snapshot"""
+        import tracemalloc
+
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(frames)
+            self._started_tracing = True
+        self.top = top
+        self.phases = []
+        self._first = self._last = self._snapshot()
+        self._last_rss = current_rss()
+
+    def _snapshot(self):
+        import tracemalloc
+
+        # Leave out the tracer's own bookkeeping
+        return tracemalloc.take_snapshot().filter_traces(
+            (
+                tracemalloc.Filter(False, tracemalloc.__file__),
+                tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+                tracemalloc.Filter(False, "<unknown>"),
+            )
+        )
+
+    def mark(self, name):
+        """Record the memory at the end of the phase `name`"""
+        if not self.enabled:
+            return None
+        snapshot = self._snapshot()
+        rss = current_rss()
+        traced = _traced_size(snapshot)
+        phase = MemoryPhase(
+            name,
+            rss,
+            rss - self._last_rss if None not in (rss, self._last_rss) else None,
+            traced,
+            traced - _traced_size(self._last),
+        )
+        self.phases.append(phase)
+        self._last = snapshot
+        self._last_rss = rss
+        return phase
+
+    def top_allocations(self, limit=None):
+        """The allocation sites that grew most since start(), as StatisticDiff objects"""
+        if not self.enabled:
+            return []
+        stats = self._last.compare_to(self._first, "lineno")
+        return [stat for stat in stats if stat.size_diff > 0][: limit or self.top]
+
+    def log_report(self, logger):
+        """Log the per-phase deltas, the peaks and the top allocation sites"""
+        if not self.enabled:
+            return
+        if not isinstance(logger, StructuredLogger):
+            logger = get_logger(logger)
+        import tracemalloc
+
+        for phase in self.phases:
+            logger.info(
+                "Memory %s: rss %s MiB (%+.2f), traced %.2f MiB (%+.2f)",
+                phase.name,
+                _mib(phase.rss),
+                _mib(phase.rss_delta) or 0.0,
+                _mib(phase.traced),
+                _mib(phase.traced_delta),
+                mem_phase=phase.name,
+                mem_rss_mb=_mib(phase.rss),
+                mem_rss_delta_mb=_mib(phase.rss_delta),
+                mem_traced_mb=_mib(phase.traced),
+                mem_traced_delta_mb=_mib(phase.traced_delta),
+            )
+        _, traced_peak = tracemalloc.get_traced_memory()
+        logger.info(
+            "Memory peak: rss %s MiB, traced %.2f MiB",
+            _mib(peak_rss()),
+            _mib(traced_peak),
+            mem_peak_rss_mb=_mib(peak_rss()),
+            mem_peak_traced_mb=_mib(traced_peak),
+        )
+        for rank, stat in enumerate(self.top_allocations(), 1):
+            frame = stat.traceback[0]
+            site = f"{frame.filename}:{frame.lineno}"
+            logger.info(
+                "Top allocation %d: %s: %+.1f KiB in %+d blocks",
+                rank,
+                site,
+                stat.size_diff / 1024,
+                stat.count_diff,
+                alloc_rank=rank,
+                alloc_site=site,
+                alloc_kib=round(stat.size / 1024, 1),
+                alloc_delta_kib=round(stat.size_diff / 1024, 1),
+                alloc_blocks=stat.count,
+            )
+
+    def dump(self, path):
+        """Write the last snapshot (load it with tracemalloc.Snapshot.load)"""
+        if self.enabled:
+            self._last.dump(path)
+
+    def stop(self):
+        """Stop tracing (if start() began it) and drop the snapshots"""
+        if self._started_tracing:
+            import tracemalloc
+
+            tracemalloc.stop()
+            self._started_tracing = False
+        self._first = self._last = None
+
+
+def _traced_size(snapshot):
+    return sum(trace.size for trace in snapshot.traces)
+
+
+memory = MemoryTracker()
@@ -0,0 +1,420 @@
+"""
+Runtime metrics (counters, gauges, histograms) exported next to the logs.
+
+Configure it in log-config.yaml (the section is stripped before dictConfig):
+
+    metrics:
+      exporter: statsd          # statsd | prometheus | none
+      host: localhost           # statsd
+      port: 8125
+      tags: none                # none: labels are folded into the name; dogstatsd: |#k:v
+      path: /var/lib/node_exporter/test.prom   # prometheus textfile
+      prefix: test
+      flush_interval: 10        # seconds between exports, 0 for only at exit
+
+or with the METRICS_EXPORTER / METRICS_HOST / METRICS_PORT / METRICS_PATH /
+METRICS_PREFIX environment variables, which take precedence over the file.
+
+    metrics.increment("records_processed", 500, table="person")
+    metrics.gauge("queue_depth", 12)
+    with metrics.timer("athena_fetch_seconds", team="acad"):
+        ...
+
+Until an exporter is configured every call returns immediately. StatsD counters
+are sent as the increase since the last export. Observations of histograms named
+*_seconds (such as metrics.timer's) are sent as timers in milliseconds (|ms), and
+other histograms as |h. The Prometheus textfile is rewritten atomically with
+cumulative values, for node_exporter's textfile collector. Exports work on a copy
+taken under the registry lock, so recording never waits on a socket or the disk.
+"""
+
+import math
+import os
+import re
+import socket
+import threading
+import time
+from contextlib import contextmanager
+
+CONFIG_KEY = "metrics"
+
+EXPORTER_STATSD = "statsd"
+EXPORTER_PROMETHEUS = "prometheus"
+EXPORTER_NONE = "none"
+EXPORTERS = (EXPORTER_STATSD, EXPORTER_PROMETHEUS, EXPORTER_NONE)
+
+DEFAULT_PREFIX = "test"
+DEFAULT_STATSD_PORT = 8125
+DEFAULT_FLUSH_INTERVAL = 10.0
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+# Keeps a StatsD datagram under a typical Ethernet MTU
+MAX_DATAGRAM = 1432
+
+_ENV_OVERRIDES = {
+    "exporter": "METRICS_EXPORTER",
+    "host": "METRICS_HOST",
+    "port": "METRICS_PORT",
+    "path": "METRICS_PATH",
+    "prefix": "METRICS_PREFIX",
+}
+
+_INVALID_NAME_CHARS = re.compile(r"[^a-zA-Z0-9_]")
+
+
+def load_metrics_settings(config_dict):
+    """
+    Resolve the metrics settings from the optional `metrics` section of a logging
+    config dict and the environment variable overrides.
+    """
+    section = {}
+    if isinstance(config_dict, dict) and isinstance(config_dict.get(CONFIG_KEY), dict):
+        section = config_dict[CONFIG_KEY]
+
+    settings = {
+        "exporter": section.get("exporter", EXPORTER_NONE),
+        "host": section.get("host", "localhost"),
+        "port": section.get("port", DEFAULT_STATSD_PORT),
+        "tags": section.get("tags", "none"),
+        "path": section.get("path"),
+        "prefix": section.get("prefix", DEFAULT_PREFIX),
+        "flush_interval": section.get("flush_interval", DEFAULT_FLUSH_INTERVAL),
+    }
+    for key, variable in _ENV_OVERRIDES.items():
+        if os.environ.get(variable):
+            settings[key] = os.environ[variable].strip()
+
+    settings["exporter"] = str(settings["exporter"]).lower()
+    if settings["exporter"] not in EXPORTERS:
+        raise ValueError(f"Unknown metrics exporter: {settings['exporter']}")
+    if settings["tags"] not in ("none", "dogstatsd"):
+        raise ValueError(f"Unknown metrics tags format: {settings['tags']}")
+    if settings["exporter"] == EXPORTER_PROMETHEUS and not settings["path"]:
+        raise ValueError("The prometheus metrics exporter needs a path")
+    settings["port"] = int(settings["port"])
+    settings["flush_interval"] = float(settings["flush_interval"])
+    return settings
+
+
+def _sanitize(name):
+    return _INVALID_NAME_CHARS.sub("_", name)
+
+
+def _label_key(labels):
+    return tuple(sorted((key, str(value)) for key, value in labels.items()))
+
+
+class _Histogram:
+    __slots__ = ("buckets", "counts", "sum", "count", "pending")
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.sum = 0.0
+        self.count = 0
+        # Observations not exported to StatsD yet
+        self.pending = []
+
+    def observe(self, value):
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+        self.sum += value
+        self.count += 1
+        self.pending.append(value)
+
+    def take(self):
+        """A copy to export; the pending observations move to the copy"""
+        copy = _Histogram(self.buckets)
+        copy.counts = list(self.counts)
+        copy.sum = self.sum
+        copy.count = self.count
+        copy.pending, self.pending = self.pending, []
+        return copy
+
+
+class StatsdExporter:
+    """Sends metrics to a StatsD server over UDP"""
+
+    def __init__(self, host, port, prefix=DEFAULT_PREFIX, tags="none"):
+        self.address = (host, port)
+        self.prefix = prefix
+        self.tags = tags
+        self._sent_counters = {}
+        self._sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+
+    def _name(self, name, labels):
+        parts = [self.prefix, name] if self.prefix else [name]
+        if self.tags == "none":
+            parts += [_sanitize(value) for _, value in labels]
+        return ".".join(parts)
+
+    def _line(self, name, labels, value, kind):
+        line = f"{self._name(name, labels)}:{value:g}|{kind}"
+        if self.tags == "dogstatsd" and labels:
+            line += "|#" + ",".join(f"{key}:{value}" for key, value in labels)
+        return line
+
+    def export(self, counters, gauges, histograms):
+        lines = []
+        for key, value in counters.items():
+            delta = value - self._sent_counters.get(key, 0)
+            if delta:
+                lines.append(self._line(*key, delta, "c"))
+                self._sent_counters[key] = value
+        for key, value in gauges.items():
+            lines.append(self._line(*key, value, "g"))
+        for key, histogram in histograms.items():
+            # StatsD timers are in milliseconds; durations are observed in seconds
+            if key[0].endswith("_seconds"):
+                lines.extend(
+                    self._line(*key, value * 1000, "ms") for value in histogram.pending
+                )
+            else:
+                lines.extend(
+                    self._line(*key, value, "h") for value in histogram.pending
+                )
+        self._send(lines)
+
+    def _send(self, lines):
+        packet = []
+        size = 0
+        for line in lines:
+            encoded = line.encode()
+            if packet and size + len(encoded) + 1 > MAX_DATAGRAM:
+                self._sendto(b"\n".join(packet))
+                packet, size = [], 0
+            packet.append(encoded)
+            size += len(encoded) + 1
+        if packet:
+            self._sendto(b"\n".join(packet))
+
+    def _sendto(self, data):
+        try:
+            self._sock.sendto(data, self.address)
+        except OSError:
+            # Metrics are best effort: never fail the run because StatsD is down
+            pass
+
+    def close(self):
+        self._sock.close()
+
+
+class PrometheusTextfileExporter:
+    """Writes all metrics to a Prometheus text-format file"""
+
+    def __init__(self, path, prefix=DEFAULT_PREFIX):
+        self.path = path
+        self.prefix = prefix
+
+    def _name(self, name):
+        return _sanitize(f"{self.prefix}_{name}" if self.prefix else name)
+
+    @staticmethod
+    def _labels(labels, **extra):
+        pairs = list(labels) + list(extra.items())
+        if not pairs:
+            return ""
+        escaped = (
+            (key, str(value).replace("\\", "\\\\").replace('"', '\\"'))
+            for key, value in pairs
+        )
+        return "{" + ",".join(f'{_sanitize(k)}="{v}"' for k, v in escaped) + "}"
+
+    def render(self, counters, gauges, histograms):
+        lines = []
+        typed = set()
+
+        def declare(name, kind):
+            if name not in typed:
+                typed.add(name)
+                lines.append(f"# TYPE {name} {kind}")
+
+        for (name, labels), value in sorted(counters.items()):
+            metric = self._name(name)
+            if not metric.endswith("_total"):
+                metric += "_total"
+            declare(metric, "counter")
+            lines.append(f"{metric}{self._labels(labels)} {value:g}")
+        for (name, labels), value in sorted(gauges.items()):
+            metric = self._name(name)
+            declare(metric, "gauge")
+            lines.append(f"{metric}{self._labels(labels)} {value:g}")
+        for (name, labels), histogram in sorted(histograms.items()):
+            metric = self._name(name)
+            declare(metric, "histogram")
+            for bound, count in zip(histogram.buckets, histogram.counts, strict=True):
+                le = "+Inf" if math.isinf(bound) else f"{bound:g}"
+                lines.append(f"{metric}_bucket{self._labels(labels, le=le)} {count}")
+            lines.append(f"{metric}_sum{self._labels(labels)} {histogram.sum:g}")
+            lines.append(f"{metric}_count{self._labels(labels)} {histogram.count}")
+        return "\n".join(lines) + "\n"
+
+    def export(self, counters, gauges, histograms):
+        # Written next to the target and renamed so collectors never read half a file
+        tmp = f"{self.path}.{os.getpid()}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            f.write(self.render(counters, gauges, histograms))
+        os.replace(tmp, self.path)
+
+    def close(self):
+        pass
+
+
+class MetricsRegistry:
+    """Thread-safe counters, gauges and histograms for the current process"""
+
+    def __init__(self):
+        self.exporter = None
+        self.buckets = DEFAULT_BUCKETS + (math.inf,)
+        self._counters = {}
+        self._gauges = {}
+        self._histograms = {}
+        self._collectors = []
+        self._lock = threading.Lock()
+        # Serializes exports, which run outside _lock
+        self._export_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._flusher = None
+
+    @property
+    def enabled(self):
+        return self.exporter is not None
+
+    def configure(self, exporter, flush_interval=0):
+        """Start exporting (replacing any previous exporter)"""
+        self.close()
+        self.exporter = exporter
+        if flush_interval > 0:
+            self._stop.clear()
+            self._flusher = threading.Thread(
+                target=self._flush_loop,
+                args=(flush_interval,),
+                name="metrics-flush",
+                daemon=True,
+            )
+            self._flusher.start()
+
+    def increment(self, name, value=1, **labels):
+        if self.exporter is None:
+            return
+        key = (name, _label_key(labels))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def gauge(self, name, value, **labels):
+        if self.exporter is None:
+            return
+        with self._lock:
+            self._gauges[(name, _label_key(labels))] = value
+
+    def observe(self, name, value, **labels):
+        """Add an observation to a histogram"""
+        if self.exporter is None:
+            return
+        key = (name, _label_key(labels))
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = _Histogram(self.buckets)
+            histogram.observe(value)
+
+    @contextmanager
+    def timer(self, name, **labels):
+        """Observe the duration of the block, in seconds"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - start, **labels)
+
+    def add_collector(self, collector):
+        """Call collector() before every export, e.g. to sample a queue depth gauge"""
+        if collector not in self._collectors:
+            self._collectors.append(collector)
+
+    def flush(self):
+        """Export the current values"""
+        exporter = self.exporter
+        if exporter is None:
+            return
+        for collector in list(self._collectors):
+            collector()
+        with self._export_lock:
+            with self._lock:
+                counters = dict(self._counters)
+                gauges = dict(self._gauges)
+                histograms = {
+                    key: histogram.take() for key, histogram in self._histograms.items()
+                }
+            exporter.export(counters, gauges, histograms)
+
+    def _flush_loop(self, interval):
+        while not self._stop.wait(interval):
+            self.flush()
+
+    def close(self):
+        """Export a last time and stop exporting"""
+        if self._flusher is not None:
+            self._stop.set()
+            self._flusher.join()
+            self._flusher = None
+        if self.exporter is not None:
+            self.flush()
+            self.exporter.close()
+            self.exporter = None
+        self._collectors = []
+        with self._lock:
+            self._counters = {}
+            self._gauges = {}
+            self._histograms = {}
+
+
+metrics = MetricsRegistry()
+
+
+def build_exporter(settings):
+    """The exporter for the resolved settings, or None when metrics are off"""
+    if settings["exporter"] == EXPORTER_STATSD:
+        return StatsdExporter(
+            settings["host"], settings["port"], settings["prefix"], settings["tags"]
+        )
+    if settings["exporter"] == EXPORTER_PROMETHEUS:
+        return PrometheusTextfileExporter(settings["path"], settings["prefix"])
+    return None
+
+
+class HandlerCounter:
+    """Handler filter counting the records each handler emits"""
+
+    def __init__(self, handler_name):
+        self.handler_name = handler_name
+
+    def filter(self, record):
+        metrics.increment("log_records_emitted", handler=self.handler_name)
+        return True
+
+
+def instrument_handlers(handlers):
+    """Count the records emitted by each handler (log_records_emitted{handler})"""
+    for handler in handlers:
+        if not any(isinstance(f, HandlerCounter) for f in handler.filters):
+            handler.addFilter(
+                HandlerCounter(handler.get_name() or type(handler).__name__)
+            )
+
+
+def record_dropped(handlers, async_stats=None):
+    """Add the records handlers (and the async queue) report as dropped"""
+    for handler in handlers:
+        stats = getattr(handler, "stats", None)
+        if isinstance(stats, dict) and stats.get("dropped"):
+            metrics.increment(
+                "log_records_dropped",
+                stats["dropped"],
+                handler=handler.get_name() or type(handler).__name__,
+            )
+    if async_stats and async_stats.get("dropped"):
+        metrics.increment(
+            "log_records_dropped", async_stats["dropped"], handler="async_queue"
+        )
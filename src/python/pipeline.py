@@ -0,0 +1,376 @@
+"""
+Streaming source -> transform -> sink pipelines for the batch work.
+
+    pipeline = Pipeline(
+        read_csv("people.csv"),
+        [map_rows(normalize), filter_rows(is_active)],
+        SqliteSink("out.db", "person", ["id", "name"]),
+    )
+    pipeline.run(logger)
+
+Rows are grouped into chunks of `chunk_size` and every stage runs on its own thread,
+connected to the next one by a queue holding at most `buffer_size` chunks. A slow
+stage blocks the ones before it (backpressure), so memory stays bounded by roughly
+(transforms + 1) * buffer_size * chunk_size rows whatever the input size.
+
+The threads run in a copy of the caller's log context (env, team, run_id). When the
+run ends each stage logs its rows, rows/s and the peak depth of its input queue.
+"""
+
+import contextvars
+import csv
+import json
+import queue
+import sqlite3
+import threading
+import time
+from itertools import islice
+
+from structured_log import StructuredLogger, get_logger
+
+DEFAULT_CHUNK_SIZE = 500
+DEFAULT_BUFFER_SIZE = 8
+
+_END = object()
+
+
+class PipelineAborted(Exception):
+    """Raised inside a stage when another stage failed."""
+
+
+# Sources: generators of rows
+
+
+def read_lines(path, encoding="utf-8"):
+    """Lines of a text file, without the line ending"""
+    with open(path, encoding=encoding) as f:
+        for line in f:
+            yield line.rstrip("\r\n")
+
+
+def read_csv(path, encoding="utf-8", **reader_kwargs):
+    """Rows of a CSV file with a header, as dicts"""
+    with open(path, encoding=encoding, newline="") as f:
+        yield from csv.DictReader(f, **reader_kwargs)
+
+
+def read_jsonl(path, encoding="utf-8"):
+    """Objects of a JSON Lines file (blank lines are skipped)"""
+    with open(path, encoding=encoding) as f:
+        for line in f:
+            if line.strip():
+                yield json.loads(line)
+
+
+def read_sqlite(path, query, params=(), fetch_size=DEFAULT_CHUNK_SIZE):
+    """Rows of a query on a local SQLite database, as dicts, fetched in batches"""
+    connection = sqlite3.connect(path)
+    try:
+        connection.row_factory = sqlite3.Row
+        cursor = connection.execute(query, params)
+        while True:
+            rows = cursor.fetchmany(fetch_size)
+            if not rows:
+                break
+            for row in rows:
+                yield dict(row)
+    finally:
+        connection.close()
+
+
+# Transforms: functions from a chunk (list of rows) to an iterable of rows
+
+
+class Transform:
+    """A named chunk -> rows function"""
+
+    def __init__(self, fn, name=None):
+        self.fn = fn
+        self.name = name or getattr(fn, "__name__", "transform")
+
+
+def map_rows(fn, name=None):
+    """Apply fn to every row"""
+    return Transform(lambda chunk: [fn(row) for row in chunk], name or fn.__name__)
+
+
+def filter_rows(predicate, name=None):
+    """Keep the rows for which predicate is true"""
+    return Transform(
+        lambda chunk: [row for row in chunk if predicate(row)],
+        name or predicate.__name__,
+    )
+
+
+def chunk_transform(fn, name=None):
+    """Apply fn to a whole chunk at once (e.g. a vectorized or bulk lookup step)"""
+    return Transform(fn, name)
+
+
+# Sinks: objects with write(chunk) and close()
+
+
+class CallbackSink:
+    """Calls fn(rows) once per chunk"""
+
+    name = "callback"
+
+    def __init__(self, fn):
+        self.fn = fn
+
+    def write(self, rows):
+        self.fn(rows)
+
+    def close(self):
+        pass
+
+
+class JsonlSink:
+    """Appends rows to a JSON Lines file"""
+
+    name = "jsonl"
+
+    def __init__(self, path, encoding="utf-8"):
+        self.file = open(path, "w", encoding=encoding)
+
+    def write(self, rows):
+        self.file.write("".join(json.dumps(row, default=str) + "\n" for row in rows))
+
+    def close(self):
+        self.file.close()
+
+
+class CsvSink:
+    """Writes dict rows to a CSV file with a header"""
+
+    name = "csv"
+
+    def __init__(self, path, fieldnames, encoding="utf-8"):
+        self.file = open(path, "w", encoding=encoding, newline="")
+        self.writer = csv.DictWriter(self.file, fieldnames, extrasaction="ignore")
+        self.writer.writeheader()
+
+    def write(self, rows):
+        self.writer.writerows(rows)
+
+    def close(self):
+        self.file.close()
+
+
+class SqliteSink:
+    """Inserts dict rows into a SQLite table, committing every `commit_rows` rows"""
+
+    name = "sqlite"
+
+    def __init__(self, path, table, columns, commit_rows=10000):
+        self.connection = sqlite3.connect(path, check_same_thread=False)
+        self.columns = list(columns)
+        self.commit_rows = commit_rows
+        self._uncommitted = 0
+        column_list = ", ".join(self.columns)
+        placeholders = ", ".join("?" for _ in self.columns)
+        self.connection.execute(f"CREATE TABLE IF NOT EXISTS {table} ({column_list})")
+        self.insert = f"INSERT INTO {table} ({column_list}) VALUES ({placeholders})"
+
+    def write(self, rows):
+        self.connection.executemany(
+            self.insert, ([row.get(c) for c in self.columns] for row in rows)
+        )
+        self._uncommitted += len(rows)
+        if self._uncommitted >= self.commit_rows:
+            self.connection.commit()
+            self._uncommitted = 0
+
+    def close(self):
+        self.connection.commit()
+        self.connection.close()
+
+
+class StageStats:
+    """Rows, busy time and input queue depth of one stage"""
+
+    def __init__(self, name):
+        self.name = name
+        self.rows = 0
+        self.seconds = 0.0
+        self.queue_max = 0
+
+    @property
+    def rows_per_second(self):
+        return self.rows / self.seconds if self.seconds else 0.0
+
+
+def _chunks(rows, size):
+    iterator = iter(rows)
+    while True:
+        chunk = list(islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+class Pipeline:
+    """
+    A source, transforms and a sink connected by bounded queues.
+
+    :param source: any iterable of rows (see read_csv, read_jsonl, read_sqlite...)
+    :param transforms: Transform objects applied in order
+    :param sink: object with write(rows) and close()
+    :param chunk_size: rows per chunk passed between stages
+    :param buffer_size: chunks each queue may hold before the producer blocks
+    """
+
+    def __init__(
+        self,
+        source,
+        transforms=(),
+        sink=None,
+        chunk_size=DEFAULT_CHUNK_SIZE,
+        buffer_size=DEFAULT_BUFFER_SIZE,
+    ):
+        self.source = source
+        self.transforms = list(transforms)
+        self.sink = sink or CallbackSink(lambda rows: None)
+        self.chunk_size = chunk_size
+        self.buffer_size = buffer_size
+        self.stats = []
+        self._abort = threading.Event()
+        self._errors = []
+
+    def _put(self, q, item, stats):
+        while True:
+            if self._abort.is_set():
+                raise PipelineAborted()
+            try:
+                q.put(item, timeout=0.1)
+                stats.queue_max = max(stats.queue_max, q.qsize())
+                return
+            except queue.Full:
+                continue
+
+    def _get(self, q):
+        while True:
+            if self._abort.is_set():
+                raise PipelineAborted()
+            try:
+                return q.get(timeout=0.1)
+            except queue.Empty:
+                continue
+
+    def _run_source(self, out, stats, next_stats):
+        iterator = _chunks(self.source, self.chunk_size)
+        while True:
+            start = time.perf_counter()
+            chunk = next(iterator, _END)
+            stats.seconds += time.perf_counter() - start
+            if chunk is _END:
+                break
+            stats.rows += len(chunk)
+            self._put(out, chunk, next_stats)
+        self._put(out, _END, next_stats)
+
+    def _run_transform(self, transform, inq, out, stats, next_stats):
+        while True:
+            chunk = self._get(inq)
+            if chunk is _END:
+                break
+            start = time.perf_counter()
+            rows = list(transform.fn(chunk))
+            stats.seconds += time.perf_counter() - start
+            stats.rows += len(rows)
+            if rows:
+                self._put(out, rows, next_stats)
+        self._put(out, _END, next_stats)
+
+    def _run_sink(self, inq, stats):
+        try:
+            while True:
+                chunk = self._get(inq)
+                if chunk is _END:
+                    break
+                start = time.perf_counter()
+                self.sink.write(chunk)
+                stats.seconds += time.perf_counter() - start
+                stats.rows += len(chunk)
+        finally:
+            self.sink.close()
+
+    def _guarded(self, target, *args):
+        try:
+            target(*args)
+        except PipelineAborted:
+            pass
+        except BaseException as e:
+            self._errors.append(e)
+            self._abort.set()
+
+    def run(self, logger=None):
+        """Run to completion, log per-stage stats and return them (StageStats list)"""
+        names = ["source"] + [t.name for t in self.transforms] + [self.sink.name]
+        self.stats = [StageStats(name) for name in names]
+        queues = [queue.Queue(maxsize=self.buffer_size) for _ in names[1:]]
+
+        threads = [
+            (self._run_source, (queues[0], self.stats[0], self.stats[1])),
+        ]
+        for i, transform in enumerate(self.transforms):
+            threads.append(
+                (
+                    self._run_transform,
+                    (
+                        transform,
+                        queues[i],
+                        queues[i + 1],
+                        self.stats[i + 1],
+                        self.stats[i + 2],
+                    ),
+                )
+            )
+        started = []
+        wall_start = time.perf_counter()
+        for target, args in threads:
+            # Each stage logs with the caller's bound context
+            thread = threading.Thread(
+                target=contextvars.copy_context().run,
+                args=(self._guarded, target, *args),
+                name=f"pipeline-{target.__name__.removeprefix('_run_')}",
+                daemon=True,
+            )
+            thread.start()
+            started.append(thread)
+
+        self._guarded(self._run_sink, queues[-1], self.stats[-1])
+        for thread in started:
+            thread.join()
+        elapsed = time.perf_counter() - wall_start
+
+        if logger is not None:
+            self.log_stats(logger, elapsed)
+        if self._errors:
+            raise self._errors[0]
+        return self.stats
+
+    def log_stats(self, logger, elapsed):
+        if not isinstance(logger, StructuredLogger):
+            logger = get_logger(logger)
+        for stats in self.stats:
+            logger.info(
+                "Stage %s: %d rows, %.2f s busy (%.0f rows/s), input queue max %d/%d",
+                stats.name,
+                stats.rows,
+                stats.seconds,
+                stats.rows_per_second,
+                stats.queue_max,
+                self.buffer_size,
+                stage=stats.name,
+                stage_rows=stats.rows,
+                stage_rows_per_s=round(stats.rows_per_second, 1),
+                stage_queue_max=stats.queue_max,
+            )
+        rows = self.stats[-1].rows
+        logger.info(
+            "Pipeline wrote %d rows in %.2f s (%.0f rows/s)",
+            rows,
+            elapsed,
+            rows / elapsed if elapsed else 0.0,
+        )
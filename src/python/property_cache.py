@@ -0,0 +1,261 @@
+"""
+Local on-disk cache for Athena properties.
+
+Entries are keyed by (app, env, team, profiles), encrypted at rest with a key derived
+from ATHENA_SECRET and authenticated with an HMAC over the cache key and the file, so
+a tampered or truncated file, or one copied over another key's entry, is treated as a
+miss rather than trusted.
+
+Lookup order:
+
+- a fresh entry (younger than the TTL) is returned immediately; once it is older than
+  `revalidate_after` it is also refreshed from Athena on a background thread.
+- a stale entry is only used as the last-known-good snapshot when Athena fails or does
+  not answer within `fetch_timeout`.
+- no entry means a normal, blocking fetch.
+
+The cache is enabled by setting ATHENA_CACHE_DIR. ATHENA_CACHE_TTL,
+ATHENA_CACHE_REVALIDATE_AFTER and ATHENA_CACHE_FETCH_TIMEOUT (seconds) tune it.
+"""
+
+import hashlib
+import hmac
+import json
+import logging
+import os
+import struct
+import tempfile
+import threading
+import time
+
+DEFAULT_TTL = 3600.0
+DEFAULT_REVALIDATE_AFTER = 300.0
+DEFAULT_FETCH_TIMEOUT = 10.0
+
+_MAGIC = b"TPC1"
+_NONCE_SIZE = 16
+_TAG_SIZE = 32
+_HEADER = struct.Struct(">4s16sd")
+
+logger = logging.getLogger("test")
+
+
+class CacheIntegrityError(Exception):
+    """Raised when a cache file fails its integrity check."""
+
+
+def _keystream(key, nonce, length):
+    # HMAC-SHA256 in counter mode
+    blocks = []
+    for counter in range((length + 31) // 32):
+        blocks.append(hmac.digest(key, nonce + counter.to_bytes(8, "big"), "sha256"))
+    return b"".join(blocks)[:length]
+
+
+def _xor(data, stream):
+    return (int.from_bytes(data, "big") ^ int.from_bytes(stream, "big")).to_bytes(
+        len(data), "big"
+    )
+
+
+class PropertyCache:
+    """Encrypted, TTL-bound cache of Athena property payloads."""
+
+    def __init__(
+        self,
+        cache_dir,
+        secret,
+        ttl=DEFAULT_TTL,
+        revalidate_after=DEFAULT_REVALIDATE_AFTER,
+        fetch_timeout=DEFAULT_FETCH_TIMEOUT,
+    ):
+        if not secret:
+            raise ValueError("A secret is required to encrypt the property cache")
+        self.cache_dir = cache_dir
+        self.ttl = ttl
+        self.revalidate_after = revalidate_after
+        self.fetch_timeout = fetch_timeout
+        secret_bytes = secret.encode("utf-8")
+        self._enc_key = hmac.digest(secret_bytes, b"property-cache:enc", "sha256")
+        self._mac_key = hmac.digest(secret_bytes, b"property-cache:mac", "sha256")
+        self.stats = {
+            "hits": 0,
+            "misses": 0,
+            "stale_fallbacks": 0,
+            "revalidations": 0,
+            "errors": 0,
+        }
+        # Counters are updated from the revalidation and fetch threads too
+        self._stats_lock = threading.Lock()
+        self._threads = []
+
+    def _count(self, name):
+        with self._stats_lock:
+            self.stats[name] += 1
+
+    def _mac(self, key, body):
+        # Binds the entry to its key: a file copied to another key's path fails
+        encoded_key = "\0".join(key).encode("utf-8")
+        return hmac.digest(
+            self._mac_key,
+            len(encoded_key).to_bytes(4, "big") + encoded_key + body,
+            "sha256",
+        )
+
+    def path_for(self, key):
+        """Cache file path for a (app, env, team, profiles) key"""
+        digest = hashlib.sha256("\0".join(key).encode("utf-8")).hexdigest()
+        return os.path.join(self.cache_dir, f"{digest}.cache")
+
+    def load(self, key):
+        """
+        Read an entry.
+
+        Returns (properties, age_in_seconds), or None when there is no entry. Raises
+        CacheIntegrityError when the file was tampered with, written with another secret
+        or written for another cache key.
+        """
+        try:
+            with open(self.path_for(key), "rb") as f:
+                blob = f.read()
+        except FileNotFoundError:
+            return None
+
+        if len(blob) < _HEADER.size + _TAG_SIZE:
+            raise CacheIntegrityError("Cache file is truncated")
+        body, tag = blob[:-_TAG_SIZE], blob[-_TAG_SIZE:]
+        if not hmac.compare_digest(tag, self._mac(key, body)):
+            raise CacheIntegrityError("Cache file failed its integrity check")
+
+        magic, nonce, created = _HEADER.unpack_from(body)
+        if magic != _MAGIC:
+            raise CacheIntegrityError("Unknown cache file format")
+        ciphertext = body[_HEADER.size :]
+        plaintext = _xor(ciphertext, _keystream(self._enc_key, nonce, len(ciphertext)))
+        return json.loads(plaintext), max(0.0, time.time() - created)
+
+    def store(self, key, properties):
+        """Atomically write an entry readable only by the current user"""
+        os.makedirs(self.cache_dir, mode=0o700, exist_ok=True)
+        plaintext = json.dumps(properties, separators=(",", ":")).encode("utf-8")
+        nonce = os.urandom(_NONCE_SIZE)
+        body = _HEADER.pack(_MAGIC, nonce, time.time())
+        body += _xor(plaintext, _keystream(self._enc_key, nonce, len(plaintext)))
+        blob = body + self._mac(key, body)
+
+        fd, tmp_path = tempfile.mkstemp(dir=self.cache_dir, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(blob)
+            os.replace(tmp_path, self.path_for(key))
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.unlink(tmp_path)
+            raise
+
+    def get_or_fetch(self, key, fetch, refresh=False):
+        """
+        Return the properties for `key`, from the cache when possible.
+
+        `fetch` is called with no arguments and returns the properties (or None on
+        failure). With `refresh` the cache is bypassed for reading but still updated.
+        """
+        entry = None
+        if not refresh:
+            try:
+                entry = self.load(key)
+            except (CacheIntegrityError, ValueError) as e:
+                self._count("errors")
+                logger.warning("Ignoring unreadable property cache entry: %s", e)
+
+        if entry is not None and entry[1] < self.ttl:
+            self._count("hits")
+            properties, age = entry
+            if age >= self.revalidate_after:
+                self._start_thread(self._revalidate, key, fetch)
+            return properties
+
+        self._count("misses")
+        if entry is None:
+            properties = fetch()
+            if properties is not None:
+                self._store_quietly(key, properties)
+            return properties
+
+        # Stale entry: give Athena a bounded amount of time, then fall back to it
+        result = {}
+        worker = self._start_thread(self._fetch_into, key, fetch, result)
+        worker.join(self.fetch_timeout)
+        if result.get("properties") is not None:
+            return result["properties"]
+
+        self._count("stale_fallbacks")
+        reason = result.get("error") or "timed out"
+        logger.warning(
+            "Athena fetch failed (%s); using last-known-good properties", reason
+        )
+        return entry[0]
+
+    def _revalidate(self, key, fetch):
+        properties = fetch()
+        if properties is not None:
+            self._store_quietly(key, properties)
+            self._count("revalidations")
+
+    def _fetch_into(self, key, fetch, result):
+        try:
+            properties = fetch()
+        except Exception as e:
+            result["error"] = repr(e)
+            return
+        if properties is None:
+            result["error"] = "no properties returned"
+            return
+        self._store_quietly(key, properties)
+        result["properties"] = properties
+
+    def _store_quietly(self, key, properties):
+        try:
+            self.store(key, properties)
+        except (OSError, TypeError, ValueError) as e:
+            self._count("errors")
+            logger.warning("Could not write property cache: %s", e)
+
+    def _start_thread(self, target, *args):
+        def run():
+            try:
+                target(*args)
+            except Exception as e:
+                self._count("errors")
+                logger.debug("Background property fetch failed: %s", e)
+
+        thread = threading.Thread(target=run, name="property-cache", daemon=True)
+        self._threads.append(thread)
+        thread.start()
+        return thread
+
+    def close(self, timeout=DEFAULT_FETCH_TIMEOUT):
+        """Give background revalidation a chance to finish before the process exits"""
+        deadline = time.monotonic() + timeout
+        for thread in self._threads:
+            thread.join(max(0.0, deadline - time.monotonic()))
+        self._threads = []
+
+
+def open_property_cache():
+    """Build a PropertyCache from the environment, or None when caching is not enabled"""
+    cache_dir = os.environ.get("ATHENA_CACHE_DIR")
+    secret = os.environ.get("ATHENA_SECRET")
+    if not cache_dir or not secret:
+        return None
+    return PropertyCache(
+        cache_dir,
+        secret,
+        ttl=float(os.environ.get("ATHENA_CACHE_TTL", DEFAULT_TTL)),
+        revalidate_after=float(
+            os.environ.get("ATHENA_CACHE_REVALIDATE_AFTER", DEFAULT_REVALIDATE_AFTER)
+        ),
+        fetch_timeout=float(
+            os.environ.get("ATHENA_CACHE_FETCH_TIMEOUT", DEFAULT_FETCH_TIMEOUT)
+        ),
+    )
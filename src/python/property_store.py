@@ -0,0 +1,181 @@
+"""
+Indexed, typed and immutable view of the Athena properties.
+
+Built once from the get_properties() payload, a PropertyStore gives O(1) lookups,
+prefix/namespace queries over a sorted key index and typed accessors whose parsing is
+memoized, instead of scanning the raw payload with get_property_value for every key.
+
+The store never changes after it is built, so one instance can be shared freely
+between threads, and it pickles as a plain dict for worker processes.
+"""
+
+import re
+from bisect import bisect_left
+from collections.abc import Mapping
+
+_MISSING = object()
+
+_TRUE_VALUES = ("true", "yes", "on", "1")
+_FALSE_VALUES = ("false", "no", "off", "0")
+
+_DURATION_UNITS = {
+    "ms": 0.001,
+    "s": 1.0,
+    "m": 60.0,
+    "h": 3600.0,
+    "d": 86400.0,
+}
+_DURATION_RE = re.compile(r"^\s*(\d+(?:\.\d+)?)\s*(ms|s|m|h|d)?\s*$", re.IGNORECASE)
+
+
+def flatten_properties(payload):
+    """
+    Turn a get_properties() payload into a flat {"dotted.key": value} dict.
+
+    Accepts a flat mapping, a nested mapping (keys are joined with dots) or a Spring
+    Cloud Config style payload with "propertySources", where earlier sources win.
+    """
+    if not isinstance(payload, Mapping):
+        raise TypeError(f"Unsupported properties payload: {type(payload).__name__}")
+
+    sources = payload.get("propertySources")
+    if isinstance(sources, list):
+        flat = {}
+        for source in reversed(sources):
+            flat.update(flatten_properties(source.get("source", {})))
+        return flat
+
+    flat = {}
+    _flatten_into(flat, "", payload)
+    return flat
+
+
+def _flatten_into(flat, prefix, mapping):
+    for key, value in mapping.items():
+        full_key = f"{prefix}{key}"
+        if isinstance(value, Mapping) and value:
+            _flatten_into(flat, full_key + ".", value)
+        else:
+            flat[full_key] = value
+
+
+def parse_bool(value):
+    if isinstance(value, bool):
+        return value
+    text = str(value).strip().lower()
+    if text in _TRUE_VALUES:
+        return True
+    if text in _FALSE_VALUES:
+        return False
+    raise ValueError(f"Not a boolean: {value!r}")
+
+
+def parse_duration(value):
+    """Seconds from a number or a string like '250ms', '30s', '5m', '1h' or '2d'"""
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return float(value)
+    match = _DURATION_RE.match(str(value))
+    if not match:
+        raise ValueError(f"Not a duration: {value!r}")
+    number, unit = match.groups()
+    return float(number) * _DURATION_UNITS[(unit or "s").lower()]
+
+
+def parse_list(value):
+    """A list from a list value or a comma separated string"""
+    if isinstance(value, (list, tuple)):
+        return list(value)
+    return [item.strip() for item in str(value).split(",") if item.strip()]
+
+
+class PropertyStore(Mapping):
+    """Immutable mapping of flattened property keys to values"""
+
+    __slots__ = ("_data", "_keys", "_memo")
+
+    def __init__(self, properties=None):
+        self._data = dict(properties or {})
+        self._keys = sorted(self._data)
+        self._memo = {}
+
+    @classmethod
+    def from_athena(cls, payload):
+        """Build a store from a get_properties() payload (None stays None)"""
+        if payload is None:
+            return None
+        return cls(flatten_properties(payload))
+
+    def __getitem__(self, key):
+        return self._data[key]
+
+    def __iter__(self):
+        return iter(self._keys)
+
+    def __len__(self):
+        return len(self._data)
+
+    def __repr__(self):
+        return f"PropertyStore({len(self._data)} properties)"
+
+    def __reduce__(self):
+        return (PropertyStore, (self._data,))
+
+    def keys_with_prefix(self, prefix):
+        """Sorted keys starting with prefix, found by bisecting the key index"""
+        start = bisect_left(self._keys, prefix)
+        end = start
+        while end < len(self._keys) and self._keys[end].startswith(prefix):
+            end += 1
+        return self._keys[start:end]
+
+    def with_prefix(self, prefix):
+        """Dict of every property whose key starts with prefix (keys unchanged)"""
+        return {key: self._data[key] for key in self.keys_with_prefix(prefix)}
+
+    def namespace(self, name):
+        """
+        A new store with everything under `name.` and the prefix stripped,
+        e.g. namespace("database")["url"] for "database.url".
+        """
+        prefix = name.rstrip(".") + "."
+        return PropertyStore(
+            {
+                key[len(prefix) :]: self._data[key]
+                for key in self.keys_with_prefix(prefix)
+            }
+        )
+
+    def _typed(self, kind, parse, key, default):
+        memo_key = (kind, key)
+        try:
+            return self._memo[memo_key]
+        except KeyError:
+            pass
+        if key not in self._data:
+            if default is _MISSING:
+                raise KeyError(key)
+            return default
+        value = parse(self._data[key])
+        self._memo[memo_key] = value
+        return value
+
+    def get_str(self, key, default=_MISSING):
+        return self._typed("str", str, key, default)
+
+    def get_int(self, key, default=_MISSING):
+        return self._typed("int", int, key, default)
+
+    def get_float(self, key, default=_MISSING):
+        return self._typed("float", float, key, default)
+
+    def get_bool(self, key, default=_MISSING):
+        return self._typed("bool", parse_bool, key, default)
+
+    def get_duration(self, key, default=_MISSING):
+        """Duration in seconds, see parse_duration"""
+        return self._typed("duration", parse_duration, key, default)
+
+    def get_list(self, key, default=_MISSING):
+        """List value (comma separated strings are split); a new list on every call"""
+        value = self._typed("list", lambda v: tuple(parse_list(v)), key, default)
+        return list(value) if isinstance(value, tuple) else value
@@ -0,0 +1,303 @@
+"""
+Live reload for long-running jobs: a config file watcher and refreshed properties.
+
+    watcher = ConfigWatcher("log-config.yaml", on_change)
+    watcher.start()          # on_change(path) runs on the watcher thread
+
+    properties = LiveProperties(store, fetch, interval=300, logger=logger)
+    properties.start()       # properties.get_int(...) always reads the latest snapshot
+
+ConfigWatcher uses inotify (through ctypes, on the file's directory so editors that
+replace the file and Kubernetes ConfigMap symlink swaps are seen) and falls back to
+polling os.stat where inotify is unavailable. Either way a change is only reported
+when the file's stat signature (inode, size, mtime) really changed, after a short
+debounce so half-written files are not loaded.
+
+LiveProperties publishes every successful refresh as a new immutable PropertyStore by
+swapping one reference: readers never see a half-updated set of properties. A failed
+refresh keeps the current snapshot. Pickling a LiveProperties (e.g. to send it to
+worker processes) sends the current snapshot; listeners added with add_listener() are
+called with every new one (e.g. to publish it to worker processes).
+"""
+
+import contextvars
+import ctypes
+import ctypes.util
+import os
+import select
+import struct
+import threading
+import time
+from collections.abc import Mapping
+
+from structured_log import StructuredLogger, get_logger
+
+DEFAULT_POLL_INTERVAL = 1.0
+DEFAULT_DEBOUNCE = 0.2
+
+# inotify(7) event masks
+_IN_MODIFY = 0x00000002
+_IN_ATTRIB = 0x00000004
+_IN_CLOSE_WRITE = 0x00000008
+_IN_MOVED_TO = 0x00000080
+_IN_CREATE = 0x00000100
+_IN_DELETE = 0x00000200
+_WATCH_MASK = (
+    _IN_MODIFY | _IN_ATTRIB | _IN_CLOSE_WRITE | _IN_MOVED_TO | _IN_CREATE | _IN_DELETE
+)
+_EVENT_HEADER = struct.Struct("iIII")
+
+
+def _start_thread(target, name):
+    # The thread logs with the context (run_id, env, team) of the code that started it
+    thread = threading.Thread(
+        target=contextvars.copy_context().run, args=(target,), name=name, daemon=True
+    )
+    thread.start()
+    return thread
+
+
+def _as_structured(logger):
+    if logger is None or isinstance(logger, StructuredLogger):
+        return logger
+    return get_logger(logger)
+
+
+def file_signature(path):
+    """What identifies a version of the file (None when it does not exist)"""
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return (st.st_dev, st.st_ino, st.st_size, st.st_mtime_ns)
+
+
+class _Inotify:
+    """Minimal inotify binding: a watch on one directory"""
+
+    def __init__(self, directory):
+        libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+        if not hasattr(libc, "inotify_init1"):
+            raise OSError("inotify is not available")
+        self.fd = libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        if libc.inotify_add_watch(self.fd, os.fsencode(directory), _WATCH_MASK) < 0:
+            errno = ctypes.get_errno()
+            os.close(self.fd)
+            raise OSError(errno, f"inotify_add_watch failed on {directory}")
+
+    def wait(self, timeout):
+        """Wait for events; returns the names of the directory entries that changed"""
+        readable, _, _ = select.select([self.fd], [], [], timeout)
+        if not readable:
+            return []
+        try:
+            data = os.read(self.fd, 64 * 1024)
+        except BlockingIOError:
+            return []
+        names = []
+        offset = 0
+        while offset + _EVENT_HEADER.size <= len(data):
+            _, _, _, length = _EVENT_HEADER.unpack_from(data, offset)
+            offset += _EVENT_HEADER.size
+            names.append(os.fsdecode(data[offset : offset + length].rstrip(b"\0")))
+            offset += length
+        return names
+
+    def close(self):
+        os.close(self.fd)
+
+
+class ConfigWatcher:
+    """
+    Calls on_change(path) on a background thread whenever the file changes.
+
+    :param use_inotify: False forces stat polling
+    """
+
+    def __init__(
+        self,
+        path,
+        on_change,
+        poll_interval=DEFAULT_POLL_INTERVAL,
+        debounce=DEFAULT_DEBOUNCE,
+        use_inotify=True,
+        logger=None,
+    ):
+        self.path = os.path.abspath(path)
+        self.on_change = on_change
+        self.poll_interval = poll_interval
+        self.debounce = debounce
+        self.logger = _as_structured(logger)
+        self.mode = None
+        self._use_inotify = use_inotify
+        self._inotify = None
+        self._signature = file_signature(self.path)
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        if self._use_inotify:
+            try:
+                self._inotify = _Inotify(os.path.dirname(self.path))
+            except OSError as e:
+                if self.logger is not None:
+                    self.logger.debug(
+                        "inotify unavailable (%s), polling %s", e, self.path
+                    )
+        self.mode = "inotify" if self._inotify is not None else "poll"
+        self._thread = _start_thread(self._run, "config-watcher")
+        return self
+
+    def _run(self):
+        while not self._stop.is_set():
+            if self._inotify is not None:
+                # Wake up regularly anyway, to notice stop() and missed events
+                self._inotify.wait(self.poll_interval)
+            else:
+                self._stop.wait(self.poll_interval)
+            if self._stop.is_set():
+                break
+            self.check()
+
+    def check(self):
+        """Report a change if the file's signature differs from the last one seen"""
+        if file_signature(self.path) == self._signature:
+            return False
+        # Let the writer finish, then take the signature of what will be loaded
+        self._stop.wait(self.debounce)
+        signature = file_signature(self.path)
+        if signature is None or signature == self._signature:
+            return False
+        self._signature = signature
+        try:
+            self.on_change(self.path)
+        except Exception as e:
+            if self.logger is not None:
+                self.logger.exception("Config change handler failed: %s", e)
+        return True
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        if self._inotify is not None:
+            self._inotify.close()
+            self._inotify = None
+
+
+class LiveProperties(Mapping):
+    """
+    A PropertyStore that is replaced by a fresh snapshot every `interval` seconds.
+
+    Mapping access and PropertyStore methods (get_int, namespace...) go to the current
+    snapshot. Code that needs several values from one consistent version should take
+    snapshot() once and read from it.
+    """
+
+    def __init__(self, store, fetch, interval, logger=None):
+        self._current = store
+        self.fetch = fetch
+        self.interval = interval
+        self.logger = _as_structured(logger)
+        self.version = 1
+        self.stats = {"refreshes": 0, "failures": 0}
+        self._listeners = []
+        self._stop = threading.Event()
+        self._thread = None
+
+    def snapshot(self):
+        return self._current
+
+    def add_listener(self, callback):
+        """Call `callback(store)` on the refresh thread after each new snapshot"""
+        self._listeners.append(callback)
+
+    def remove_listener(self, callback):
+        self._listeners.remove(callback)
+
+    def __getitem__(self, key):
+        return self._current[key]
+
+    def __iter__(self):
+        return iter(self._current)
+
+    def __len__(self):
+        return len(self._current)
+
+    def __getattr__(self, name):
+        # Only called for attributes LiveProperties does not define itself
+        if name.startswith("_"):
+            raise AttributeError(name)
+        return getattr(self._current, name)
+
+    def __reduce__(self):
+        return self._current.__reduce__()
+
+    def __repr__(self):
+        return f"LiveProperties(version {self.version}, {self._current!r})"
+
+    def start(self):
+        self._thread = _start_thread(self._run, "property-refresh")
+        return self
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.refresh()
+
+    def refresh(self):
+        """Fetch and publish a new snapshot; returns True when it was published"""
+        start = time.perf_counter()
+        try:
+            store = self.fetch()
+            if store is None:
+                raise ValueError("Athena returned no properties")
+        except Exception as e:
+            self.stats["failures"] += 1
+            if self.logger is not None:
+                self.logger.warning(
+                    "Property refresh failed after %.1f ms, keeping version %d: %s",
+                    (time.perf_counter() - start) * 1000,
+                    self.version,
+                    e,
+                    reload_status="failed",
+                )
+            return False
+
+        previous = self._current
+        changed = sum(
+            1
+            for key in set(previous) | set(store)
+            if previous.get(key, None) != store.get(key, None)
+        )
+        self._current = store
+        self.version += 1
+        self.stats["refreshes"] += 1
+        if self.logger is not None:
+            self.logger.info(
+                "Properties refreshed in %.1f ms: version %d, %d changed",
+                (time.perf_counter() - start) * 1000,
+                self.version,
+                changed,
+                reload_status="ok",
+                reload_ms=round((time.perf_counter() - start) * 1000, 1),
+                properties_version=self.version,
+                properties_changed=changed,
+            )
+        for callback in list(self._listeners):
+            try:
+                callback(store)
+            except Exception as e:
+                if self.logger is not None:
+                    self.logger.warning(
+                        "Property listener failed for version %d: %s", self.version, e
+                    )
+        return True
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
@@ -0,0 +1,388 @@
+"""
+Deadlines, jittered retries, hedging and a circuit breaker around the Athena fetch.
+
+    fetcher = open_resilient_fetcher()
+    payload = fetcher.fetch(("test", env, team, profiles), call)
+
+`call` makes one Athena round trip (e.g. Pythena(...).get_properties()). Each attempt
+runs on a daemon thread, so an attempt that hangs past `attempt_timeout` is abandoned
+instead of holding the job (and the process exit) hostage:
+
+- attempts that raise or time out are retried with full-jitter exponential backoff,
+  up to `retries` times and within `total_timeout` overall.
+- when an attempt is slower than the `hedge_percentile` latency of the recent
+  successful fetches, a second (hedged) attempt is started next to it and the first
+  answer wins.
+- a circuit breaker per key opens after `failure_threshold` failed fetches. While it
+  is open, fetches fail fast with CircuitOpenError (the property cache then serves
+  its last-known-good snapshot) until `reset_timeout` has passed and one trial fetch
+  is let through.
+
+A None payload is an answer, not a failure: Pythena returns None when the credentials
+are wrong, which retrying does not fix.
+
+With ATHENA_BREAKER_DIR set the breaker state and the latency history are kept in
+that directory, so they carry over to the next runs (last writer wins between
+concurrent runs). Tuned with ATHENA_ATTEMPT_TIMEOUT, ATHENA_TOTAL_TIMEOUT,
+ATHENA_RETRIES, ATHENA_HEDGE_PERCENTILE (0 disables hedging),
+ATHENA_BREAKER_THRESHOLD and ATHENA_BREAKER_RESET (seconds).
+"""
+
+import contextvars
+import hashlib
+import json
+import os
+import queue
+import random
+import tempfile
+import threading
+import time
+
+from structured_log import get_logger
+
+DEFAULT_ATTEMPT_TIMEOUT = 10.0
+DEFAULT_TOTAL_TIMEOUT = 30.0
+DEFAULT_RETRIES = 2
+DEFAULT_BACKOFF_INITIAL = 0.5
+DEFAULT_BACKOFF_MAX = 5.0
+DEFAULT_HEDGE_PERCENTILE = 0.95
+DEFAULT_FAILURE_THRESHOLD = 3
+DEFAULT_RESET_TIMEOUT = 60.0
+# Successful fetch latencies kept per key for the hedging percentile
+LATENCY_WINDOW = 50
+# Below this many samples there is no percentile to hedge on
+HEDGE_MIN_SAMPLES = 5
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+logger = get_logger("test")
+
+
+class FetchError(Exception):
+    """The Athena fetch failed within its deadlines"""
+
+
+class FetchTimeout(FetchError):
+    """No attempt answered before the deadline"""
+
+
+class CircuitOpenError(FetchError):
+    """The breaker is open: Athena failed recently and is not called"""
+
+
+def _percentile(values, fraction):
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(fraction * len(ordered)) - 1))
+    return ordered[index]
+
+
+class CircuitBreaker:
+    """
+    Failure counting breaker for one key, optionally persisted to a JSON file.
+
+    Also keeps the recent successful latencies, which the hedging decision uses.
+    """
+
+    def __init__(
+        self,
+        path=None,
+        failure_threshold=DEFAULT_FAILURE_THRESHOLD,
+        reset_timeout=DEFAULT_RESET_TIMEOUT,
+    ):
+        self.path = path
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._lock = threading.Lock()
+        self._state = self._load()
+
+    def _load(self):
+        state = {"state": CLOSED, "failures": 0, "changed_at": 0.0, "latencies": []}
+        if self.path is None:
+            return state
+        try:
+            with open(self.path) as f:
+                state.update(json.load(f))
+        except (OSError, ValueError):
+            # Missing or unreadable: start closed
+            pass
+        return state
+
+    def _save(self):
+        if self.path is None:
+            return
+        directory = os.path.dirname(self.path)
+        try:
+            os.makedirs(directory, exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+            with os.fdopen(fd, "w") as f:
+                json.dump(self._state, f)
+            os.replace(tmp_path, self.path)
+        except OSError as e:
+            logger.warning("Could not save the Athena circuit breaker state: %s", e)
+
+    @property
+    def state(self):
+        return self._state["state"]
+
+    @property
+    def latencies(self):
+        return list(self._state["latencies"])
+
+    def _set(self, state, failures):
+        self._state.update(state=state, failures=failures, changed_at=time.time())
+
+    def allow(self):
+        """Whether a fetch may call Athena now (an open breaker allows one trial)"""
+        with self._lock:
+            if self.path is not None:
+                # Another run may have opened or closed it meanwhile
+                self._state = self._load()
+            if self._state["state"] == CLOSED:
+                return True
+            if time.time() - self._state["changed_at"] < self.reset_timeout:
+                return False
+            # Open long enough (or a stale trial): let one trial through
+            self._set(HALF_OPEN, self._state["failures"])
+            self._save()
+            return True
+
+    def record_success(self, latency):
+        with self._lock:
+            was_open = self._state["state"] != CLOSED
+            latencies = self._state["latencies"][-(LATENCY_WINDOW - 1) :]
+            self._state["latencies"] = latencies + [round(latency, 4)]
+            if was_open or self._state["failures"]:
+                self._set(CLOSED, 0)
+            self._save()
+        if was_open:
+            logger.info("Athena circuit breaker closed", breaker_state=CLOSED)
+
+    def record_failure(self):
+        with self._lock:
+            failures = self._state["failures"] + 1
+            opened = self._state["state"] == HALF_OPEN or (
+                self._state["state"] == CLOSED and failures >= self.failure_threshold
+            )
+            if opened:
+                self._set(OPEN, failures)
+            else:
+                self._state["failures"] = failures
+            self._save()
+        if opened:
+            logger.warning(
+                "Athena circuit breaker opened after %d failed fetches, "
+                "failing fast for %.0f s",
+                failures,
+                self.reset_timeout,
+                breaker_state=OPEN,
+            )
+
+
+class ResilientFetcher:
+    """
+    Runs Athena fetches with deadlines, retries, hedging and a breaker per key.
+
+    :param attempt_timeout: seconds one attempt may take before it is retried
+    :param total_timeout: seconds the whole fetch may take, retries included
+    :param retries: attempts after the first one
+    :param hedge_percentile: latency percentile after which a hedged attempt is
+        started (0 disables hedging)
+    :param breaker_dir: directory persisting the breaker state (None: in memory)
+    """
+
+    def __init__(
+        self,
+        attempt_timeout=DEFAULT_ATTEMPT_TIMEOUT,
+        total_timeout=DEFAULT_TOTAL_TIMEOUT,
+        retries=DEFAULT_RETRIES,
+        backoff_initial=DEFAULT_BACKOFF_INITIAL,
+        backoff_max=DEFAULT_BACKOFF_MAX,
+        hedge_percentile=DEFAULT_HEDGE_PERCENTILE,
+        failure_threshold=DEFAULT_FAILURE_THRESHOLD,
+        reset_timeout=DEFAULT_RESET_TIMEOUT,
+        breaker_dir=None,
+    ):
+        self.attempt_timeout = attempt_timeout
+        self.total_timeout = total_timeout
+        self.retries = retries
+        self.backoff_initial = backoff_initial
+        self.backoff_max = backoff_max
+        self.hedge_percentile = hedge_percentile
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.breaker_dir = breaker_dir
+        self.stats = {
+            "fetches": 0,
+            "attempts": 0,
+            "retries": 0,
+            "hedges": 0,
+            "hedge_wins": 0,
+            "timeouts": 0,
+            "failures": 0,
+            "rejected": 0,
+        }
+        self._stats_lock = threading.Lock()
+        self._breakers = {}
+        self._lock = threading.Lock()
+
+    def _count(self, name):
+        # Fetches run concurrently on the prefetch threads
+        with self._stats_lock:
+            self.stats[name] += 1
+
+    def breaker(self, key):
+        """The breaker for a (app, env, team, profiles) key"""
+        with self._lock:
+            breaker = self._breakers.get(key)
+            if breaker is None:
+                path = None
+                if self.breaker_dir:
+                    digest = hashlib.sha256("\0".join(key).encode("utf-8")).hexdigest()
+                    path = os.path.join(self.breaker_dir, f"{digest}.json")
+                breaker = self._breakers[key] = CircuitBreaker(
+                    path, self.failure_threshold, self.reset_timeout
+                )
+            return breaker
+
+    def hedge_delay(self, breaker):
+        """Seconds after which a hedged attempt starts, or None for no hedging"""
+        latencies = breaker.latencies
+        if not self.hedge_percentile or len(latencies) < HEDGE_MIN_SAMPLES:
+            return None
+        return _percentile(latencies, self.hedge_percentile)
+
+    def fetch(self, key, call):
+        """
+        Return call()'s payload, retrying and hedging within the deadlines.
+
+        Raises CircuitOpenError when the breaker is open, FetchTimeout when no attempt
+        answered in time, and FetchError (chained to the last error) otherwise.
+        """
+        self._count("fetches")
+        breaker = self.breaker(key)
+        if not breaker.allow():
+            self._count("rejected")
+            raise CircuitOpenError(
+                f"Athena circuit breaker is open for {'/'.join(key[1:3])}"
+            )
+
+        start = time.monotonic()
+        deadline = start + self.total_timeout
+        hedge_delay = self.hedge_delay(breaker)
+        last_error = None
+        for attempt in range(self.retries + 1):
+            if attempt:
+                self._count("retries")
+                backoff = random.uniform(
+                    0, min(self.backoff_max, self.backoff_initial * 2 ** (attempt - 1))
+                )
+                if time.monotonic() + backoff >= deadline:
+                    break
+                time.sleep(backoff)
+            try:
+                payload, latency = self._attempt(call, deadline, hedge_delay)
+            except Exception as e:
+                last_error = e
+                logger.warning(
+                    "Athena fetch attempt %d of %d failed: %s",
+                    attempt + 1,
+                    self.retries + 1,
+                    e,
+                )
+                continue
+            breaker.record_success(latency)
+            return payload
+
+        breaker.record_failure()
+        self._count("failures")
+        elapsed = time.monotonic() - start
+        if isinstance(last_error, FetchTimeout) or last_error is None:
+            raise FetchTimeout(f"No Athena answer within {elapsed:.1f} s")
+        raise FetchError(
+            f"Athena fetch failed after {elapsed:.1f} s: {last_error!r}"
+        ) from last_error
+
+    def _attempt(self, call, deadline, hedge_delay):
+        """
+        One attempt, plus a hedged one if it is slow. Returns (payload, seconds since
+        the attempt started): a winning hedge still made the caller wait the delay.
+        """
+        results = queue.Queue()
+        started = time.monotonic()
+        attempt_deadline = min(deadline, started + self.attempt_timeout)
+        hedge_at = None if hedge_delay is None else started + hedge_delay
+        self._start(call, results, hedged=False)
+        running = 1
+        error = None
+        while running:
+            wake = (
+                attempt_deadline
+                if hedge_at is None
+                else min(attempt_deadline, hedge_at)
+            )
+            try:
+                ok, value, hedged = results.get(
+                    timeout=max(0.0, wake - time.monotonic())
+                )
+            except queue.Empty:
+                if hedge_at is not None and time.monotonic() < attempt_deadline:
+                    # Slower than usual: race a second request against the first
+                    hedge_at = None
+                    running += 1
+                    self._count("hedges")
+                    self._start(call, results, hedged=True)
+                    continue
+                break
+            running -= 1
+            if ok:
+                if hedged:
+                    self._count("hedge_wins")
+                return value, time.monotonic() - started
+            error = value
+        if not running:
+            raise error
+        self._count("timeouts")
+        raise FetchTimeout(
+            f"Athena did not answer within {attempt_deadline - started:.1f} s"
+        )
+
+    def _start(self, call, results, hedged):
+        self._count("attempts")
+
+        def run():
+            try:
+                value = call()
+            except Exception as e:
+                results.put((False, e, hedged))
+            else:
+                results.put((True, value, hedged))
+
+        # Daemon thread: an attempt that never returns must not keep the process alive
+        threading.Thread(
+            target=contextvars.copy_context().run,
+            args=(run,),
+            name="athena-attempt",
+            daemon=True,
+        ).start()
+
+
+def open_resilient_fetcher():
+    """Build a ResilientFetcher from the ATHENA_* environment variables"""
+    env = os.environ
+    return ResilientFetcher(
+        attempt_timeout=float(
+            env.get("ATHENA_ATTEMPT_TIMEOUT", DEFAULT_ATTEMPT_TIMEOUT)
+        ),
+        total_timeout=float(env.get("ATHENA_TOTAL_TIMEOUT", DEFAULT_TOTAL_TIMEOUT)),
+        retries=int(env.get("ATHENA_RETRIES", DEFAULT_RETRIES)),
+        hedge_percentile=float(
+            env.get("ATHENA_HEDGE_PERCENTILE", DEFAULT_HEDGE_PERCENTILE)
+        ),
+        failure_threshold=int(
+            env.get("ATHENA_BREAKER_THRESHOLD", DEFAULT_FAILURE_THRESHOLD)
+        ),
+        reset_timeout=float(env.get("ATHENA_BREAKER_RESET", DEFAULT_RESET_TIMEOUT)),
+        breaker_dir=env.get("ATHENA_BREAKER_DIR") or None,
+    )
@@ -0,0 +1,286 @@
+"""
+Read-only property snapshots shared between processes through one mapped file.
+
+    shared = SharedPropertySnapshot()
+    shared.publish(store)            # serialize once, returns the version stamp
+    view = shared.view()             # PropertyStore API, pickles as the file path
+    ...                              # worker processes map the same pages
+    shared.publish(newer_store)      # readers see view.is_stale()
+    shared.close()
+
+Pickling a PropertyStore to every worker process copies it into each process and
+unpickles it there. A snapshot serializes the flattened properties once into a
+compact binary layout in a file under /dev/shm (the temp dir where there is none).
+Every process maps that file read-only, so all of them read the same physical pages,
+and a SharedPropertyView finds a key by binary search over the mapped key table and
+decodes only the value it returns.
+
+Layout (little-endian):
+
+    header   magic "PROPSNP1", version u64, published_at f64, count u32, 4 pad bytes
+    table    count x (offset u32, key length u32, value length u32), sorted by key
+    data     for every entry, the UTF-8 key followed by its JSON encoded value
+
+Publishing writes a new file and renames it over the snapshot path: a view keeps
+reading the version it attached to, and the version stamp in the new header tells
+readers that a newer snapshot exists (see SharedPropertyView.is_stale and latest).
+"""
+
+import contextlib
+import json
+import mmap
+import os
+import struct
+import tempfile
+import time
+from collections.abc import Mapping, Sequence
+
+from property_store import PropertyStore
+
+MAGIC = b"PROPSNP1"
+SHM_DIR = "/dev/shm"
+
+_HEADER = struct.Struct("<8sQdI4x")
+_ENTRY = struct.Struct("<III")
+
+
+def snapshot_dir():
+    """Memory-backed /dev/shm where available, the temp dir otherwise"""
+    if os.path.isdir(SHM_DIR) and os.access(SHM_DIR, os.W_OK):
+        return SHM_DIR
+    return tempfile.gettempdir()
+
+
+def encode_snapshot(properties, version, published_at=None):
+    """
+    The binary layout of a mapping of property keys to JSON values.
+
+    Raises TypeError for a value JSON cannot represent (a date, a Decimal...), which
+    a view could only return as a different type than the PropertyStore did.
+    """
+    entries = sorted(
+        (
+            str(key).encode("utf-8"),
+            json.dumps(value, ensure_ascii=False, separators=(",", ":")).encode(
+                "utf-8"
+            ),
+        )
+        for key, value in properties.items()
+    )
+    table_start = _HEADER.size
+    offset = table_start + len(entries) * _ENTRY.size
+    data = bytearray(offset + sum(len(k) + len(v) for k, v in entries))
+    _HEADER.pack_into(
+        data,
+        0,
+        MAGIC,
+        version,
+        time.time() if published_at is None else published_at,
+        len(entries),
+    )
+    for i, (key, value) in enumerate(entries):
+        _ENTRY.pack_into(
+            data, table_start + i * _ENTRY.size, offset, len(key), len(value)
+        )
+        end = offset + len(key)
+        data[offset:end] = key
+        data[end : end + len(value)] = value
+        offset = end + len(value)
+    return bytes(data)
+
+
+def _read_header(buffer, path):
+    if len(buffer) < _HEADER.size:
+        raise ValueError(f"Not a property snapshot: {path}")
+    magic, version, published_at, count = _HEADER.unpack_from(buffer, 0)
+    if magic != MAGIC:
+        raise ValueError(f"Not a property snapshot: {path}")
+    return version, published_at, count
+
+
+def read_version(path):
+    """Version stamp of the snapshot at path (None when nothing is published there)"""
+    try:
+        with open(path, "rb") as f:
+            header = f.read(_HEADER.size)
+    except FileNotFoundError:
+        return None
+    if not header:
+        return None
+    return _read_header(header, path)[0]
+
+
+class _EntryTable(Mapping):
+    """Key lookups over the mapped table, decoding only the values asked for"""
+
+    __slots__ = ("_buffer", "_count")
+
+    def __init__(self, buffer, count):
+        self._buffer = buffer
+        self._count = count
+
+    def _entry(self, index):
+        return _ENTRY.unpack_from(self._buffer, _HEADER.size + index * _ENTRY.size)
+
+    def key(self, index):
+        offset, key_length, _ = self._entry(index)
+        return self._buffer[offset : offset + key_length].decode("utf-8")
+
+    def _find(self, key):
+        # Keys are sorted by their UTF-8 bytes, which is also str (code point) order
+        if not isinstance(key, str):
+            return None
+        target = key.encode("utf-8")
+        lo, hi = 0, self._count
+        while lo < hi:
+            mid = (lo + hi) // 2
+            offset, key_length, value_length = self._entry(mid)
+            probe = self._buffer[offset : offset + key_length]
+            if probe < target:
+                lo = mid + 1
+            elif probe > target:
+                hi = mid
+            else:
+                return offset + key_length, value_length
+        return None
+
+    def __getitem__(self, key):
+        found = self._find(key)
+        if found is None:
+            raise KeyError(key)
+        start, length = found
+        return json.loads(self._buffer[start : start + length])
+
+    def __contains__(self, key):
+        return self._find(key) is not None
+
+    def __iter__(self):
+        return (self.key(i) for i in range(self._count))
+
+    def __len__(self):
+        return self._count
+
+
+class _KeyColumn(Sequence):
+    """The sorted keys of an _EntryTable, for PropertyStore's prefix bisection"""
+
+    __slots__ = ("_table",)
+
+    def __init__(self, table):
+        self._table = table
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self._table.key(i) for i in range(*index.indices(len(self)))]
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError(index)
+        return self._table.key(index)
+
+    def __len__(self):
+        return len(self._table)
+
+
+class SharedPropertyView(PropertyStore):
+    """
+    A PropertyStore read from a mapped snapshot file instead of a dict.
+
+    Lookups, prefix queries and typed accessors work as on a PropertyStore. Pickling
+    a view sends only the snapshot path: the receiving process maps the same file.
+    """
+
+    __slots__ = ("path", "version", "published_at", "_mmap", "_signature")
+
+    def __init__(self, path):
+        self.path = os.fspath(path)
+        with open(self.path, "rb") as f:
+            stat = os.fstat(f.fileno())
+            if not stat.st_size:
+                raise ValueError(f"Not a property snapshot: {self.path}")
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        self._signature = (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+        self.version, self.published_at, count = _read_header(self._mmap, self.path)
+        self._data = _EntryTable(self._mmap, count)
+        self._keys = _KeyColumn(self._data)
+        self._memo = {}
+
+    def __repr__(self):
+        return f"SharedPropertyView(version {self.version}, {len(self)} properties)"
+
+    def __reduce__(self):
+        return (SharedPropertyView, (self.path,))
+
+    def is_stale(self):
+        """Whether a newer snapshot was published at this view's path"""
+        try:
+            stat = os.stat(self.path)
+        except FileNotFoundError:
+            return False
+        if (stat.st_ino, stat.st_mtime_ns, stat.st_size) == self._signature:
+            return False
+        version = read_version(self.path)
+        return version is not None and version > self.version
+
+    def latest(self):
+        """This view, or a view of the newer snapshot when one was published"""
+        return SharedPropertyView(self.path) if self.is_stale() else self
+
+    def close(self):
+        self._mmap.close()
+
+
+class SharedPropertySnapshot:
+    """
+    Publishes property snapshots to one file for any number of processes to map.
+
+    :param path: snapshot file (default: a new file in snapshot_dir(), removed by
+        close())
+    """
+
+    def __init__(self, path=None):
+        self._owned = path is None
+        if path is None:
+            fd, path = tempfile.mkstemp(
+                prefix="properties-", suffix=".snap", dir=snapshot_dir()
+            )
+            os.close(fd)
+        self.path = os.fspath(path)
+        self.version = read_version(self.path) or 0
+        self.stats = {"publishes": 0, "bytes": 0}
+
+    def publish(self, properties):
+        """Serialize the properties as the next version and return its version stamp"""
+        if hasattr(properties, "snapshot"):
+            # LiveProperties: one consistent version
+            properties = properties.snapshot()
+        data = encode_snapshot(properties, self.version + 1)
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(self.path), suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, self.path)
+        except BaseException:
+            with contextlib.suppress(OSError):
+                os.remove(tmp_path)
+            raise
+        self.version += 1
+        self.stats["publishes"] += 1
+        self.stats["bytes"] = len(data)
+        return self.version
+
+    def view(self):
+        """A view of the latest published snapshot"""
+        return SharedPropertyView(self.path)
+
+    def close(self):
+        """Remove the snapshot file if this snapshot created it (views stay readable)"""
+        if self._owned:
+            with contextlib.suppress(FileNotFoundError):
+                os.remove(self.path)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
@@ -0,0 +1,141 @@
+"""
+Deadline-bounded shutdown of logging handlers.
+
+Handlers attached to several loggers are flushed and closed once, all of them
+concurrently, under one global deadline. A sink that hangs (typically a GELF socket
+whose peer stopped reading) is left behind on its daemon thread and reported instead
+of holding the container open, so the exit time of the batch stays bounded. It is
+also detached from every logger and from logging's own handler list, so neither later
+records nor the atexit logging.shutdown() can block on it.
+"""
+
+import logging
+import threading
+import time
+
+DEFAULT_SHUTDOWN_TIMEOUT = 5.0
+
+
+class SinkResult:
+    """Outcome of flushing and closing one handler"""
+
+    def __init__(self, name, status, seconds, pending=None, error=None):
+        self.name = name
+        self.status = status
+        self.seconds = seconds
+        self.pending = pending
+        self.error = error
+
+    @property
+    def ok(self):
+        return self.status == "closed"
+
+    def describe(self):
+        text = f"{self.name}: {self.status} after {self.seconds:.2f}s"
+        if self.pending:
+            text += f", {self.pending} records pending"
+        if self.error:
+            text += f" ({self.error})"
+        return text
+
+
+def unique_handlers(*loggers):
+    """Handlers of the given loggers, each handler once, in first-seen order"""
+    seen = set()
+    handlers = []
+    for logger in loggers:
+        for handler in logger.handlers:
+            if id(handler) not in seen:
+                seen.add(id(handler))
+                handlers.append(handler)
+    return handlers
+
+
+def handler_name(handler):
+    name = handler.get_name() if isinstance(handler, logging.Handler) else None
+    kind = type(handler).__name__
+    return f"{name} ({kind})" if name else kind
+
+
+def pending_records(handler):
+    """
+    Records a handler has accepted but not delivered, or None when it cannot tell.
+
+    Handlers can expose this with a pending_records() method; MemoryHandler buffers
+    and QueueHandler queues are counted directly.
+    """
+    try:
+        counter = getattr(handler, "pending_records", None)
+        if callable(counter):
+            count = counter()
+            return count if isinstance(count, int) else None
+        buffer = getattr(handler, "buffer", None)
+        if isinstance(buffer, list):
+            return len(buffer)
+        queue = getattr(handler, "queue", None)
+        if queue is not None and hasattr(queue, "qsize"):
+            return queue.qsize()
+    except Exception:
+        pass
+    return None
+
+
+def abandon_handler(handler):
+    """
+    Detach a handler from every logger and from logging's shutdown list.
+
+    logging.shutdown(), run at exit, acquires, flushes and closes every handler it
+    knows of; a handler that hung once would hang the interpreter's exit there.
+    """
+    with logging._lock:
+        loggers = [logging.root, *logging.Logger.manager.loggerDict.values()]
+        logging._handlerList[:] = [
+            ref for ref in logging._handlerList if ref() is not handler
+        ]
+    for logger in loggers:
+        if isinstance(logger, logging.Logger) and handler in logger.handlers:
+            logger.removeHandler(handler)
+
+
+def shutdown_handlers(handlers, timeout=DEFAULT_SHUTDOWN_TIMEOUT):
+    """
+    Flush and close every handler concurrently, waiting at most `timeout` seconds.
+
+    Returns a SinkResult per handler; handlers still busy at the deadline are reported
+    as "timed out", left running on daemon threads and abandoned (see
+    abandon_handler) so they cannot block the interpreter's exit.
+    """
+    deadline = time.monotonic() + timeout
+    start = time.perf_counter()
+    outcomes = {}
+
+    def close(handler):
+        try:
+            handler.flush()
+            handler.close()
+            outcomes[id(handler)] = ("closed", time.perf_counter() - start, None)
+        except Exception as e:
+            outcomes[id(handler)] = ("failed", time.perf_counter() - start, repr(e))
+
+    threads = []
+    for handler in handlers:
+        thread = threading.Thread(
+            target=close, args=(handler,), name="log-shutdown", daemon=True
+        )
+        thread.start()
+        threads.append(thread)
+    for thread in threads:
+        thread.join(max(0.0, deadline - time.monotonic()))
+
+    results = []
+    for handler in handlers:
+        status, seconds, error = outcomes.get(
+            id(handler), ("timed out", time.perf_counter() - start, None)
+        )
+        pending = pending_records(handler)
+        if status == "timed out":
+            abandon_handler(handler)
+        results.append(
+            SinkResult(handler_name(handler), status, seconds, pending, error)
+        )
+    return results
@@ -0,0 +1,67 @@
+"""
+Startup timing for the CLI entry point.
+
+Records how long each (lazy) import and each startup phase takes so that
+`main --startup-report` can print an aggregated view, similar to `-X importtime`
+but per dependency rather than per module.
+"""
+
+import importlib
+import sys
+import threading
+import time
+
+
+class StartupReport:
+    """Collects per-import and per-phase wall times"""
+
+    def __init__(self):
+        self.imports = []
+        self.phases = []
+        self._last_mark = time.perf_counter()
+        # Held across the check, the import and the record, so an import triggered on
+        # several threads at once (the prefetch workers) is timed and listed once.
+        # Reentrant: a module imported here may itself call timed_import.
+        self._import_lock = threading.RLock()
+
+    def timed_import(self, module_name):
+        """Import a module, recording its wall time and how many modules it pulled in"""
+        with self._import_lock:
+            if module_name in sys.modules:
+                return sys.modules[module_name]
+            modules_before = len(sys.modules)
+            start = time.perf_counter()
+            module = importlib.import_module(module_name)
+            self.record_import(
+                module_name,
+                time.perf_counter() - start,
+                len(sys.modules) - modules_before,
+            )
+            return module
+
+    def record_import(self, module_name, seconds, module_count):
+        self.imports.append((module_name, seconds, module_count))
+
+    def mark(self, phase_name):
+        """Record a phase ending now; it started at the previous mark"""
+        now = time.perf_counter()
+        self.phases.append((phase_name, now - self._last_mark))
+        self._last_mark = now
+
+    def render(self):
+        """Format the report as a plain text table"""
+        lines = ["Startup report", "", f"{'import':<40} {'ms':>9} {'modules':>8}"]
+        for name, seconds, module_count in self.imports:
+            lines.append(f"{name:<40} {seconds * 1000:>9.1f} {module_count:>8}")
+        total_imports = sum(seconds for _, seconds, _ in self.imports)
+        lines.append(f"{'total':<40} {total_imports * 1000:>9.1f}")
+        lines += ["", f"{'phase':<40} {'ms':>9}"]
+        for name, seconds in self.phases:
+            lines.append(f"{name:<40} {seconds * 1000:>9.1f}")
+        total_phases = sum(seconds for _, seconds in self.phases)
+        lines.append(f"{'total':<40} {total_phases * 1000:>9.1f}")
+        return "\n".join(lines)
+
+
+# Shared by main and the lazily imported modules
+report = StartupReport()
@@ -0,0 +1,142 @@
+"""
+Structured logging facade with context held in contextvars.
+
+    logger = get_logger("test")
+    with bound(env="dev", team="acad"):
+        logger.info("Loaded %d rows", count, table="person")
+
+- Messages are %-formatted lazily by logging, and nothing is built when the level is
+  disabled (no eager f-strings).
+- Keyword arguments become record attributes, which the GELF handlers send as extra
+  fields (include_extra_fields: true).
+- Bound context (env, team, run id) lives in a ContextVar instead of a LoggerAdapter.
+  It follows asyncio tasks automatically; use submit_with_context() to carry it into
+  thread pools.
+"""
+
+import contextvars
+import logging
+import os
+from contextlib import contextmanager
+
+# Holds an immutable-by-convention dict; every bind() replaces it with a new one
+_context = contextvars.ContextVar("log_context", default=None)
+
+# LogRecord attributes that `extra` may not overwrite
+_RESERVED = frozenset(logging.LogRecord("", 0, "", 0, "", None, None).__dict__) | {
+    "message",
+    "asctime",
+}
+
+
+def get_context():
+    """The fields bound in the current context"""
+    return _context.get() or {}
+
+
+def bind(**fields):
+    """Add fields to the current context. Returns a token for reset()."""
+    return _context.set({**get_context(), **fields})
+
+
+def reset(token):
+    """Restore the context as it was before the bind() that returned `token`"""
+    _context.reset(token)
+
+
+@contextmanager
+def bound(**fields):
+    """Bind fields for the duration of a with block"""
+    token = bind(**fields)
+    try:
+        yield
+    finally:
+        reset(token)
+
+
+def new_run_id():
+    """RUN_ID from the environment (e.g. set by the scheduler) or a random id"""
+    return os.environ.get("RUN_ID") or os.urandom(6).hex()
+
+
+def submit_with_context(executor, fn, *args, **kwargs):
+    """executor.submit() running fn in a copy of the caller's context"""
+    return executor.submit(contextvars.copy_context().run, fn, *args, **kwargs)
+
+
+def _extra(fields):
+    extra = {**get_context(), **fields}
+    if _RESERVED.isdisjoint(extra):
+        return extra
+    # e.g. name= or msg= would make logging raise; keep them under another key
+    return {(f"{key}_" if key in _RESERVED else key): v for key, v in extra.items()}
+
+
+class StructuredLogger:
+    """
+    Thin wrapper around a logging.Logger adding bound context and key/value fields.
+
+    Positional arguments are the usual lazy %-format arguments.
+    """
+
+    __slots__ = ("logger",)
+
+    def __init__(self, logger):
+        self.logger = logger
+
+    def log(
+        self,
+        level,
+        msg,
+        /,
+        *args,
+        exc_info=None,
+        stack_info=False,
+        stacklevel=1,
+        **fields,
+    ):
+        if self.logger.isEnabledFor(level):
+            self._log(level, msg, args, exc_info, stack_info, fields, stacklevel)
+
+    def _log(self, level, msg, args, exc_info, stack_info, fields, stacklevel=1):
+        # stacklevel points filename/lineno at our caller's caller, not at this module
+        self.logger.log(
+            level,
+            msg,
+            *args,
+            exc_info=exc_info,
+            stack_info=stack_info,
+            stacklevel=2 + stacklevel,
+            extra=_extra(fields),
+        )
+
+    def debug(self, msg, /, *args, **fields):
+        if self.logger.isEnabledFor(logging.DEBUG):
+            self._log(logging.DEBUG, msg, args, None, False, fields)
+
+    def info(self, msg, /, *args, **fields):
+        if self.logger.isEnabledFor(logging.INFO):
+            self._log(logging.INFO, msg, args, None, False, fields)
+
+    def warning(self, msg, /, *args, **fields):
+        if self.logger.isEnabledFor(logging.WARNING):
+            self._log(logging.WARNING, msg, args, None, False, fields)
+
+    def error(self, msg, /, *args, exc_info=None, **fields):
+        if self.logger.isEnabledFor(logging.ERROR):
+            self._log(logging.ERROR, msg, args, exc_info, False, fields)
+
+    def exception(self, msg, /, *args, **fields):
+        if self.logger.isEnabledFor(logging.ERROR):
+            self._log(logging.ERROR, msg, args, True, False, fields)
+
+    def critical(self, msg, /, *args, **fields):
+        if self.logger.isEnabledFor(logging.CRITICAL):
+            self._log(logging.CRITICAL, msg, args, None, False, fields)
+
+
+def get_logger(logger):
+    """A StructuredLogger for a logger name or an existing logging.Logger"""
+    if isinstance(logger, str):
+        logger = logging.getLogger(logger)
+    return StructuredLogger(logger)
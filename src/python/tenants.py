@@ -0,0 +1,82 @@
+"""
+Multi-tenant batch mode.
+
+Runs the same job for several team/env combinations in one process, so interpreter
+startup, logging setup and imports are paid once instead of once per container launch.
+Tenants run concurrently in a bounded thread pool (their work is dominated by Athena
+and other I/O) and the results are folded into one exit code and summary.
+"""
+
+import time
+from concurrent.futures import ThreadPoolExecutor
+from itertools import product
+
+from structured_log import submit_with_context
+
+DEFAULT_MAX_WORKERS = 4
+
+
+class TenantResult:
+    """Outcome of one tenant run"""
+
+    def __init__(self, env, team, exit_code, seconds, error=None):
+        self.env = env
+        self.team = team
+        self.exit_code = exit_code
+        self.seconds = seconds
+        self.error = error
+
+    @property
+    def ok(self):
+        return self.exit_code == 0
+
+
+def expand_tenants(teams, envs):
+    """All (env, team) combinations, deduplicated, in the order given"""
+    seen = []
+    for team, env in product(teams, envs):
+        if (env, team) not in seen:
+            seen.append((env, team))
+    return seen
+
+
+def run_tenants(tenants, run_tenant, max_workers=DEFAULT_MAX_WORKERS):
+    """
+    Run `run_tenant(env, team)` for every tenant in a bounded thread pool.
+
+    `run_tenant` returns an exit code. An exception counts as exit code 1. Results are
+    returned in the order of `tenants`. Each tenant runs with the caller's bound log
+    context (e.g. the run id).
+    """
+
+    def timed(env, team):
+        start = time.perf_counter()
+        try:
+            exit_code = run_tenant(env, team)
+            return TenantResult(env, team, exit_code, time.perf_counter() - start)
+        except Exception as e:
+            return TenantResult(
+                env, team, 1, time.perf_counter() - start, error=repr(e)
+            )
+
+    with ThreadPoolExecutor(
+        max_workers=max_workers, thread_name_prefix="tenant"
+    ) as pool:
+        futures = [submit_with_context(pool, timed, env, team) for env, team in tenants]
+        return [future.result() for future in futures]
+
+
+def summarize(results):
+    """Return (aggregated exit code, summary lines)"""
+    exit_code = max((result.exit_code for result in results), default=0)
+    failed = [result for result in results if not result.ok]
+    lines = [
+        f"Tenant summary: {len(results) - len(failed)} succeeded, {len(failed)} failed"
+    ]
+    for result in results:
+        status = "ok" if result.ok else f"FAILED (exit {result.exit_code})"
+        line = f"  {result.team}/{result.env}: {status} in {result.seconds:.2f}s"
+        if result.error:
+            line += f" - {result.error}"
+        lines.append(line)
+    return exit_code, lines
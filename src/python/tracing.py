@@ -0,0 +1,186 @@
+"""
+Lightweight phase tracing.
+
+A span times one phase of the run (logging setup, Athena fetch, application logic,
+shutdown). Finished spans are logged with structured extra fields (span, span_ms,
+span_status plus the bound env/team context) so they can be searched and
+graphed in Graylog, and a per-phase summary is logged at the end of the run.
+
+    with tracer.span("athena_fetch", logger):
+        ...
+
+    @tracer.traced("load_rows")
+    def load_rows(): ...
+
+The module also wraps cProfile for the --profile option.
+"""
+
+import contextlib
+import functools
+import logging
+import sys
+import threading
+import time
+from contextlib import contextmanager
+
+from structured_log import StructuredLogger, get_context
+
+
+class Span:
+    """One finished, timed phase"""
+
+    def __init__(self, name, seconds, status, attrs):
+        self.name = name
+        self.seconds = seconds
+        self.status = status
+        self.attrs = attrs
+
+
+def _caller_stacklevel():
+    # Point filename/lineno/funcName at the code that ran the span or the summary,
+    # past _log, the span generator, contextlib's __exit__ and the traced() wrapper
+    frame = sys._getframe(2)
+    stacklevel = 2
+    while frame.f_back is not None and frame.f_code.co_filename in _TRACING_FILES:
+        frame = frame.f_back
+        stacklevel += 1
+    return stacklevel
+
+
+def _log(logger, level, msg, args, fields):
+    stacklevel = _caller_stacklevel()
+    if isinstance(logger, StructuredLogger):
+        logger.log(level, msg, *args, stacklevel=stacklevel, **fields)
+        return
+    # LoggerAdapter.process replaces `extra` with the adapter's own context, so log on
+    # the underlying logger with both merged instead.
+    fields = {**get_context(), **fields}
+    context = getattr(logger, "extra", None)
+    if isinstance(context, dict):
+        fields = {**context, **fields}
+        logger = logger.logger
+    logger.log(level, msg, *args, stacklevel=stacklevel, extra=fields)
+
+
+_TRACING_FILES = {
+    _log.__code__.co_filename,
+    contextlib.contextmanager.__code__.co_filename,
+}
+
+
+class Tracer:
+    """Collects spans for the current process"""
+
+    def __init__(self):
+        self.spans = []
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def span(self, name, logger=None, **attrs):
+        """
+        Time the enclosed block as a span named `name`.
+
+        When `logger` is given (a StructuredLogger, Logger or LoggerAdapter) the finished
+        span is logged at INFO with structured fields; extra keyword arguments become
+        span attributes.
+        """
+        status = "ok"
+        start = time.perf_counter()
+        try:
+            yield
+        except BaseException:
+            status = "error"
+            raise
+        finally:
+            seconds = time.perf_counter() - start
+            with self._lock:
+                self.spans.append(Span(name, seconds, status, attrs))
+            if logger is not None:
+                fields = {
+                    "span": name,
+                    "span_ms": round(seconds * 1000, 3),
+                    "span_status": status,
+                    **attrs,
+                }
+                _log(
+                    logger,
+                    logging.INFO,
+                    "Span %s %s in %.1f ms",
+                    (name, status, seconds * 1000),
+                    fields,
+                )
+
+    def traced(self, name=None, logger=None):
+        """Decorator form of span(); the span name defaults to the function name"""
+
+        def decorator(func):
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                with self.span(name or func.__name__, logger):
+                    return func(*args, **kwargs)
+
+            return wrapper
+
+        return decorator
+
+    def summary(self):
+        """List of (name, count, total_seconds, max_seconds, errors) in first-seen order"""
+        totals = {}
+        with self._lock:
+            spans = list(self.spans)
+        for span in spans:
+            count, total, longest, errors = totals.get(span.name, (0, 0.0, 0.0, 0))
+            totals[span.name] = (
+                count + 1,
+                total + span.seconds,
+                max(longest, span.seconds),
+                errors + (span.status == "error"),
+            )
+        return [(name, *values) for name, values in totals.items()]
+
+    def log_summary(self, logger):
+        """Log one line per phase with its count, total and max time"""
+        for name, count, total, longest, errors in self.summary():
+            _log(
+                logger,
+                logging.INFO,
+                "Phase %s: %dx, total %.1f ms, max %.1f ms, %d errors",
+                (name, count, total * 1000, longest * 1000, errors),
+                {
+                    "span": name,
+                    "span_count": count,
+                    "span_total_ms": round(total * 1000, 3),
+                    "span_max_ms": round(longest * 1000, 3),
+                    "span_errors": errors,
+                },
+            )
+
+    def reset(self):
+        """Forget every recorded span"""
+        with self._lock:
+            self.spans = []
+
+
+# Shared by main and the helper modules
+tracer = Tracer()
+
+
+def start_profiler():
+    """Start a cProfile profiler on the calling thread"""
+    import cProfile
+
+    profiler = cProfile.Profile()
+    profiler.enable()
+    return profiler
+
+
+def stop_profiler(profiler, path):
+    """
+    Stop the profiler and write a pstats file to `path`.
+
+    Open it with `python -m pstats`, snakeviz, or turn it into a flamegraph with
+    flameprof / gprof2dot.
+    """
+    profiler.disable()
+    profiler.dump_stats(path)
+    return path
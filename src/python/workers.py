@@ -0,0 +1,219 @@
+"""
+Partitioned execution of the application logic on a process pool.
+
+    results = run_partitioned(process_unit, units, properties, workers=4)
+
+`process_unit(unit, properties)` runs in worker processes (a ProcessPoolExecutor with
+--workers processes). The resolved Athena properties are handed to each worker once,
+by the pool initializer, instead of with every unit or by refetching them. They are
+published as a shared_properties snapshot that every worker maps read-only, so the
+workers neither copy nor unpickle them; a LiveProperties refresh during the run is
+published as a new version, which workers switch to before their next unit. Workers
+log to a queue that a listener in the parent feeds into the parent's configured
+handlers, so Graylog receives one stream with the bound env/team/run_id context.
+Per-worker throughput is logged when the units are done.
+
+With workers=1 the units run in the calling process, with the same stats.
+Work functions must be importable module-level functions (workers are spawned).
+"""
+
+import logging
+import multiprocessing
+import os
+import time
+from collections.abc import Mapping
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from logging.handlers import QueueHandler, QueueListener
+
+from reload import LiveProperties
+from shared_properties import SharedPropertySnapshot, SharedPropertyView
+from structured_log import StructuredLogger, bind, get_context, get_logger
+
+# Set in each worker process by _init_worker
+_worker_properties = None
+
+
+class WorkerStats:
+    """Units processed and busy time of one worker process"""
+
+    def __init__(self, pid):
+        self.pid = pid
+        self.units = 0
+        self.seconds = 0.0
+        self.errors = 0
+
+    @property
+    def units_per_second(self):
+        return self.units / self.seconds if self.seconds else 0.0
+
+
+def worker_properties():
+    """The properties handed to this worker process (None in the parent)"""
+    return _worker_properties
+
+
+def _init_worker(log_queue, level, properties, context):
+    global _worker_properties
+    _worker_properties = properties
+    # Everything is logged through the parent's handlers
+    root = logging.getLogger()
+    root.handlers = [QueueHandler(log_queue)]
+    root.setLevel(level)
+    app_logger = logging.getLogger("test")
+    app_logger.handlers = []
+    app_logger.propagate = True
+    app_logger.setLevel(level)
+    bind(**context)
+
+
+def _execute(fn, unit, properties):
+    start = time.perf_counter()
+    try:
+        result, error = fn(unit, properties), None
+    except Exception as e:
+        result, error = None, e
+    return os.getpid(), time.perf_counter() - start, result, error
+
+
+def _latest_worker_properties():
+    # Switches to a snapshot the parent published since the previous unit
+    global _worker_properties
+    if isinstance(_worker_properties, SharedPropertyView):
+        latest = _worker_properties.latest()
+        if latest is not _worker_properties:
+            # Units run one at a time in a worker, so nothing reads the old view now
+            _worker_properties.close()
+            _worker_properties = latest
+    return _worker_properties
+
+
+def _run_unit(fn, unit):
+    return _execute(fn, unit, _latest_worker_properties())
+
+
+class _ForwardHandler(logging.Handler):
+    """Hands a worker's record to the parent logger of the same name"""
+
+    def emit(self, record):
+        logger = logging.getLogger(record.name)
+        if logger.isEnabledFor(record.levelno):
+            logger.handle(record)
+
+
+def run_partitioned(
+    fn,
+    units,
+    properties,
+    workers=1,
+    logger=None,
+    chunksize=1,
+    mp_context="spawn",
+    on_done=None,
+    share_properties=True,
+):
+    """
+    Run `fn(unit, properties)` for every unit and return the results in order.
+
+    Units are spread over `workers` processes. Once every unit has run, per-worker
+    stats are logged and the first exception raised by a unit, if any, is re-raised.
+    `on_done(unit, error)` is called in the parent, in unit order, as results arrive
+    (e.g. to checkpoint progress). With `share_properties` the workers read the
+    properties from a shared snapshot instead of each unpickling a copy.
+    """
+    if not isinstance(logger, StructuredLogger):
+        logger = get_logger(logger or "test")
+    units = list(units)
+    start = time.perf_counter()
+
+    outcomes = []
+
+    def collect(outcome_iter):
+        for unit, outcome in zip(units, outcome_iter, strict=True):
+            outcomes.append(outcome)
+            if on_done is not None:
+                on_done(unit, outcome[3])
+
+    if workers <= 1 or len(units) <= 1:
+        collect(_execute(fn, unit, properties) for unit in units)
+    else:
+        context = multiprocessing.get_context(mp_context)
+        log_queue = context.Queue()
+        listener = QueueListener(log_queue, _ForwardHandler())
+        listener.start()
+        shared = None
+        worker_properties = properties
+        listening = False
+        try:
+            if share_properties and isinstance(properties, Mapping):
+                shared = SharedPropertySnapshot()
+                try:
+                    shared.publish(properties)
+                except TypeError as e:
+                    # Values JSON cannot hold keep their types by being pickled
+                    logger.warning("Properties not shared with the workers: %s", e)
+                else:
+                    worker_properties = shared.view()
+                    if isinstance(properties, LiveProperties):
+                        properties.add_listener(shared.publish)
+                        listening = True
+            with ProcessPoolExecutor(
+                max_workers=min(workers, len(units)),
+                mp_context=context,
+                initializer=_init_worker,
+                initargs=(
+                    log_queue,
+                    logging.getLogger("test").getEffectiveLevel(),
+                    worker_properties,
+                    get_context(),
+                ),
+            ) as pool:
+                collect(pool.map(partial(_run_unit, fn), units, chunksize=chunksize))
+        finally:
+            # Drains the records the workers logged before they exited
+            listener.stop()
+            if shared is not None:
+                if listening:
+                    properties.remove_listener(shared.publish)
+                if isinstance(worker_properties, SharedPropertyView):
+                    worker_properties.close()
+                shared.close()
+
+    stats = {}
+    errors = []
+    for pid, seconds, _, error in outcomes:
+        worker = stats.setdefault(pid, WorkerStats(pid))
+        worker.units += 1
+        worker.seconds += seconds
+        if error is not None:
+            worker.errors += 1
+            errors.append(error)
+    log_worker_stats(logger, list(stats.values()), time.perf_counter() - start)
+
+    if errors:
+        raise errors[0]
+    return [result for _, _, result, _ in outcomes]
+
+
+def log_worker_stats(logger, stats, elapsed):
+    """Log one line per worker and a total"""
+    for worker in stats:
+        logger.info(
+            "Worker %d: %d units in %.2f s (%.1f units/s, %d errors)",
+            worker.pid,
+            worker.units,
+            worker.seconds,
+            worker.units_per_second,
+            worker.errors,
+            worker_pid=worker.pid,
+            worker_units=worker.units,
+            worker_seconds=round(worker.seconds, 3),
+        )
+    total = sum(worker.units for worker in stats)
+    logger.info(
+        "Processed %d units on %d workers in %.2f s (%.1f units/s)",
+        total,
+        len(stats),
+        elapsed,
+        total / elapsed if elapsed else 0.0,
+    )
@@ -0,0 +1,56 @@
+"""
+Timing and baseline helpers shared by the benchmarks and their fixtures.
+"""
+import json
+import os
+import time
+
+DEFAULT_BASELINE = os.path.join(os.path.dirname(__file__), 'baseline.json')
+
+
+def measure(fn, repeat=5, number=1):
+    """Best wall time in seconds of `number` calls to fn, over `repeat` rounds."""
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for _ in range(number):
+            fn()
+        best = min(best, (time.perf_counter() - start) / number)
+    return best
+
+
+class BenchRecorder:
+    """Records metrics and checks them against the baseline."""
+
+    def __init__(self, path, threshold, update):
+        self.path = path
+        self.threshold = threshold
+        self.update = update
+        self.results = {}
+        self.baseline = {}
+        if os.path.exists(path):
+            with open(path) as f:
+                self.baseline = json.load(f)
+
+    def record(self, name, value, unit, higher_is_better=False):
+        """Record a metric and fail if it regressed beyond the threshold."""
+        self.results[name] = {'value': value, 'unit': unit, 'higher_is_better': higher_is_better}
+        baseline = self.baseline.get(name)
+        if self.update or baseline is None:
+            return
+        expected = baseline['value']
+        if higher_is_better:
+            regressed = value < expected * (1 - self.threshold)
+        else:
+            regressed = value > expected * (1 + self.threshold)
+        assert not regressed, (
+            f'{name} regressed: {value:.6g} {unit} vs baseline {expected:.6g} {unit} '
+            f'(threshold {self.threshold:.0%})'
+        )
+
+    def save(self):
+        merged = dict(self.baseline)
+        merged.update(self.results)
+        with open(self.path, 'w') as f:
+            json.dump(merged, f, indent=2, sort_keys=True)
+
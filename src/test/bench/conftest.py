@@ -0,0 +1,47 @@
+"""
+Shared fixtures for the benchmark suite.
+
+Every benchmark reports its metrics through the `bench` fixture. Results are compared
+against a JSON baseline and the test fails when a metric regresses by more than the
+allowed threshold.
+
+- BENCH_BASELINE: baseline file (default: src/test/bench/baseline.json)
+- BENCH_THRESHOLD: allowed regression as a fraction (default: 0.25 = 25%)
+- BENCH_UPDATE_BASELINE=1: write the measured values as the new baseline instead of comparing
+
+Baselines are machine specific, so generate them on the machine (or CI runner) that
+runs the comparison.
+"""
+import os
+
+import pytest
+from bench_support import DEFAULT_BASELINE, BenchRecorder
+from gelf_server import FakeGelfServer
+
+
+@pytest.fixture(scope='session')
+def bench_recorder():
+    recorder = BenchRecorder(
+        os.environ.get('BENCH_BASELINE', DEFAULT_BASELINE),
+        float(os.environ.get('BENCH_THRESHOLD', '0.25')),
+        os.environ.get('BENCH_UPDATE_BASELINE') == '1',
+    )
+    yield recorder
+    if recorder.update:
+        recorder.save()
+    if recorder.results:
+        print('\nBenchmark results:')
+        for name, result in sorted(recorder.results.items()):
+            print(f"  {name:<45} {result['value']:>14.6g} {result['unit']}")
+
+
+@pytest.fixture
+def bench(bench_recorder):
+    return bench_recorder
+
+
+@pytest.fixture
+def gelf_server():
+    server = FakeGelfServer(parse=False)
+    yield server
+    server.close()
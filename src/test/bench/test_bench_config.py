@@ -0,0 +1,53 @@
+import os
+import tempfile
+from unittest.mock import patch
+
+import pytest
+import yaml
+from bench_support import measure
+
+import log_config_cache
+import main
+
+pytestmark = pytest.mark.bench
+
+CONFIG_PATH = os.path.join(os.path.dirname(__file__), '..', '..', '..', 'log-config.yaml')
+
+
+@pytest.fixture
+def cache_dir():
+    with tempfile.TemporaryDirectory() as path:
+        with patch.dict(os.environ, {'LOG_CONFIG_CACHE_DIR': path}):
+            yield path
+
+
+class TestConfigLoadBenchmarks:
+    """Latency of resolving and loading the logging config."""
+
+    def test_get_log_config_path(self, bench):
+        """Time the config source resolution."""
+        bench.record('config.get_log_config_path_s', measure(main.get_log_config_path, number=200), 's')
+
+    def test_yaml_parse(self, bench):
+        """Time the uncached yaml.safe_load of log-config.yaml."""
+        with open(CONFIG_PATH) as f:
+            content = f.read()
+        bench.record('config.yaml_safe_load_s', measure(lambda: yaml.safe_load(content), number=20), 's')
+
+    def test_cached_load(self, bench, cache_dir):
+        """Time a warm load through the compiled config cache."""
+        log_config_cache.load_log_config(CONFIG_PATH)
+        bench.record(
+            'config.cached_load_s', measure(lambda: log_config_cache.load_log_config(CONFIG_PATH), number=50), 's'
+        )
+
+    def test_configure_logging(self, bench, cache_dir):
+        """Time configure_logging with the default (console only) config."""
+        config = {
+            'version': 1,
+            'disable_existing_loggers': False,
+            'handlers': {'null': {'class': 'logging.NullHandler'}},
+            'loggers': {'test': {'level': 'INFO', 'handlers': ['null'], 'propagate': False}},
+        }
+        with patch('main.get_log_config_path', side_effect=lambda: dict(config)):
+            bench.record('config.configure_logging_s', measure(main.configure_logging, number=20), 's')
@@ -0,0 +1,56 @@
+import json
+import os
+import tempfile
+
+import pytest
+from bench_support import BenchRecorder
+
+pytestmark = pytest.mark.bench
+
+
+@pytest.fixture
+def baseline_path():
+    with tempfile.TemporaryDirectory() as path:
+        baseline = os.path.join(path, 'baseline.json')
+        with open(baseline, 'w') as f:
+            json.dump(
+                {
+                    'latency_s': {'value': 1.0, 'unit': 's', 'higher_is_better': False},
+                    'rate': {'value': 100.0, 'unit': 'records/s', 'higher_is_better': True},
+                },
+                f,
+            )
+        yield baseline
+
+
+class TestRegressionGate:
+    """Test the baseline comparison used by every benchmark."""
+
+    def test_within_threshold_passes(self, baseline_path):
+        """Test that small changes are accepted."""
+        recorder = BenchRecorder(baseline_path, threshold=0.25, update=False)
+        recorder.record('latency_s', 1.2, 's')
+        recorder.record('rate', 80.0, 'records/s', higher_is_better=True)
+
+    def test_slower_latency_fails(self, baseline_path):
+        """Test that a latency regression beyond the threshold fails."""
+        recorder = BenchRecorder(baseline_path, threshold=0.25, update=False)
+        with pytest.raises(AssertionError, match='latency_s regressed'):
+            recorder.record('latency_s', 1.3, 's')
+
+    def test_lower_throughput_fails(self, baseline_path):
+        """Test that a throughput regression beyond the threshold fails."""
+        recorder = BenchRecorder(baseline_path, threshold=0.25, update=False)
+        with pytest.raises(AssertionError, match='rate regressed'):
+            recorder.record('rate', 70.0, 'records/s', higher_is_better=True)
+
+    def test_update_writes_baseline(self, baseline_path):
+        """Test that update mode persists the new values without comparing."""
+        recorder = BenchRecorder(baseline_path, threshold=0.25, update=True)
+        recorder.record('latency_s', 5.0, 's')
+        recorder.save()
+
+        with open(baseline_path) as f:
+            saved = json.load(f)
+        assert saved['latency_s']['value'] == 5.0
+        assert saved['rate']['value'] == 100.0
@@ -0,0 +1,183 @@
+import io
+import logging
+import os
+import tempfile
+
+import pygelf
+import pytest
+from bench_support import measure
+
+import async_logging
+import fast_formatter
+import file_sink
+import gelf_spool
+import gelf_transport
+import structured_log
+
+pytestmark = pytest.mark.bench
+
+RECORDS = 2000
+
+
+def _records_per_second(handler, count=RECORDS):
+    import time
+
+    logger = logging.getLogger(f'bench.{id(handler)}')
+    logger.handlers = [handler]
+    logger.propagate = False
+    logger.setLevel(logging.INFO)
+    start = time.perf_counter()
+    for i in range(count):
+        logger.info('benchmark record %d with some payload', i, extra={'env': 'dev', 'team': 'acad'})
+    handler.flush()
+    elapsed = time.perf_counter() - start
+    logger.handlers = []
+    return count / elapsed
+
+
+def _formatter():
+    return logging.Formatter('%(asctime)s %(levelname)-8s [%(filename)s %(lineno)d] : %(message)s')
+
+
+class TestLoggingThroughput:
+    """Records/sec through each configured handler type."""
+
+    def test_stream_handler(self, bench):
+        """Console handler writing to an in-memory stream."""
+        handler = logging.StreamHandler(io.StringIO())
+        handler.setFormatter(_formatter())
+        bench.record('logging.stream_records_per_s', _records_per_second(handler), 'records/s', higher_is_better=True)
+
+    def test_file_handler(self, bench):
+        """Stock FileHandler, as used by the logfile handler."""
+        with tempfile.TemporaryDirectory() as path:
+            handler = logging.FileHandler(os.path.join(path, 'bench.log'))
+            handler.setFormatter(_formatter())
+            rate = _records_per_second(handler)
+            handler.close()
+        bench.record('logging.file_records_per_s', rate, 'records/s', higher_is_better=True)
+
+    def test_buffered_file_handler(self, bench):
+        """BufferedRotatingFileHandler (block writes, size rotation with background gzip)."""
+        with tempfile.TemporaryDirectory() as path:
+            handler = file_sink.BufferedRotatingFileHandler(
+                os.path.join(path, 'bench.log'), max_bytes=64 * 1024, backup_count=3
+            )
+            handler.setFormatter(_formatter())
+            rate = _records_per_second(handler)
+            handler.close()
+        bench.record('logging.buffered_file_records_per_s', rate, 'records/s', higher_is_better=True)
+
+    def test_pygelf_tcp_handler(self, bench, gelf_server):
+        """pygelf.GelfTcpHandler against a local fake GELF input."""
+        handler = pygelf.GelfTcpHandler('127.0.0.1', gelf_server.port, include_extra_fields=True, _appName='test')
+        rate = _records_per_second(handler)
+        assert gelf_server.wait_for(RECORDS)
+        handler.close()
+        bench.record('logging.pygelf_tcp_records_per_s', rate, 'records/s', higher_is_better=True)
+
+    def test_spooling_gelf_handler(self, bench, gelf_server):
+        """SpoolingGelfTcpHandler against a local fake GELF input, including replay."""
+        import time
+
+        with tempfile.TemporaryDirectory() as path:
+            handler = gelf_spool.SpoolingGelfTcpHandler(
+                '127.0.0.1', gelf_server.port, spool_dir=path, include_extra_fields=True, drain_interval=0.01
+            )
+            start = time.perf_counter()
+            _records_per_second(handler)
+            assert gelf_server.wait_for(RECORDS)
+            rate = RECORDS / (time.perf_counter() - start)
+            handler.close()
+        bench.record('logging.spooling_gelf_records_per_s', rate, 'records/s', higher_is_better=True)
+
+    def test_batching_gelf_handler(self, bench, gelf_server):
+        """BatchingGelfHandler (persistent TCP) against a local fake GELF input."""
+        import time
+
+        handler = gelf_transport.BatchingGelfHandler('127.0.0.1', gelf_server.port, include_extra_fields=True, _appName='test')
+        start = time.perf_counter()
+        _records_per_second(handler)
+        assert gelf_server.wait_for(RECORDS)
+        rate = RECORDS / (time.perf_counter() - start)
+        handler.close()
+        bench.record('logging.batching_gelf_records_per_s', rate, 'records/s', higher_is_better=True)
+
+    def test_async_pipeline_enqueue(self, bench):
+        """Caller-side cost of logging through the async queue pipeline."""
+        handler = logging.NullHandler()
+        logger = logging.getLogger('bench.async')
+        logger.handlers = [handler]
+        logger.propagate = False
+        pipeline = async_logging.AsyncLoggingPipeline(queue_size=RECORDS * 2)
+        pipeline.start([logger.name])
+        rate = _records_per_second(logger.handlers[0])
+        pipeline.stop()
+        bench.record('logging.async_enqueue_records_per_s', rate, 'records/s', higher_is_better=True)
+
+
+class TestFilteredCallCost:
+    """Per-call cost of a DEBUG call while the logger is at INFO."""
+
+    CALLS = 10000
+
+    def _logger(self):
+        logger = logging.getLogger('bench.filtered')
+        logger.handlers = [logging.NullHandler()]
+        logger.propagate = False
+        logger.setLevel(logging.INFO)
+        return logger
+
+    def test_adapter_fstring(self, bench):
+        """The previous path: LoggerAdapter with an eagerly built f-string."""
+        adapter = logging.LoggerAdapter(self._logger(), {'env': 'dev', 'team': 'acad'})
+        value = {'property.name': 'value'}
+
+        def run():
+            for i in range(self.CALLS):
+                adapter.debug(f'Property value: {value} ({i})')
+
+        seconds = measure(run)
+        bench.record('logging.filtered_adapter_ns_per_call', seconds / self.CALLS * 1e9, 'ns')
+
+    def test_structured_lazy(self, bench):
+        """structured_log with lazy %-args and the context bound in a contextvar."""
+        logger = structured_log.get_logger(self._logger())
+        value = {'property.name': 'value'}
+
+        def run():
+            for i in range(self.CALLS):
+                logger.debug('Property value: %s (%d)', value, i)
+
+        with structured_log.bound(env='dev', team='acad'):
+            seconds = measure(run)
+        bench.record('logging.filtered_structured_ns_per_call', seconds / self.CALLS * 1e9, 'ns')
+
+
+class TestFormatterThroughput:
+    """Records/sec through the `simple` format: logging.Formatter vs FastFormatter."""
+
+    RECORDS = 20000
+    FORMAT = '%(asctime)s %(levelname)-8s [%(filename)s %(lineno)d] : %(message)s'
+
+    def _rate(self, formatter):
+        record = logging.LogRecord('test', logging.INFO, __file__, 1, 'benchmark record %d', (7,), None)
+        record.env, record.team = 'dev', 'acad'
+
+        def run():
+            for _ in range(self.RECORDS):
+                formatter.format(record)
+
+        return self.RECORDS / measure(run)
+
+    def test_formatters(self, bench):
+        """Stock formatter, FastFormatter text and JSON output, and the text speedup."""
+        stdlib = self._rate(logging.Formatter(self.FORMAT))
+        fast = self._rate(fast_formatter.FastFormatter(self.FORMAT))
+        fast_json = self._rate(fast_formatter.FastFormatter(output='json'))
+        bench.record('logging.formatter_stdlib_records_per_s', stdlib, 'records/s', higher_is_better=True)
+        bench.record('logging.formatter_fast_records_per_s', fast, 'records/s', higher_is_better=True)
+        bench.record('logging.formatter_fast_json_records_per_s', fast_json, 'records/s', higher_is_better=True)
+        bench.record('logging.formatter_fast_speedup', fast / stdlib, 'x', higher_is_better=True)
+        # Measured at 2.4-2.7x; the margin absorbs noisy machines
+        assert fast / stdlib >= 1.5
@@ -0,0 +1,59 @@
+import os
+import subprocess
+import sys
+from unittest.mock import MagicMock, patch
+
+import click.testing
+import pytest
+from bench_support import measure
+
+import main
+
+pytestmark = pytest.mark.bench
+
+SRC_PYTHON = os.path.join(os.path.dirname(__file__), '..', '..', 'python')
+
+
+def _run_python(code):
+    subprocess.run(
+        [sys.executable, '-c', code],
+        env=dict(os.environ, PYTHONPATH=SRC_PYTHON),
+        check=True,
+        capture_output=True,
+    )
+
+
+class TestStartupBenchmarks:
+    """Cold and warm startup of the CLI."""
+
+    def test_cold_import(self, bench):
+        """Time a fresh interpreter importing main."""
+        bench.record('startup.cold_import_s', measure(lambda: _run_python('import main'), repeat=3), 's')
+
+    def test_cold_help(self, bench):
+        """Time a fresh interpreter running --help."""
+        code = 'import main\ntry:\n    main.main(["--help"])\nexcept SystemExit:\n    pass\n'
+        bench.record('startup.cold_help_s', measure(lambda: _run_python(code), repeat=3), 's')
+
+    def test_warm_help(self, bench):
+        """Time --help in an already warm interpreter."""
+        runner = click.testing.CliRunner()
+        bench.record('startup.warm_help_s', measure(lambda: runner.invoke(main.main, ['--help']), number=20), 's')
+
+    @patch('main.Pythena')
+    def test_cli_invocation(self, mock_pythena, bench):
+        """Time a full CliRunner invocation of main with Athena mocked out."""
+        mock_pythena_instance = MagicMock()
+        mock_pythena_instance.get_properties.return_value = {'property.name': 'value'}
+        mock_pythena.return_value = mock_pythena_instance
+        runner = click.testing.CliRunner()
+        config = {
+            'version': 1,
+            'handlers': {'null': {'class': 'logging.NullHandler'}},
+            'loggers': {'test': {'level': 'INFO', 'handlers': ['null'], 'propagate': False}},
+        }
+
+        with patch('main.get_log_config_path', return_value=config):
+            seconds = measure(lambda: runner.invoke(main.main, ['--team', 'acad']), number=10)
+
+        bench.record('startup.cli_invocation_s', seconds, 's')
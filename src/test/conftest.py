@@ -0,0 +1,12 @@
+"""
+Fixtures for every test suite.
+"""
+import pytest
+
+
+@pytest.fixture(autouse=True)
+def gelf_spool_dir(tmp_path, monkeypatch):
+    """Spool GELF records of the configured handlers to the test's tmp_path"""
+    path = tmp_path / 'gelf-spool'
+    monkeypatch.setenv('GELF_SPOOL_DIR', str(path))
+    return path
@@ -0,0 +1,79 @@
+"""
+Local GELF TCP input shared by the unit tests and the benchmarks.
+"""
+import json
+import socket
+import threading
+import time
+
+
+class FakeGelfServer:
+    """
+    Local GELF TCP input collecting the null-terminated frames it receives.
+
+    :param port: port to bind (0: any free port), e.g. one a handler already failed on
+    :param listen: accept connections right away (otherwise call listen())
+    :param parse: keep the decoded frames in `frames`. The benchmarks only count them,
+        so that decoding does not compete with the handler being measured.
+    """
+
+    def __init__(self, port=0, listen=True, parse=True):
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self.sock.bind(('127.0.0.1', port))
+        self.port = self.sock.getsockname()[1]
+        self.parse = parse
+        self.count = 0
+        self.frames = []
+        self.connections = 0
+        self._lock = threading.Lock()
+        if listen:
+            self.listen()
+
+    def listen(self):
+        self.sock.listen()
+        threading.Thread(target=self._accept, daemon=True).start()
+
+    def _accept(self):
+        while True:
+            try:
+                conn, _ = self.sock.accept()
+            except OSError:
+                return
+            with self._lock:
+                self.connections += 1
+            threading.Thread(target=self._read, args=(conn,), daemon=True).start()
+
+    def _read(self, conn):
+        buffer = b''
+        while True:
+            data = conn.recv(1 << 20)
+            if not data:
+                return
+            if not self.parse:
+                with self._lock:
+                    self.count += data.count(b'\x00')
+                continue
+            buffer += data
+            *frames, buffer = buffer.split(b'\x00')
+            with self._lock:
+                self.frames.extend(json.loads(f) for f in frames)
+                self.count += len(frames)
+
+    def messages(self):
+        """short_message of every frame received so far"""
+        with self._lock:
+            return [f['short_message'] for f in self.frames]
+
+    def wait_for(self, count, timeout=10):
+        """Whether `count` frames arrived within `timeout` seconds"""
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            with self._lock:
+                if self.count >= count:
+                    return True
+            time.sleep(0.005)
+        return False
+
+    def close(self):
+        self.sock.close()
@@ -3,6 +3,7 @@ from unittest.mock import MagicMock, patch
 import click.testing
 
 import main
+import structured_log
 
 
 class TestEnvironmentSpecificBehavior:
@@ -78,19 +79,22 @@ class TestEnvironmentSpecificBehavior:
         mock_pythena_instance.get_property_value.return_value = 'test_value'
         mock_pythena.return_value = mock_pythena_instance
 
-        with patch('logging.LoggerAdapter') as mock_adapter:
+        with patch('main.get_logger') as mock_get_logger:
+            # Record the bound log context at the time of each call
+            contexts = []
             mock_context_logger = MagicMock()
-            mock_adapter.return_value = mock_context_logger
+            mock_context_logger.info.side_effect = lambda *args, **kwargs: contexts.append(
+                structured_log.get_context()
+            )
+            mock_get_logger.return_value = mock_context_logger
 
             runner = click.testing.CliRunner()
             result = runner.invoke(main.main, ['--env', 'uat', '--team', 'admsol'])
 
             assert result.exit_code == 0
 
-            # Verify LoggerAdapter was called with correct context
-            mock_adapter.assert_called_once()
-            call_args = mock_adapter.call_args
-            context = call_args[0][1]  # Second argument is the context dict
+            # Verify the env/team context was bound while logging
+            context = contexts[0]
 
             assert context['env'] == 'uat'
             assert context['team'] == 'admsol'
@@ -66,15 +66,15 @@ class TestErrorScenarios:
 
     @patch('main.Pythena')
     @patch('main.configure_logging')
-    @patch('logging.LoggerAdapter')
-    def test_error_logging_during_exception(self, mock_adapter, mock_configure_logging, mock_pythena):
+    @patch('main.get_logger')
+    def test_error_logging_during_exception(self, mock_get_logger, mock_configure_logging, mock_pythena):
         """Test that errors are properly logged when exceptions occur."""
         # Setup mocks
         mock_base_logger = MagicMock()
         mock_configure_logging.return_value = mock_base_logger
 
         mock_context_logger = MagicMock()
-        mock_adapter.return_value = mock_context_logger
+        mock_get_logger.return_value = mock_context_logger
 
         mock_pythena.side_effect = Exception("Test exception")
 
@@ -83,7 +83,7 @@ class TestErrorScenarios:
 
         assert result.exit_code == 1
 
-        # Verify that exception was logged on the LoggerAdapter
+        # Verify that exception was logged on the structured logger
         mock_context_logger.exception.assert_called_once()
         exception_call = mock_context_logger.exception.call_args[0][0]
         assert "Unhandled exception occurred" in exception_call
@@ -66,21 +66,21 @@ class TestLoggingIntegration:
         mock_pythena_instance.get_property_value.return_value = 'test_value'
         mock_pythena.return_value = mock_pythena_instance
 
-        # Capture logging output through LoggerAdapter
+        # Capture logging output through the structured logger
         with patch('main.configure_logging') as mock_configure_logging:
-            with patch('logging.LoggerAdapter') as mock_adapter:
+            with patch('main.get_logger') as mock_get_logger:
                 mock_base_logger = MagicMock()
                 mock_configure_logging.return_value = mock_base_logger
 
                 mock_context_logger = MagicMock()
-                mock_adapter.return_value = mock_context_logger
+                mock_get_logger.return_value = mock_context_logger
 
                 runner = click.testing.CliRunner()
                 result = runner.invoke(main.main, ['--env', 'dev', '--team', 'acad'])
 
                 assert result.exit_code == 0
 
-                # Verify logging calls were made on the LoggerAdapter
+                # Verify logging calls were made on the structured logger
                 assert mock_context_logger.info.call_count >= 2  # Starting and finished messages
 
                 # Check for specific log messages
@@ -115,6 +115,7 @@ class TestLoggingIntegration:
 
                 assert result.exit_code == 0
 
-                # Verify handlers were flushed and closed
-                assert mock_handler.flush.call_count >= 2  # Called for both root and app logger
-                assert mock_handler.close.call_count >= 2
+                # Verify handlers were flushed and closed, once even though the
+                # handler is shared by the root and app logger
+                assert mock_handler.flush.call_count == 1
+                assert mock_handler.close.call_count == 1
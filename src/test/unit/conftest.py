@@ -0,0 +1,51 @@
+"""
+Shared fixtures for the unit tests.
+"""
+import logging
+
+import pytest
+
+
+class ListHandler(logging.Handler):
+    """Collects the records it handles, optionally blocking until `gate` is set."""
+
+    def __init__(self, gate=None):
+        super().__init__()
+        self.records = []
+        self.gate = gate
+
+    def emit(self, record):
+        if self.gate is not None:
+            self.gate.wait(5)
+        self.records.append(record)
+
+
+@pytest.fixture
+def list_handler():
+    """Factory for handlers collecting their records in `.records`"""
+    return ListHandler
+
+
+@pytest.fixture
+def capture_records():
+    """
+    capture_records(name, level) makes a list handler the only handler of the named
+    logger, stops propagation and returns the list the records are collected in. The
+    logger's level, handlers and propagation are restored after the test.
+    """
+    saved = []
+
+    def capture(name, level=logging.INFO):
+        logger = logging.getLogger(name)
+        saved.append((logger, logger.level, list(logger.handlers), logger.propagate))
+        handler = ListHandler()
+        logger.handlers = [handler]
+        logger.setLevel(level)
+        logger.propagate = False
+        return handler.records
+
+    yield capture
+    for logger, level, handlers, propagate in reversed(saved):
+        logger.setLevel(level)
+        logger.handlers = handlers
+        logger.propagate = propagate
@@ -0,0 +1,152 @@
+import logging
+import os
+import threading
+from unittest.mock import patch
+
+import pytest
+
+import async_logging
+import main
+
+
+def _make_record(level, msg):
+    return logging.LogRecord('test', level, __file__, 1, msg, None, None)
+
+
+class TestLoadAsyncSettings:
+    """Test resolution of the async logging settings."""
+
+    def test_disabled_by_default(self):
+        """Test that async logging is off without config or env vars."""
+        with patch.dict(os.environ, {}, clear=True):
+            settings = async_logging.load_async_settings({'version': 1})
+
+        assert settings['enabled'] is False
+        assert settings['overflow'] == 'block'
+
+    def test_config_section_is_read(self):
+        """Test that the async_logging section of the config is used."""
+        config = {'async_logging': {'enabled': True, 'queue_size': 5, 'overflow': 'drop-oldest'}}
+        with patch.dict(os.environ, {}, clear=True):
+            settings = async_logging.load_async_settings(config)
+
+        assert settings == {'enabled': True, 'queue_size': 5, 'overflow': 'drop-oldest'}
+
+    def test_env_vars_override_config(self):
+        """Test that LOG_ASYNC* environment variables take precedence."""
+        config = {'async_logging': {'enabled': False}}
+        env = {'LOG_ASYNC': 'true', 'LOG_ASYNC_QUEUE_SIZE': '42', 'LOG_ASYNC_OVERFLOW': 'drop-debug-first'}
+        with patch.dict(os.environ, env, clear=True):
+            settings = async_logging.load_async_settings(config)
+
+        assert settings == {'enabled': True, 'queue_size': 42, 'overflow': 'drop-debug-first'}
+
+    def test_unknown_overflow_policy_rejected(self):
+        """Test that an invalid overflow policy raises ValueError."""
+        with patch.dict(os.environ, {'LOG_ASYNC_OVERFLOW': 'explode'}, clear=True):
+            with pytest.raises(ValueError):
+                async_logging.load_async_settings({})
+
+
+class TestAsyncLoggingPipeline:
+    """Test the queue pipeline and its overflow policies."""
+
+    def test_records_reach_original_handlers_and_are_restored(self, list_handler):
+        """Test that records are delivered in the background and handlers restored on stop."""
+        logger = logging.getLogger('test.async.delivery')
+        handler = list_handler()
+        logger.handlers = [handler]
+        logger.setLevel(logging.INFO)
+
+        pipeline = async_logging.AsyncLoggingPipeline(queue_size=100)
+        pipeline.start([logger.name])
+        assert logger.handlers != [handler]
+
+        for i in range(10):
+            logger.info('message %d', i)
+        stats = pipeline.stop()
+
+        assert [r.getMessage() for r in handler.records] == [f'message {i}' for i in range(10)]
+        assert stats == {'queued': 10, 'dropped': 0}
+        assert logger.handlers == [handler]
+
+    def test_drop_oldest_policy(self):
+        """Test that drop-oldest discards the oldest queued record when full."""
+        pipeline = async_logging.AsyncLoggingPipeline(queue_size=2, overflow='drop-oldest')
+        for msg in ('a', 'b', 'c'):
+            pipeline.put(((), _make_record(logging.INFO, msg)))
+
+        queued = [item[1].msg for item in pipeline.queue.queue]
+        assert queued == ['b', 'c']
+        assert pipeline.dropped == 1
+        assert pipeline.queued == 3
+
+    def test_drop_debug_first_policy(self):
+        """Test that drop-debug-first evicts DEBUG records before anything else."""
+        pipeline = async_logging.AsyncLoggingPipeline(queue_size=2, overflow='drop-debug-first')
+        pipeline.put(((), _make_record(logging.INFO, 'info')))
+        pipeline.put(((), _make_record(logging.DEBUG, 'debug')))
+        pipeline.put(((), _make_record(logging.DEBUG, 'debug-new')))
+        pipeline.put(((), _make_record(logging.ERROR, 'error')))
+
+        queued = [item[1].msg for item in pipeline.queue.queue]
+        assert queued == ['info', 'error']
+        assert pipeline.dropped == 2
+
+    def test_slow_sink_does_not_block_caller(self, list_handler):
+        """Test that logging returns while the sink is still stalled."""
+        gate = threading.Event()
+        logger = logging.getLogger('test.async.slow')
+        handler = list_handler(gate)
+        logger.handlers = [handler]
+        logger.setLevel(logging.INFO)
+
+        pipeline = async_logging.AsyncLoggingPipeline(queue_size=100)
+        pipeline.start([logger.name])
+        logger.info('first')
+        logger.info('second')
+        assert handler.records == []
+
+        gate.set()
+        pipeline.stop()
+        assert len(handler.records) == 2
+
+    def test_exception_text_preserved(self, list_handler):
+        """Test that tracebacks survive the trip through the queue."""
+        logger = logging.getLogger('test.async.exc')
+        handler = list_handler()
+        logger.handlers = [handler]
+
+        pipeline = async_logging.AsyncLoggingPipeline()
+        pipeline.start([logger.name])
+        try:
+            raise RuntimeError('boom')
+        except RuntimeError:
+            logger.exception('failed')
+        pipeline.stop()
+
+        assert handler.records[0].getMessage() == 'failed'
+        assert 'RuntimeError: boom' in handler.records[0].exc_text
+
+
+class TestConfigureLoggingAsync:
+    """Test that configure_logging wires the async pipeline in."""
+
+    def test_async_enabled_from_env(self):
+        """Test that LOG_ASYNC moves the test logger handlers behind the queue."""
+        config = {
+            'version': 1,
+            'handlers': {'console': {'class': 'logging.StreamHandler'}},
+            'loggers': {'test': {'level': 'INFO', 'handlers': ['console']}},
+        }
+        with patch('main.get_log_config_path', return_value=config):
+            with patch.dict(os.environ, {'LOG_ASYNC': '1'}):
+                logger = main.configure_logging()
+
+        try:
+            assert type(logger.handlers[0]).__name__ == '_PipelineQueueHandler'
+        finally:
+            stats = main.stop_async_logging()
+
+        assert stats is not None
+        assert isinstance(logger.handlers[0], logging.StreamHandler)
@@ -0,0 +1,135 @@
+from unittest.mock import MagicMock, patch
+
+import click.testing
+import pytest
+
+import main
+from checkpoint import CheckpointStore, open_checkpoint_store
+
+
+@pytest.fixture
+def db(tmp_path):
+    return str(tmp_path / 'checkpoints.db')
+
+
+class TestCheckpointStore:
+    """Test the SQLite checkpoint store."""
+
+    def test_units_and_watermark_survive_reopen(self, db):
+        """Test that committed units and the watermark are seen by the next run."""
+        store = CheckpointStore(db)
+        checkpoint = store.checkpoint('acad', 'dev')
+        checkpoint.mark_done('2026-01-01', watermark='2026-01-01')
+        checkpoint.mark_done('2026-01-02', watermark='2026-01-02')
+        checkpoint.commit()
+        store.close()
+
+        checkpoint = CheckpointStore(db).checkpoint('acad', 'dev')
+        assert checkpoint.watermark == '2026-01-02'
+        assert checkpoint.pending(['2026-01-01', '2026-01-02', '2026-01-03']) == ['2026-01-03']
+
+    def test_tenants_are_separate(self, db):
+        """Test that each team/env combination has its own checkpoint."""
+        store = CheckpointStore(db)
+        checkpoint = store.checkpoint('acad', 'dev')
+        checkpoint.mark_done(1)
+        checkpoint.commit()
+
+        assert store.checkpoint('acad', 'prd').pending([1]) == [1]
+        assert store.checkpoint('acad', 'dev').pending([1]) == []
+
+    def test_commits_every_interval(self, db):
+        """Test that buffered units are committed once the interval is reached."""
+        store = CheckpointStore(db, interval=3)
+        checkpoint = store.checkpoint('acad', 'dev')
+        for unit in range(5):
+            checkpoint.mark_done(unit)
+
+        # A crash now loses only the units after the last commit
+        assert CheckpointStore(db).checkpoint('acad', 'dev').done_count == 3
+
+    def test_watermark_stops_after_failure(self, db):
+        """Test that the watermark does not move past a failed unit."""
+        checkpoint = CheckpointStore(db).checkpoint('acad', 'dev')
+        checkpoint.mark_done(1, watermark=1)
+        checkpoint.mark_failed(2)
+        checkpoint.mark_done(3, watermark=3)
+
+        assert checkpoint.watermark == 1
+        assert checkpoint.is_done(3)
+
+    def test_no_resume_returns_every_unit(self, db):
+        """Test that without resume done units are processed again."""
+        checkpoint = CheckpointStore(db, resume=False).checkpoint('acad', 'dev')
+        checkpoint.mark_done(1)
+        assert checkpoint.pending([1, 2]) == [1, 2]
+
+    def test_reset(self, db):
+        """Test that reset forgets the units and watermark of the selected tenants."""
+        store = CheckpointStore(db)
+        checkpoint = store.checkpoint('acad', 'dev')
+        checkpoint.mark_done(1, watermark=1)
+        checkpoint.commit()
+        store.close()
+
+        store = open_checkpoint_store(db, [('dev', 'acad')], reset=True)
+        checkpoint = store.checkpoint('acad', 'dev')
+        assert (checkpoint.done_count, checkpoint.watermark) == (0, None)
+
+    def test_no_path_disables_checkpoints(self):
+        """Test that no store is opened without a path."""
+        assert open_checkpoint_store(None, [('dev', 'acad')]) is None
+
+
+class TestCheckpointInMain:
+    """Test the --checkpoint options."""
+
+    def run(self, args, processed, fail_on=None, since=None):
+        def process(unit, properties):
+            if unit == fail_on:
+                raise ValueError(f'bad unit {unit}')
+            processed.append(unit)
+            return unit
+
+        def units(properties, watermark=None):
+            if since is not None:
+                since.append(watermark)
+            return [1, 2, 3, 4]
+
+        with patch('main.Pythena') as mock_pythena, patch('main.configure_logging', return_value=MagicMock()), \
+                patch('main.application_units', side_effect=units), \
+                patch('main.process_unit', side_effect=process), \
+                patch('main.unit_watermark', side_effect=lambda unit: unit):
+            mock_pythena.return_value.get_properties.return_value = {'property': {'name': 'value'}}
+            runner = click.testing.CliRunner()
+            return runner.invoke(main.main, ['--team', 'acad', *args])
+
+    def test_failed_run_resumes(self, db):
+        """Test that a rerun after a failure only processes the units not done."""
+        first = []
+        result = self.run(['--checkpoint', db, '--checkpoint-interval', '1'], first, fail_on=3)
+        assert result.exit_code == 1
+        assert first == [1, 2, 4]
+
+        second = []
+        assert self.run(['--checkpoint', db], second).exit_code == 0
+        assert second == [3]
+
+    def test_reset_and_no_resume_redo_everything(self, db):
+        """Test that --reset-checkpoint and --no-resume process every unit again."""
+        self.run(['--checkpoint', db], [])
+
+        processed = []
+        self.run(['--checkpoint', db, '--no-resume'], processed)
+        assert processed == [1, 2, 3, 4]
+
+        processed = []
+        self.run(['--checkpoint', db, '--reset-checkpoint'], processed)
+        assert processed == [1, 2, 3, 4]
+
+    def test_incremental_passes_watermark(self, db):
+        """Test that --incremental hands the last watermark to application_units."""
+        since = []
+        self.run(['--checkpoint', db, '--incremental'], [], since=since)
+        self.run(['--checkpoint', db, '--incremental'], [], since=since)
+        assert since == [None, 4]
@@ -0,0 +1,176 @@
+import io
+import logging
+import os
+import shutil
+import tempfile
+import threading
+import time
+from unittest.mock import patch
+
+import click.testing
+import pytest
+
+import daemon
+
+
+@pytest.fixture
+def socket_path():
+    # Unix socket paths are limited to ~100 characters, so stay out of tmp_path
+    directory = tempfile.mkdtemp(prefix='td-', dir='/tmp')
+    yield os.path.join(directory, 'daemon.sock')
+    shutil.rmtree(directory, ignore_errors=True)
+
+
+@pytest.fixture
+def server(socket_path):
+    """A running daemon whose Athena client is mocked."""
+    app_logger = logging.getLogger('test')
+    level, handlers = app_logger.level, list(app_logger.handlers)
+    app_logger.setLevel(logging.INFO)
+
+    with patch('main.Pythena') as mock_pythena, patch('main.configure_logging', return_value=app_logger), \
+            patch('shutdown.shutdown_handlers'):
+        mock_pythena.return_value.get_properties.return_value = {'property': {'name': 'warm'}}
+        server = daemon.DaemonServer(socket_path, max_jobs=2, idle_timeout=0)
+        server.start()
+        thread = threading.Thread(target=server.serve_forever, daemon=True)
+        thread.start()
+        server.mock_pythena = mock_pythena
+        yield server
+        server.stop()
+        thread.join(5)
+
+    app_logger.setLevel(level)
+    app_logger.handlers = handlers
+
+
+class TestDaemon:
+    """Test the resident daemon and its submit client."""
+
+    def test_submit_streams_logs_and_exit_code(self, server):
+        """Test that a submission streams the job's log lines and returns its exit code."""
+        out = io.StringIO()
+        exit_code = daemon.submit_job(server.socket_path, ['--env', 'dev', '--team', 'acad'], out)
+
+        assert exit_code == 0
+        assert 'Starting test' in out.getvalue()
+        assert 'Property value: warm' in out.getvalue()
+
+    def test_properties_reused_between_jobs(self, server):
+        """Test that properties are fetched once and reused until --refresh-config."""
+        for _ in range(3):
+            assert daemon.submit_job(server.socket_path, ['--team', 'acad'], io.StringIO()) == 0
+        assert server.mock_pythena.call_count == 1
+
+        assert daemon.submit_job(server.socket_path, ['--team', 'acad', '--refresh-config'], io.StringIO()) == 0
+        assert server.mock_pythena.call_count == 2
+
+    def test_concurrent_submissions_keep_logs_apart(self, server):
+        """Test that concurrent jobs only receive their own log lines."""
+        outputs = {'acad': io.StringIO(), 'ident': io.StringIO()}
+        threads = [
+            threading.Thread(target=daemon.submit_job, args=(server.socket_path, ['--team', team], out))
+            for team, out in outputs.items()
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join(10)
+
+        for out in outputs.values():
+            assert out.getvalue().count('Starting test') == 1
+
+    def test_usage_error_reported(self, server):
+        """Test that invalid options are reported to the client with exit code 2."""
+        out = io.StringIO()
+        assert daemon.submit_job(server.socket_path, ['--env', 'dev'], out) == 2
+        assert "Missing option '--team'" in out.getvalue()
+
+    def test_help_returned_to_client(self, server, capsys):
+        """Test that --help output goes to the client, not the daemon's stdout."""
+        out = io.StringIO()
+        assert daemon.submit_job(server.socket_path, ['--help'], out) == 0
+        assert 'Usage: test' in out.getvalue()
+        assert '--team' in out.getvalue()
+        assert capsys.readouterr().out == ''
+
+    def test_unsupported_option_rejected(self, server):
+        """Test that options acting on the daemon process are rejected, not ignored."""
+        out = io.StringIO()
+        assert daemon.submit_job(server.socket_path, ['--team', 'acad', '--profile'], out) == 2
+        assert '--profile is not supported by the daemon' in out.getvalue()
+        server.mock_pythena.assert_not_called()
+
+    def test_refresh_drops_properties(self, server):
+        """Test that a refresh (SIGHUP) forces the next job to fetch again."""
+        daemon.submit_job(server.socket_path, ['--team', 'acad'], io.StringIO())
+        server.refresh()
+        daemon.submit_job(server.socket_path, ['--team', 'acad'], io.StringIO())
+        assert server.mock_pythena.call_count == 2
+
+    def test_idle_timeout_stops_server(self, socket_path):
+        """Test that an idle daemon shuts down and removes its socket."""
+        with patch('main.Pythena'), patch('main.configure_logging', return_value=logging.getLogger('test.idle')), \
+                patch('shutdown.shutdown_handlers'):
+            server = daemon.DaemonServer(socket_path, idle_timeout=0.2)
+            server.start()
+            start = time.monotonic()
+            server.serve_forever()
+
+        assert time.monotonic() - start < 5
+        assert not os.path.exists(socket_path)
+
+    def test_submit_falls_back_without_daemon(self, socket_path):
+        """Test that submit runs the job in-process when no daemon is listening."""
+        with patch('main.main.main') as mock_main:
+            runner = click.testing.CliRunner()
+            result = runner.invoke(daemon.cli, ['submit', '--socket', socket_path, '--', '--team', 'acad'])
+
+        assert result.exit_code == 0
+        mock_main.assert_called_once_with(args=['--team', 'acad'], prog_name='test')
+
+    def test_submit_without_fallback_fails(self, socket_path):
+        """Test that --no-fallback reports a missing daemon."""
+        runner = click.testing.CliRunner()
+        result = runner.invoke(daemon.cli, ['submit', '--socket', socket_path, '--no-fallback', '--', '--team', 'acad'])
+        assert result.exit_code == 1
+        assert 'No daemon listening' in result.output
+
+
+class TestSocketOwnership:
+    """Test that the socket is private to the current user."""
+
+    def test_default_socket_in_private_dir(self, socket_path):
+        """Test that the default socket lives in a per-user directory."""
+        with patch.dict(os.environ, {'TEST_DAEMON_SOCKET': ''}):
+            path = daemon.default_socket_path()
+        assert os.path.basename(os.path.dirname(path)) == f'test-daemon-{os.getuid()}'
+
+    def test_shared_dir_refused(self, socket_path):
+        """Test that the daemon does not listen in a directory others can write to."""
+        os.chmod(os.path.dirname(socket_path), 0o777)
+        with pytest.raises(click.ClickException, match='writable by other users'):
+            daemon._listen(socket_path)
+
+    def test_foreign_file_not_replaced(self, socket_path):
+        """Test that the daemon refuses to unlink something that is not its socket."""
+        with open(socket_path, 'w') as f:
+            f.write('not a socket')
+        with pytest.raises(click.ClickException, match='Refusing to replace'):
+            daemon._listen(socket_path)
+        assert os.path.exists(socket_path)
+
+    def test_submit_refuses_other_users_socket(self, server):
+        """Test that submit does not talk to a socket owned by another user."""
+        with patch('os.getuid', return_value=os.getuid() + 1):
+            with pytest.raises(PermissionError):
+                daemon.submit_job(server.socket_path, ['--team', 'acad'], io.StringIO())
+
+    def test_submit_cli_reports_foreign_socket(self, socket_path):
+        """Test that the submit command fails clearly instead of falling back."""
+        with open(socket_path, 'w') as f:
+            f.write('not a socket')
+        runner = click.testing.CliRunner()
+        result = runner.invoke(daemon.cli, ['submit', '--socket', socket_path, '--', '--team', 'acad'])
+        assert result.exit_code == 1
+        assert 'Refusing to submit' in result.output
@@ -0,0 +1,143 @@
+import json
+import logging
+import sys
+
+import pytest
+
+import fast_formatter
+import main
+import structured_log
+from fast_formatter import FastFormatter
+
+SIMPLE = '%(asctime)s %(levelname)-8s [%(filename)s %(lineno)d] : %(message)s'
+
+
+def _record(msg, args=None, level=logging.INFO, created=None, exc_info=None):
+    record = logging.LogRecord('test', level, '/app/src/python/main.py', 42, msg, args, exc_info, 'run_tenant')
+    if created is not None:
+        record.created = created
+        record.msecs = (created - int(created)) * 1000
+    return record
+
+
+class TestTextOutput:
+    """Test that text output matches logging.Formatter."""
+
+    @pytest.mark.parametrize(
+        'fmt',
+        [
+            SIMPLE,
+            '%(name)s:%(levelno)03d %(funcName)s %(module)s %(message)r',
+            '100%% %(message)s %(process)d',
+            '%(message)s',
+        ],
+    )
+    def test_same_output_as_stdlib(self, fmt):
+        """Test that the compiled format renders like logging.Formatter."""
+        record = _record('Loaded %d rows for %s', (12, 'acad'), created=1_800_000_000.25)
+        assert FastFormatter(fmt).format(record) == logging.Formatter(fmt).format(record)
+
+    def test_datefmt_and_defaults(self):
+        """Test a custom datefmt and a default for a missing field."""
+        fmt = '%(asctime)s %(team)s %(message)s'
+        record = _record('hello', created=1_800_000_000.5)
+        fast = FastFormatter(fmt, datefmt='%H:%M', defaults={'team': '-'})
+        stdlib = logging.Formatter(fmt, datefmt='%H:%M', defaults={'team': '-'})
+        assert fast.format(record) == stdlib.format(record)
+
+    def test_exception_text(self):
+        """Test that tracebacks are appended like logging.Formatter does."""
+        try:
+            raise ValueError('bad row')
+        except ValueError:
+            exc_info = sys.exc_info()
+        fast = FastFormatter(SIMPLE).format(_record('failed', created=1_800_000_000.5, exc_info=exc_info))
+        stdlib = logging.Formatter(SIMPLE).format(_record('failed', created=1_800_000_000.5, exc_info=exc_info))
+        assert fast == stdlib
+        assert fast.endswith('ValueError: bad row')
+
+    def test_timestamp_cached_per_second(self, monkeypatch):
+        """Test that strftime runs once per second, with the milliseconds still exact."""
+        calls = []
+        strftime = fast_formatter.time.strftime
+        monkeypatch.setattr(fast_formatter.time, 'strftime', lambda *a: calls.append(a) or strftime(*a))
+        formatter = FastFormatter('%(asctime)s')
+        first = formatter.format(_record('a', created=1_800_000_000.25))
+        second = formatter.format(_record('b', created=1_800_000_000.75))
+        formatter.format(_record('c', created=1_800_000_001.0))
+
+        assert len(calls) == 2
+        assert first.endswith(',250') and second.endswith(',750')
+        assert first[:-4] == second[:-4]
+
+    def test_invalid_options(self):
+        """Test that other format styles and outputs are rejected."""
+        with pytest.raises(ValueError, match='%-style'):
+            FastFormatter('{message}', style='{')
+        with pytest.raises(ValueError, match='Unknown formatter output'):
+            FastFormatter(output='xml')
+
+
+class TestJsonOutput:
+    """Test the JSON lines output."""
+
+    def test_structured_fields_included(self, list_handler):
+        """Test that bound context and logging kwargs become JSON fields."""
+        logger = logging.getLogger('test.fast_formatter')
+        handler = list_handler()
+        logger.addHandler(handler)
+        logger.setLevel(logging.INFO)
+        try:
+            with structured_log.bound(env='dev', team='acad'):
+                structured_log.get_logger(logger).info('Loaded %d rows', 3, table='person')
+        finally:
+            logger.removeHandler(handler)
+
+        line = FastFormatter(output='json').format(handler.records[0])
+        data = json.loads(line)
+        assert '\n' not in line
+        assert data['message'] == 'Loaded 3 rows'
+        assert (data['level'], data['logger']) == ('INFO', 'test.fast_formatter')
+        assert (data['env'], data['team'], data['table']) == ('dev', 'acad', 'person')
+        assert 'file' not in data
+
+    def test_caller_and_exception(self):
+        """Test the optional caller fields and the exception field."""
+        try:
+            raise ValueError('bad row')
+        except ValueError:
+            record = _record('failed', level=logging.ERROR, exc_info=sys.exc_info())
+        record.payload = object()
+        data = json.loads(FastFormatter(output='json', caller=True).format(record))
+        assert (data['file'], data['line'], data['function']) == ('/app/src/python/main.py', 42, 'run_tenant')
+        assert data['exception'].endswith('ValueError: bad row')
+        assert data['payload'].startswith('<object')
+
+
+class TestCallerInfo:
+    """Test that records keep their caller's file and line."""
+
+    def test_handler_added_after_config_gets_caller(self, list_handler):
+        """Test that a config without caller fields does not strip it from later handlers."""
+        config = {
+            'version': 1,
+            'disable_existing_loggers': False,
+            'formatters': {'bare': {'class': 'fast_formatter.FastFormatter', 'format': '%(message)s'}},
+            'handlers': {'console': {'class': 'logging.NullHandler', 'formatter': 'bare'}},
+            'loggers': {'test.caller': {'level': 'INFO', 'handlers': ['console']}},
+        }
+        main._apply_handlers(config)
+        logger = logging.getLogger('test.caller')
+        handler = list_handler()
+        handler.setFormatter(FastFormatter('%(filename)s:%(lineno)d %(message)s'))
+        logger.addHandler(handler)
+        try:
+            logger.warning('late handler', stack_info=True)
+        finally:
+            logger.removeHandler(handler)
+            logger.handlers = []
+
+        record = handler.records[0]
+        assert record.filename == 'test_fast_formatter.py'
+        assert record.lineno > 0
+        assert record.stack_info
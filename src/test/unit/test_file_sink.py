@@ -0,0 +1,198 @@
+import gzip
+import logging
+import logging.config
+import os
+import time
+from unittest.mock import patch
+
+import pytest
+
+import file_sink
+from file_sink import BufferedRotatingFileHandler
+
+
+def _record(msg, level=logging.INFO):
+    return logging.LogRecord('test', level, __file__, 1, msg, None, None)
+
+
+@pytest.fixture
+def log_path(tmp_path):
+    return tmp_path / 'test.log'
+
+
+def read_rotated(handler):
+    lines = []
+    for path in handler.rotated_files():
+        opener = gzip.open if path.endswith('.gz') else open
+        with opener(path, 'rt') as f:
+            lines.extend(f.read().splitlines())
+    return lines
+
+
+class TestBuffering:
+    """Test block writes and the flush triggers."""
+
+    def test_records_buffered_until_threshold(self, log_path):
+        """Test that small records stay in memory until buffer_bytes is reached."""
+        handler = BufferedRotatingFileHandler(str(log_path), buffer_bytes=100, flush_interval=0)
+        try:
+            handler.handle(_record('a' * 40))
+            handler.handle(_record('b' * 40))
+            assert log_path.read_text() == ''
+            assert handler.pending_records() == 2
+
+            handler.handle(_record('c' * 40))
+            assert log_path.read_text().splitlines() == ['a' * 40, 'b' * 40, 'c' * 40]
+            assert handler.stats['writes'] == 1
+        finally:
+            handler.close()
+
+    def test_error_flushes_immediately(self, log_path):
+        """Test that an ERROR record is written at once with what was buffered before it."""
+        handler = BufferedRotatingFileHandler(str(log_path), flush_interval=0)
+        try:
+            handler.handle(_record('working'))
+            handler.handle(_record('failed', logging.ERROR))
+            assert log_path.read_text().splitlines() == ['working', 'failed']
+        finally:
+            handler.close()
+
+    def test_interval_flush(self, log_path):
+        """Test that the background thread writes records older than flush_interval."""
+        handler = BufferedRotatingFileHandler(str(log_path), flush_interval=0.02)
+        try:
+            handler.handle(_record('later'))
+            handler._stop.wait(0.5)
+            assert log_path.read_text() == 'later\n'
+        finally:
+            handler.close()
+
+    def test_close_writes_buffer_and_appends(self, log_path):
+        """Test that close() writes pending records and a new handler appends."""
+        log_path.write_text('previous run\n')
+        handler = BufferedRotatingFileHandler(str(log_path), flush_interval=0)
+        handler.handle(_record('this run'))
+        handler.close()
+        handler.close()
+        assert log_path.read_text().splitlines() == ['previous run', 'this run']
+
+
+class TestRotation:
+    """Test size and time rotation with background compression."""
+
+    def test_size_rotation_compresses_and_prunes(self, log_path):
+        """Test that the file rotates at max_bytes and old segments are gzipped and pruned."""
+        handler = BufferedRotatingFileHandler(
+            str(log_path), buffer_bytes=1, flush_interval=0, max_bytes=25, backup_count=2
+        )
+        try:
+            for i in range(6):
+                handler.handle(_record(f'record {i:02d} padded'))
+            assert handler.wait_for_compression(5)
+            rotated = handler.rotated_files()
+        finally:
+            handler.close()
+
+        assert len(rotated) == 2
+        assert all(path.endswith('.gz') for path in rotated)
+        assert handler.stats['rotations'] == 5
+        assert read_rotated(handler) == ['record 03 padded', 'record 04 padded']
+        assert log_path.read_text() == 'record 05 padded\n'
+
+    def test_time_rotation(self, log_path):
+        """Test that the file rotates once the `when` boundary has passed."""
+        now = [1_800_000_000.0]
+        with patch('file_sink.time.time', lambda: now[0]):
+            handler = BufferedRotatingFileHandler(str(log_path), flush_interval=0, when='H', compress=False)
+            try:
+                handler.handle(_record('first hour'))
+                handler.flush()
+                now[0] += 3601
+                handler.handle(_record('second hour'))
+                handler.flush()
+                assert handler.wait_for_compression(5)
+                assert read_rotated(handler) == ['first hour']
+                assert log_path.read_text() == 'second hour\n'
+            finally:
+                handler.close()
+
+    def test_aged_file_rotated_on_first_write(self, log_path):
+        """Test that a file last written before the boundary rotates when a new run writes to it."""
+        log_path.write_text('three days ago\n')
+        aged = time.time() - 3 * 86400
+        os.utime(log_path, (aged, aged))
+        handler = BufferedRotatingFileHandler(str(log_path), flush_interval=0, when='midnight', compress=False)
+        try:
+            handler.handle(_record('today'))
+            handler.flush()
+            assert handler.wait_for_compression(5)
+            assert read_rotated(handler) == ['three days ago']
+            assert log_path.read_text() == 'today\n'
+        finally:
+            handler.close()
+
+    def test_same_second_rotations_do_not_collide(self, log_path):
+        """Test that two rotations within one second keep both segments."""
+        handler = BufferedRotatingFileHandler(str(log_path), buffer_bytes=1, flush_interval=0, max_bytes=1, compress=False)
+        try:
+            with patch('file_sink.time.time', lambda: 1_800_000_000.0):
+                for i in range(3):
+                    handler.handle(_record(f'r{i}'))
+            assert handler.wait_for_compression(5)
+            assert sorted(read_rotated(handler)) == ['r0', 'r1']
+        finally:
+            handler.close()
+
+    def test_pruned_names_not_reused_within_a_second(self, log_path):
+        """Test that a rotation after a prune in the same second keeps the newest segments."""
+        handler = BufferedRotatingFileHandler(
+            str(log_path), buffer_bytes=1, flush_interval=0, max_bytes=1, backup_count=2, compress=False
+        )
+        try:
+            with patch('file_sink.time.time', lambda: 1_800_000_000.0):
+                for i in range(6):
+                    handler.handle(_record(f'r{i}'))
+                    assert handler.wait_for_compression(5)
+            assert read_rotated(handler) == ['r3', 'r4']
+        finally:
+            handler.close()
+
+    def test_invalid_when(self, log_path):
+        """Test that an unknown rotation unit is rejected."""
+        with pytest.raises(ValueError, match='Invalid rotation interval'):
+            BufferedRotatingFileHandler(str(log_path), when='fortnight')
+
+
+class TestDictConfig:
+    """Test using the handler from a log config."""
+
+    def test_logfile_handler_from_config(self, log_path):
+        """Test that the handler can replace logging.FileHandler in log-config.yaml."""
+        config = {
+            'version': 1,
+            'disable_existing_loggers': False,
+            'formatters': {'simple': {'format': '%(levelname)s %(message)s'}},
+            'handlers': {
+                'logfile': {
+                    'class': 'file_sink.BufferedRotatingFileHandler',
+                    'filename': str(log_path),
+                    'formatter': 'simple',
+                    'max_bytes': 1048576,
+                    'when': 'midnight',
+                    'backup_count': 3,
+                },
+            },
+            'loggers': {'test.file_sink': {'level': 'INFO', 'handlers': ['logfile'], 'propagate': False}},
+        }
+        logging.config.dictConfig(config)
+        logger = logging.getLogger('test.file_sink')
+        handler = logger.handlers[0]
+        try:
+            assert isinstance(handler, file_sink.BufferedRotatingFileHandler)
+            logger.info('configured')
+            handler.flush()
+            assert log_path.read_text() == 'INFO configured\n'
+        finally:
+            logger.handlers = []
+            handler.close()
+        assert not os.path.exists(str(log_path) + '.tmp')
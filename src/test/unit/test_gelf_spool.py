@@ -0,0 +1,179 @@
+import logging
+import os
+import socket
+import tempfile
+import threading
+import time
+
+import pytest
+from gelf_server import FakeGelfServer
+
+import gelf_spool
+
+
+def _unused_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def _record(msg):
+    return logging.LogRecord('test', logging.INFO, __file__, 1, msg, None, None)
+
+
+@pytest.fixture
+def spool_dir():
+    with tempfile.TemporaryDirectory() as path:
+        yield path
+
+
+class TestSpoolingGelfTcpHandler:
+    """Test direct sending, spooling and replay."""
+
+    def test_sends_directly_when_reachable(self, spool_dir):
+        """Test that records go straight to Graylog and nothing is spooled."""
+        server = FakeGelfServer()
+        handler = gelf_spool.SpoolingGelfTcpHandler('127.0.0.1', server.port, spool_dir=spool_dir, _appName='test')
+        try:
+            handler.emit(_record('hello'))
+            # The first record connected instead of waiting in the spool for the drainer
+            assert not handler.spool.pending
+            assert os.listdir(spool_dir) == []
+            assert server.wait_for(1, timeout=5)
+            assert server.messages() == ['hello']
+            assert server.frames[0]['_appName'] == 'test'
+        finally:
+            handler.close()
+            server.close()
+
+    def test_spools_while_unreachable_and_replays(self, spool_dir):
+        """Test that records are spooled during an outage and replayed in order."""
+        port = _unused_port()
+        handler = gelf_spool.SpoolingGelfTcpHandler(
+            '127.0.0.1', port, spool_dir=spool_dir, drain_interval=0.05, close_timeout=1
+        )
+        try:
+            for i in range(5):
+                handler.emit(_record(f'message {i}'))
+            assert handler.spool.pending
+            assert any(n.endswith('.seg') for n in os.listdir(spool_dir))
+
+            server = FakeGelfServer(port)
+            try:
+                assert server.wait_for(5, timeout=5)
+                handler.emit(_record('after recovery'))
+                assert server.wait_for(6, timeout=5)
+                messages = server.messages()
+            finally:
+                server.close()
+        finally:
+            handler.close()
+
+        assert messages == [f'message {i}' for i in range(5)] + ['after recovery']
+        assert not any(n.endswith('.seg') for n in os.listdir(spool_dir))
+
+    def test_next_run_picks_up_leftover_spool(self, spool_dir):
+        """Test that a spool left by a previous run is replayed on startup."""
+        port = _unused_port()
+        first = gelf_spool.SpoolingGelfTcpHandler('127.0.0.1', port, spool_dir=spool_dir, close_timeout=0.1)
+        first.emit(_record('from the previous run'))
+        first.close()
+        assert any(n.endswith('.seg') for n in os.listdir(spool_dir))
+
+        server = FakeGelfServer(port)
+        second = gelf_spool.SpoolingGelfTcpHandler('127.0.0.1', port, spool_dir=spool_dir)
+        try:
+            assert server.wait_for(1, timeout=5)
+            assert server.messages() == ['from the previous run']
+        finally:
+            second.close()
+            server.close()
+
+    def test_close_bounded_by_one_deadline(self, spool_dir):
+        """Test that close() waits at most close_timeout in total, not once per step."""
+        handler = gelf_spool.SpoolingGelfTcpHandler('127.0.0.1', _unused_port(), spool_dir=spool_dir, close_timeout=0.3)
+        release = threading.Event()
+
+        def hung_drain(deadline=None):
+            # The drainer's replay hangs; close()'s own replay runs until its deadline
+            release.wait(None if deadline is None else max(0.0, deadline - time.monotonic()))
+            return False
+
+        handler.drain = hung_drain
+        handler.emit(_record('spooled'))
+        time.sleep(0.05)
+        try:
+            start = time.monotonic()
+            handler.close()
+            assert time.monotonic() - start < 0.45
+        finally:
+            release.set()
+
+    def test_close_is_idempotent(self, spool_dir):
+        """Test that closing twice (root and test logger share it) is safe."""
+        handler = gelf_spool.SpoolingGelfTcpHandler('127.0.0.1', _unused_port(), spool_dir=spool_dir, close_timeout=0.1)
+        handler.close()
+        handler.close()
+
+    def test_default_spool_dir(self, gelf_spool_dir, monkeypatch):
+        """Test that the spool goes to GELF_SPOOL_DIR, else to a private temp dir, never the cwd."""
+        handler = gelf_spool.SpoolingGelfTcpHandler('127.0.0.1', _unused_port(), close_timeout=0.1)
+        handler.close()
+        assert handler.spool.directory == str(gelf_spool_dir)
+        assert os.stat(gelf_spool_dir).st_mode & 0o777 == 0o700
+
+        monkeypatch.delenv('GELF_SPOOL_DIR')
+        default = gelf_spool.default_spool_dir()
+        assert os.path.dirname(default) == tempfile.gettempdir()
+        assert os.path.basename(default).startswith('test-gelf-spool')
+
+
+class TestGelfSpoolReplay:
+    """Test the segment replay bookkeeping."""
+
+    def test_replay_resumes_from_committed_offset(self, spool_dir):
+        """Test that a failed replay resumes without resending committed batches."""
+        spool = gelf_spool.GelfSpool(spool_dir, segment_max_bytes=1024 * 1024)
+        for i in range(4):
+            spool.append(f'frame{i}'.encode() + b'\x00')
+        (path,) = spool.seal()
+
+        sent = []
+
+        def flaky_send(data):
+            if sent:
+                raise ConnectionError('dropped')
+            sent.append(data)
+
+        with pytest.raises(ConnectionError):
+            spool.replay(path, batch_bytes=14, send=flaky_send)
+
+        resent = []
+        assert spool.replay(path, batch_bytes=1024, send=resent.append)
+        assert b''.join(sent + resent) == b'frame0\x00frame1\x00frame2\x00frame3\x00'
+        assert spool.finish_if_empty()
+
+    def test_spool_capped_by_dropping_oldest(self, spool_dir):
+        """Test that the oldest segments are dropped once the spool passes max_bytes."""
+        spool = gelf_spool.GelfSpool(spool_dir, segment_max_bytes=100, max_bytes=300)
+        frame = b'x' * 49 + b'\x00'
+        for _ in range(20):
+            spool.append(frame)
+        spool.seal()
+
+        total = sum(os.path.getsize(os.path.join(spool_dir, n)) for n in os.listdir(spool_dir))
+        assert total <= 300
+        assert spool.dropped_frames + spool.pending_frames() == 20
+        assert spool.dropped_frames >= 14
+
+    def test_dropped_records_reported(self, spool_dir):
+        """Test that the handler reports dropped records for the metrics."""
+        handler = gelf_spool.SpoolingGelfTcpHandler(
+            '127.0.0.1', _unused_port(), spool_dir=spool_dir, segment_max_bytes=200, max_spool_bytes=400, close_timeout=0.1
+        )
+        try:
+            for i in range(50):
+                handler.emit(_record(f'message {i}'))
+            assert handler.stats['dropped'] > 0
+        finally:
+            handler.close()
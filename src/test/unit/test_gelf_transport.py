@@ -0,0 +1,126 @@
+import gzip
+import json
+import logging
+import socket
+import time
+import zlib
+
+import pytest
+from gelf_server import FakeGelfServer
+
+import gelf_transport
+
+
+def _record(msg):
+    return logging.LogRecord('test', logging.INFO, __file__, 1, msg, None, None)
+
+
+class TestBatchingGelfHandlerTcp:
+    """Test the persistent TCP mode."""
+
+    def test_batches_over_one_connection(self):
+        """Test that records arrive in order over a single connection with the app fields."""
+        server = FakeGelfServer()
+        handler = gelf_transport.BatchingGelfHandler(
+            '127.0.0.1', server.port, batch_records=10, flush_interval=0.05, _appName='test', _appType='batch'
+        )
+        try:
+            for i in range(50):
+                handler.emit(_record(f'message {i}'))
+            assert server.wait_for(50, timeout=5)
+        finally:
+            handler.close()
+            server.close()
+
+        assert server.messages() == [f'message {i}' for i in range(50)]
+        assert server.frames[0]['_appName'] == 'test'
+        assert server.frames[0]['_appType'] == 'batch'
+        assert server.connections == 1
+        assert handler.stats['batches'] <= 50 // 10 + 1
+
+    def test_reconnects_with_backoff(self):
+        """Test that records are buffered while Graylog refuses and sent once it answers."""
+        server = FakeGelfServer(listen=False)
+        handler = gelf_transport.BatchingGelfHandler(
+            '127.0.0.1', server.port, flush_interval=0.01, backoff_initial=0.01, backoff_max=0.05
+        )
+        try:
+            handler.emit(_record('while down'))
+            deadline = time.monotonic() + 5
+            while handler.stats['connect_failures'] < 2 and time.monotonic() < deadline:
+                time.sleep(0.01)
+            assert handler.stats['connect_failures'] >= 2
+
+            server.listen()
+            assert server.wait_for(1, timeout=5)
+        finally:
+            handler.close()
+            server.close()
+
+        assert server.messages() == ['while down']
+        assert handler.stats['dropped'] == 0
+
+    def test_buffer_is_bounded(self):
+        """Test that the oldest records are dropped once the buffer is full."""
+        server = FakeGelfServer(listen=False)
+        handler = gelf_transport.BatchingGelfHandler(
+            '127.0.0.1', server.port, max_buffer_bytes=2000, backoff_initial=60, close_timeout=0.1
+        )
+        try:
+            for i in range(100):
+                handler.emit(_record(f'message {i}'))
+            assert handler._buffer_bytes <= 2000
+            assert handler.stats['dropped'] > 0
+        finally:
+            handler.close()
+            server.close()
+
+    def test_compression_rejected_over_tcp(self):
+        """Test that TCP refuses compression, which Graylog does not support there."""
+        with pytest.raises(ValueError):
+            gelf_transport.BatchingGelfHandler('127.0.0.1', 12201, protocol='tcp', compress='gzip')
+
+
+class TestBatchingGelfHandlerUdp:
+    """Test the chunked UDP mode."""
+
+    @pytest.fixture
+    def udp_server(self):
+        sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        sock.bind(('127.0.0.1', 0))
+        sock.settimeout(5)
+        yield sock
+        sock.close()
+
+    @pytest.mark.parametrize('compress,decompress', [('zlib', zlib.decompress), ('gzip', gzip.decompress)])
+    def test_compressed_datagram(self, udp_server, compress, decompress):
+        """Test that small records are sent as one compressed datagram."""
+        handler = gelf_transport.BatchingGelfHandler(
+            '127.0.0.1', udp_server.getsockname()[1], protocol='udp', compress=compress
+        )
+        try:
+            handler.emit(_record('hello'))
+            handler.flush()
+            data = udp_server.recv(65536)
+        finally:
+            handler.close()
+
+        assert json.loads(decompress(data))['short_message'] == 'hello'
+
+    def test_large_record_is_chunked(self, udp_server):
+        """Test that a record larger than chunk_size is split into GELF chunks."""
+        handler = gelf_transport.BatchingGelfHandler(
+            '127.0.0.1', udp_server.getsockname()[1], protocol='udp', chunk_size=200
+        )
+        try:
+            handler.emit(_record('x' * 1000))
+            handler.flush()
+            chunks = [udp_server.recv(65536)]
+            total = chunks[0][11]
+            chunks += [udp_server.recv(65536) for _ in range(total - 1)]
+        finally:
+            handler.close()
+
+        assert all(chunk[:2] == b'\x1e\x0f' for chunk in chunks)
+        payload = b''.join(chunk[12:] for chunk in sorted(chunks, key=lambda c: c[10]))
+        assert json.loads(payload)['short_message'] == 'x' * 1000
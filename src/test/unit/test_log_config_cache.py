@@ -0,0 +1,154 @@
+import os
+import tempfile
+from unittest.mock import patch
+
+import pytest
+import yaml
+
+import log_config_cache
+import main
+
+CONFIG = {
+    'version': 1,
+    'formatters': {'simple': {'format': '%(message)s'}},
+    'handlers': {'console': {'class': 'logging.StreamHandler', 'formatter': 'simple'}},
+    'loggers': {'test': {'level': 'INFO', 'handlers': ['console']}},
+}
+
+
+@pytest.fixture
+def cache_env():
+    with tempfile.TemporaryDirectory() as path:
+        with patch.dict(os.environ, {'LOG_CONFIG_CACHE_DIR': path}):
+            yield path
+
+
+@pytest.fixture
+def config_file():
+    with tempfile.NamedTemporaryFile(mode='w', suffix='.yaml', delete=False) as f:
+        yaml.dump(CONFIG, f)
+    yield f.name
+    os.unlink(f.name)
+
+
+class TestValidateLogConfig:
+    """Test the pre-validation of the dictConfig schema."""
+
+    def test_valid_config(self):
+        """Test that a well-formed config passes."""
+        log_config_cache.validate_log_config(CONFIG)
+
+    def test_unknown_handler_reference(self):
+        """Test that a logger referencing a missing handler is rejected."""
+        config = dict(CONFIG, loggers={'test': {'handlers': ['missing']}})
+        with pytest.raises(ValueError, match='unknown handler'):
+            log_config_cache.validate_log_config(config)
+
+    def test_unknown_formatter_reference(self):
+        """Test that a handler referencing a missing formatter is rejected."""
+        config = dict(CONFIG, handlers={'console': {'class': 'logging.StreamHandler', 'formatter': 'nope'}})
+        with pytest.raises(ValueError, match='unknown formatter'):
+            log_config_cache.validate_log_config(config)
+
+    def test_missing_version(self):
+        """Test that a config without version 1 is rejected."""
+        with pytest.raises(ValueError):
+            log_config_cache.validate_log_config({'handlers': {}})
+
+
+class TestLoadLogConfig:
+    """Test the mtime/hash keyed cache."""
+
+    def test_cold_then_warm_load(self, cache_env, config_file):
+        """Test that the second load is served from the cache without parsing YAML."""
+        config, status = log_config_cache.load_log_config(config_file)
+        assert status == log_config_cache.MISS
+        assert config == CONFIG
+
+        with patch('yaml.safe_load') as mock_safe_load:
+            config, status = log_config_cache.load_log_config(config_file)
+            mock_safe_load.assert_not_called()
+        assert status == log_config_cache.HIT
+        assert config == CONFIG
+
+    def test_touched_file_revalidated_by_hash(self, cache_env, config_file):
+        """Test that a new mtime with identical content skips the parse."""
+        log_config_cache.load_log_config(config_file)
+        stat = os.stat(config_file)
+        os.utime(config_file, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+
+        _, status = log_config_cache.load_log_config(config_file)
+        assert status == log_config_cache.REVALIDATED
+        _, status = log_config_cache.load_log_config(config_file)
+        assert status == log_config_cache.HIT
+
+    def test_changed_file_reparsed(self, cache_env, config_file):
+        """Test that changed content invalidates the entry."""
+        log_config_cache.load_log_config(config_file)
+        changed = dict(CONFIG, disable_existing_loggers=False)
+        with open(config_file, 'w') as f:
+            yaml.dump(changed, f)
+        stat = os.stat(config_file)
+        os.utime(config_file, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+
+        config, status = log_config_cache.load_log_config(config_file)
+        assert status == log_config_cache.MISS
+        assert config['disable_existing_loggers'] is False
+
+    def test_default_dict_validated_once(self, cache_env):
+        """Test that the built-in default dict is only validated on the first load."""
+        with patch.dict(os.environ, {'LOG_CONFIG_PATH': ''}), patch('os.path.exists', return_value=False):
+            default = main.get_log_config_path()
+        _, status = log_config_cache.load_log_config(default)
+        assert status == log_config_cache.MISS
+
+        with patch('log_config_cache.validate_log_config') as mock_validate:
+            _, status = log_config_cache.load_log_config(default)
+            mock_validate.assert_not_called()
+        assert status == log_config_cache.HIT
+
+    def test_unwritable_cache_dir_still_loads(self, config_file):
+        """Test that cache write failures only cost a cold load."""
+        with patch.dict(os.environ, {'LOG_CONFIG_CACHE_DIR': '/proc/not-writable'}):
+            config, status = log_config_cache.load_log_config(config_file)
+        assert config == CONFIG
+        assert status == log_config_cache.MISS
+
+    def test_unserializable_config_leaves_no_temp_files(self, cache_env, tmp_path):
+        """Test that a failed cache write removes its temporary file."""
+        path = tmp_path / 'log-config.yaml'
+        # yaml parses the date into a datetime.date, which JSON cannot store
+        path.write_text('version: 1\nreviewed: 2024-01-31\n')
+        config, status = log_config_cache.load_log_config(str(path))
+        assert status == log_config_cache.MISS
+        assert os.listdir(cache_env) == []
+
+
+class TestCacheDirTrust:
+    """Test that only a private cache directory is used."""
+
+    def test_default_dir_is_per_user_and_private(self, tmp_path, config_file):
+        """Test that the default directory is created 0700 under a per-user name."""
+        env = {key: value for key, value in os.environ.items() if key != 'LOG_CONFIG_CACHE_DIR'}
+        with patch.dict(os.environ, env, clear=True), patch('tempfile.gettempdir', return_value=str(tmp_path)):
+            log_config_cache.load_log_config(config_file)
+            directory = log_config_cache.cache_dir()
+        assert directory == str(tmp_path / f'test-log-config-cache-{os.getuid()}')
+        assert os.stat(directory).st_mode & 0o777 == 0o700
+
+    def test_shared_dir_not_trusted(self, cache_env, config_file):
+        """Test that a directory others can write to is neither read nor written."""
+        log_config_cache.load_log_config(config_file)
+        os.chmod(cache_env, 0o777)
+        try:
+            _, status = log_config_cache.load_log_config(config_file)
+        finally:
+            os.chmod(cache_env, 0o700)
+        assert status == log_config_cache.MISS
+
+    def test_other_owner_not_trusted(self, cache_env, config_file):
+        """Test that a directory owned by another user is ignored."""
+        log_config_cache.load_log_config(config_file)
+        with patch('os.getuid', return_value=os.getuid() + 1):
+            _, status = log_config_cache.load_log_config(config_file)
+        assert status == log_config_cache.MISS
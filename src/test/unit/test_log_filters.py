@@ -0,0 +1,192 @@
+import logging
+import logging.config
+from unittest.mock import patch
+
+import pytest
+
+import log_filters
+import structured_log
+from log_filters import DedupFilter, RateLimitFilter, SamplingFilter, flush_summaries
+
+
+class _Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock():
+    clock = _Clock()
+    with patch('log_filters.time.monotonic', clock):
+        yield clock
+
+
+@pytest.fixture
+def flood_logger(capture_records):
+    """A logger with a list handler; filters are attached by each test."""
+    logger = logging.getLogger('test.flood')
+    yield logger, capture_records('test.flood', logging.DEBUG)
+    logger.filters = []
+
+
+def messages(records):
+    return [r.getMessage() for r in records]
+
+
+class TestDedupFilter:
+    """Test collapsing repeated records."""
+
+    def test_repeats_collapse_into_summary(self, flood_logger, clock):
+        """Test that identical records are dropped and summarized when the run ends."""
+        logger, records = flood_logger
+        logger.addFilter(DedupFilter(window=60))
+        for _ in range(5):
+            logger.warning('Bad row %s', 7)
+            clock.now += 0.5
+        logger.warning('Next thing')
+
+        assert messages(records) == [
+            'Bad row 7',
+            'Bad row 7 (repeated 4 times in 2.5 s)',
+            'Next thing',
+        ]
+        assert records[1].repeated == 4
+
+    def test_different_arguments_are_not_duplicates(self, flood_logger, clock):
+        """Test that records with the same template but other arguments all pass."""
+        logger, records = flood_logger
+        logger.addFilter(DedupFilter())
+        for row in range(3):
+            logger.warning('Bad row %s', row)
+        assert messages(records) == ['Bad row 0', 'Bad row 1', 'Bad row 2']
+
+    def test_window_lets_a_long_flood_through_periodically(self, flood_logger, clock):
+        """Test that a repeat after the window is logged again, after the summary."""
+        logger, records = flood_logger
+        logger.addFilter(DedupFilter(window=10))
+        logger.warning('flood')
+        clock.now += 5
+        logger.warning('flood')
+        clock.now += 6
+        logger.warning('flood')
+
+        assert messages(records) == ['flood', 'flood (repeated 1 times in 11.0 s)', 'flood']
+
+    def test_errors_always_pass(self, flood_logger, clock):
+        """Test that records at the exempt level are never deduplicated."""
+        logger, records = flood_logger
+        logger.addFilter(DedupFilter())
+        for _ in range(3):
+            logger.error('Athena down')
+        assert messages(records) == ['Athena down'] * 3
+
+    def test_flush_summaries_at_shutdown(self, flood_logger, clock):
+        """Test that a run of duplicates still pending at exit is summarized."""
+        logger, records = flood_logger
+        logger.addFilter(DedupFilter())
+        with structured_log.bound(team='acad'):
+            for _ in range(3):
+                structured_log.get_logger(logger).warning('Bad row %s', 7)
+
+        assert flush_summaries() == 1
+        assert messages(records)[-1] == 'Bad row 7 (repeated 2 times in 0.0 s)'
+        assert records[-1].team == 'acad'
+        assert flush_summaries() == 0
+
+
+class TestRateLimitFilter:
+    """Test the per-template token bucket."""
+
+    def test_burst_then_rate(self, flood_logger, clock):
+        """Test that a template gets its burst, then `rate` records per second."""
+        logger, records = flood_logger
+        limiter = RateLimitFilter(rate=2, burst=3)
+        logger.addFilter(limiter)
+        for row in range(10):
+            logger.warning('Bad row %s', row)
+        assert len(records) == 3
+        assert limiter.dropped == 7
+
+        clock.now += 1
+        for row in range(10, 20):
+            logger.warning('Bad row %s', row)
+
+        assert messages(records)[3] == "Suppressed 7 records like 'Bad row %s' in 1.0 s (rate limit)"
+        assert messages(records)[4:] == ['Bad row 10', 'Bad row 11']
+
+    def test_templates_limited_separately(self, flood_logger, clock):
+        """Test that one noisy template does not starve another."""
+        logger, records = flood_logger
+        logger.addFilter(RateLimitFilter(rate=0, burst=1))
+        for _ in range(5):
+            logger.warning('noisy %s', 1)
+        logger.warning('other')
+        assert messages(records) == ['noisy 1', 'other']
+
+    def test_errors_exempt(self, flood_logger, clock):
+        """Test that errors are not rate limited."""
+        logger, records = flood_logger
+        logger.addFilter(RateLimitFilter(rate=0, burst=1))
+        for _ in range(4):
+            logger.critical('fatal')
+        assert len(records) == 4
+
+    def test_pending_suppression_flushed(self, flood_logger, clock):
+        """Test that suppressed records are reported at shutdown."""
+        logger, records = flood_logger
+        logger.addFilter(RateLimitFilter(rate=0, burst=1))
+        for _ in range(3):
+            logger.info('noisy')
+        flush_summaries()
+        assert records[-1].suppressed == 2
+
+
+class TestSamplingFilter:
+    """Test probabilistic sampling of low-level records."""
+
+    def test_samples_only_up_to_max_level(self, flood_logger):
+        """Test that DEBUG/INFO are sampled and WARNING passes."""
+        logger, records = flood_logger
+        logger.addFilter(SamplingFilter(rate=0.25, max_level='INFO'))
+        draws = iter([0.1, 0.9, 0.2, 0.8])
+        with patch('log_filters.random.random', lambda: next(draws)):
+            logger.debug('kept')
+            logger.debug('dropped')
+            logger.info('kept too')
+            logger.info('dropped too')
+            logger.warning('always')
+        assert messages(records) == ['kept', 'kept too', 'always']
+
+    def test_invalid_rate(self):
+        """Test that a rate outside 0..1 is rejected."""
+        with pytest.raises(ValueError):
+            SamplingFilter(rate=2)
+
+
+class TestDictConfig:
+    """Test configuring the filters from a log config."""
+
+    def test_filters_from_dict_config(self):
+        """Test that the filters can be declared and attached like in log-config.yaml."""
+        config = {
+            'version': 1,
+            'disable_existing_loggers': False,
+            'filters': {
+                'dedup': {'()': 'log_filters.DedupFilter', 'window': 5},
+                'ratelimit': {'()': 'log_filters.RateLimitFilter', 'rate': 1, 'burst': 2, 'exempt_level': 'CRITICAL'},
+            },
+            'handlers': {'null': {'class': 'logging.NullHandler'}},
+            'loggers': {'test.configured': {'handlers': ['null'], 'filters': ['dedup', 'ratelimit']}},
+        }
+        logging.config.dictConfig(config)
+        logger = logging.getLogger('test.configured')
+        try:
+            dedup, ratelimit = logger.filters
+            assert isinstance(dedup, log_filters.DedupFilter) and dedup.window == 5
+            assert ratelimit.exempt_level == logging.CRITICAL
+        finally:
+            logger.filters = []
+            logger.handlers = []
@@ -0,0 +1,112 @@
+import logging
+import tracemalloc
+from unittest.mock import MagicMock, patch
+
+import click.testing
+import pytest
+
+import main
+from memory import MemoryTracker, current_rss, peak_rss
+
+
+@pytest.fixture
+def tracker():
+    tracker = MemoryTracker()
+    tracker.start(top=5)
+    yield tracker
+    tracker.stop()
+
+
+@pytest.fixture
+def memory_records(capture_records):
+    return capture_records('test.memory')
+
+
+def allocate_blocks():
+    return [bytearray(1024) for _ in range(2000)]
+
+
+class TestMemoryTracker:
+    """Test the phase memory tracker."""
+
+    def test_rss_readable(self):
+        """Test that the current and peak RSS can be read on this platform."""
+        assert current_rss() > 0
+        assert peak_rss() >= current_rss() / 2
+
+    def test_disabled_tracker_does_nothing(self):
+        """Test that marks are ignored until the tracker is started."""
+        tracker = MemoryTracker()
+        assert tracker.mark('phase') is None
+        assert tracker.phases == []
+        assert not tracemalloc.is_tracing()
+
+    def test_phase_delta_shows_allocation(self, tracker):
+        """Test that memory allocated in a phase shows up in that phase's delta."""
+        tracker.mark('setup')
+        kept = allocate_blocks()
+        phase = tracker.mark('work')
+
+        assert phase.traced_delta > 2000 * 1024
+        assert [p.name for p in tracker.phases] == ['setup', 'work']
+        assert len(kept) == 2000
+
+    def test_top_allocation_site(self, tracker):
+        """Test that the line that allocated the most is the top allocation site."""
+        kept = allocate_blocks()
+        tracker.mark('work')
+
+        top = tracker.top_allocations()[0]
+        assert top.traceback[0].filename == __file__
+        assert top.size_diff > 2000 * 1024
+        assert kept
+
+    def test_report_fields(self, tracker, memory_records):
+        """Test that the report logs per-phase deltas, peaks and top sites as fields."""
+        kept = allocate_blocks()
+        tracker.mark('work')
+        tracker.log_report(logging.getLogger('test.memory'))
+
+        phase, peak, top = memory_records[0], memory_records[1], memory_records[2]
+        assert phase.getMessage().startswith('Memory work: rss')
+        assert phase.mem_phase == 'work' and phase.mem_traced_delta_mb > 1.9
+        assert peak.mem_peak_rss_mb > 0
+        assert top.alloc_rank == 1 and top.alloc_site.startswith(__file__)
+        assert kept
+
+    def test_dump_snapshot(self, tracker, tmp_path):
+        """Test that the last snapshot can be dumped and loaded again."""
+        tracker.mark('work')
+        path = tmp_path / 'run.tracemalloc'
+        tracker.dump(path)
+        assert tracemalloc.Snapshot.load(path).traces
+
+    def test_stop_ends_tracing(self):
+        """Test that stop() ends the tracing started by start()."""
+        tracker = MemoryTracker()
+        tracker.start()
+        tracker.stop()
+        assert not tracemalloc.is_tracing()
+        assert not tracker.enabled
+
+
+class TestMemoryReportInMain:
+    """Test the --memory-report and --memory-snapshot options."""
+
+    @patch('main.Pythena')
+    @patch('main.configure_logging')
+    def test_memory_report_phases(self, mock_configure_logging, mock_pythena, tmp_path):
+        """Test that the run logs the phase memory and writes the snapshot."""
+        mock_configure_logging.return_value = MagicMock()
+        mock_pythena.return_value.get_properties.return_value = {'property': {'name': 'value'}}
+        snapshot = tmp_path / 'run.tracemalloc'
+
+        runner = click.testing.CliRunner()
+        result = runner.invoke(main.main, ['--team', 'acad', '--memory-snapshot', str(snapshot)])
+
+        assert result.exit_code == 0
+        fields = [c.kwargs['extra'] for c in mock_configure_logging.return_value.log.call_args_list]
+        phases = [f['mem_phase'] for f in fields if 'mem_phase' in f]
+        assert phases == ['configure_logging', 'athena_fetch', 'application']
+        assert snapshot.exists()
+        assert not tracemalloc.is_tracing()
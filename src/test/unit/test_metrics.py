@@ -0,0 +1,232 @@
+import logging
+import os
+import socket
+import threading
+from unittest.mock import patch
+
+import click.testing
+import pytest
+
+import main
+import metrics
+from metrics import (
+    MetricsRegistry,
+    PrometheusTextfileExporter,
+    StatsdExporter,
+    instrument_handlers,
+    load_metrics_settings,
+    record_dropped,
+)
+
+
+@pytest.fixture
+def udp_listener():
+    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    sock.bind(('127.0.0.1', 0))
+    sock.settimeout(2)
+    yield sock
+    sock.close()
+
+
+def received_lines(sock):
+    lines = []
+    sock.settimeout(0.2)
+    try:
+        while True:
+            lines.extend(sock.recv(65535).decode().split('\n'))
+    except TimeoutError:
+        return lines
+
+
+@pytest.fixture
+def registry():
+    registry = MetricsRegistry()
+    yield registry
+    registry.close()
+
+
+class TestSettings:
+    """Test resolving the metrics settings."""
+
+    def test_defaults_disable_metrics(self):
+        """Test that metrics are off without a metrics section."""
+        with patch.dict(os.environ, {}, clear=True):
+            assert load_metrics_settings({'version': 1})['exporter'] == 'none'
+
+    def test_env_overrides_config(self):
+        """Test that the METRICS_* variables take precedence over the config section."""
+        config = {'metrics': {'exporter': 'statsd', 'host': 'statsd.local', 'port': 9125}}
+        with patch.dict(os.environ, {'METRICS_PORT': '8126'}):
+            settings = load_metrics_settings(config)
+        assert (settings['exporter'], settings['host'], settings['port']) == ('statsd', 'statsd.local', 8126)
+
+    def test_invalid_settings(self):
+        """Test that unknown exporters and a prometheus exporter without path are rejected."""
+        with pytest.raises(ValueError, match='Unknown metrics exporter'):
+            load_metrics_settings({'metrics': {'exporter': 'graphite'}})
+        with pytest.raises(ValueError, match='needs a path'):
+            load_metrics_settings({'metrics': {'exporter': 'prometheus'}})
+
+
+class TestStatsdExporter:
+    """Test the StatsD exporter against a local UDP listener."""
+
+    def test_counters_gauges_and_timers(self, registry, udp_listener):
+        """Test that each metric type is sent in StatsD line format."""
+        registry.configure(StatsdExporter(*udp_listener.getsockname(), prefix='test'))
+        registry.increment('records', 3, table='person')
+        registry.gauge('queue_depth', 7)
+        registry.observe('athena_fetch_seconds', 0.25, team='acad')
+        registry.observe('batch_rows', 40)
+        registry.flush()
+
+        lines = received_lines(udp_listener)
+        assert sorted(lines) == [
+            'test.athena_fetch_seconds.acad:250|ms',
+            'test.batch_rows:40|h',
+            'test.queue_depth:7|g',
+            'test.records.person:3|c',
+        ]
+
+    def test_counters_sent_as_increments(self, registry, udp_listener):
+        """Test that a second export only sends the counter increase."""
+        registry.configure(StatsdExporter(*udp_listener.getsockname(), prefix=''))
+        registry.increment('records', 5)
+        registry.flush()
+        registry.increment('records', 2)
+        registry.flush()
+        registry.flush()
+
+        assert received_lines(udp_listener) == ['records:5|c', 'records:2|c']
+
+    def test_dogstatsd_tags(self, registry, udp_listener):
+        """Test that labels become DogStatsD tags when configured."""
+        registry.configure(StatsdExporter(*udp_listener.getsockname(), prefix='test', tags='dogstatsd'))
+        registry.increment('records', team='acad', env='dev')
+        registry.flush()
+
+        assert received_lines(udp_listener) == ['test.records:1|c|#env:dev,team:acad']
+
+    def test_datagrams_stay_small(self, registry, udp_listener):
+        """Test that many lines are split over datagrams under the size limit."""
+        registry.configure(StatsdExporter(*udp_listener.getsockname()))
+        for i in range(200):
+            registry.gauge(f'gauge_{i}', i)
+        registry.flush()
+
+        sizes = []
+        udp_listener.settimeout(0.2)
+        try:
+            while True:
+                sizes.append(len(udp_listener.recv(65535)))
+        except TimeoutError:
+            pass
+        assert len(sizes) > 1
+        assert max(sizes) <= metrics.MAX_DATAGRAM
+
+
+class TestPrometheusExporter:
+    """Test the Prometheus textfile exporter."""
+
+    def test_textfile_format(self, registry, tmp_path):
+        """Test that counters, gauges and histograms are written in text format."""
+        path = tmp_path / 'test.prom'
+        registry.configure(PrometheusTextfileExporter(str(path), prefix='test'))
+        registry.increment('log_records_emitted', 2, handler='console')
+        registry.gauge('run_duration_seconds', 1.5)
+        registry.observe('athena_fetch_seconds', 0.3, team='acad')
+        registry.flush()
+
+        text = path.read_text()
+        assert '# TYPE test_log_records_emitted_total counter' in text
+        assert 'test_log_records_emitted_total{handler="console"} 2' in text
+        assert 'test_run_duration_seconds 1.5' in text
+        assert 'test_athena_fetch_seconds_bucket{team="acad",le="0.25"} 0' in text
+        assert 'test_athena_fetch_seconds_bucket{team="acad",le="0.5"} 1' in text
+        assert 'test_athena_fetch_seconds_bucket{team="acad",le="+Inf"} 1' in text
+        assert 'test_athena_fetch_seconds_count{team="acad"} 1' in text
+        assert os.listdir(tmp_path) == ['test.prom']
+
+
+class TestRegistry:
+    """Test the registry and the logging instrumentation."""
+
+    def test_disabled_registry_records_nothing(self, registry):
+        """Test that calls are ignored until an exporter is configured."""
+        registry.increment('records')
+        with registry.timer('phase'):
+            pass
+        assert not registry.enabled
+        assert registry._counters == {} and registry._histograms == {}
+
+    def test_export_outside_registry_lock(self, registry):
+        """Test that a slow export does not hold up recording (it runs on a copy)."""
+        recorded = threading.Event()
+
+        class _RecordingExporter:
+            def export(self, counters, gauges, histograms):
+                # Would deadlock if the export held the registry lock
+                threading.Thread(target=lambda: (registry.increment('during_export'), recorded.set())).start()
+                assert recorded.wait(2)
+                self.counters = counters
+
+            def close(self):
+                pass
+
+        exporter = _RecordingExporter()
+        registry.configure(exporter)
+        registry.increment('records')
+        registry.flush()
+
+        assert exporter.counters == {('records', ()): 1}
+        assert registry._counters[('during_export', ())] == 1
+
+    def test_handler_counts(self, tmp_path, list_handler):
+        """Test that emitted records are counted per handler and dropped ones recorded."""
+        path = tmp_path / 'test.prom'
+        handler = list_handler()
+        handler.set_name('console')
+        handler.stats = {'dropped': 4}
+        logger = logging.getLogger('test.metrics')
+        logger.addHandler(handler)
+        metrics.metrics.configure(PrometheusTextfileExporter(str(path)))
+        try:
+            instrument_handlers([handler])
+            instrument_handlers([handler])
+            logger.warning('one')
+            logger.warning('two')
+            record_dropped([handler], {'dropped': 1})
+        finally:
+            metrics.metrics.close()
+            logger.removeHandler(handler)
+
+        text = path.read_text()
+        assert 'test_log_records_emitted_total{handler="console"} 2' in text
+        assert 'test_log_records_dropped_total{handler="console"} 4' in text
+        assert 'test_log_records_dropped_total{handler="async_queue"} 1' in text
+
+
+class TestMetricsInMain:
+    """Test the pre-instrumented run metrics."""
+
+    def test_run_exports_metrics(self, tmp_path):
+        """Test that a run exports Athena latency, setup time, record counts and duration."""
+        path = tmp_path / 'test.prom'
+        config = {
+            'version': 1,
+            'handlers': {'console': {'class': 'logging.StreamHandler', 'stream': 'ext://sys.stderr'}},
+            'loggers': {'test': {'level': 'INFO', 'handlers': ['console']}},
+            'metrics': {'exporter': 'prometheus', 'path': str(path), 'flush_interval': 0},
+        }
+        with patch('main.get_log_config_path', return_value=config), patch('main.Pythena') as mock_pythena:
+            mock_pythena.return_value.get_properties.return_value = {'property': {'name': 'value'}}
+            runner = click.testing.CliRunner()
+            result = runner.invoke(main.main, ['--team', 'acad'])
+
+        assert result.exit_code == 0
+        text = path.read_text()
+        assert 'test_athena_fetch_seconds_count{env="dev",team="acad"} 1' in text
+        assert 'test_logging_setup_seconds ' in text
+        assert 'test_run_duration_seconds ' in text
+        assert 'test_log_records_emitted_total{handler="console"}' in text
+        assert not metrics.metrics.enabled
@@ -0,0 +1,162 @@
+import json
+import logging
+import sqlite3
+import threading
+import time
+from unittest.mock import MagicMock, patch
+
+import click.testing
+import pytest
+
+import main
+import pipeline
+import structured_log
+
+
+@pytest.fixture
+def app_records(capture_records):
+    return capture_records('test.pipeline')
+
+
+class TestSourcesAndSinks:
+    """Test the file and SQLite sources and sinks."""
+
+    def test_csv_to_sqlite(self, tmp_path):
+        """Test that CSV rows go through the transforms into a SQLite table."""
+        source = tmp_path / 'people.csv'
+        source.write_text('id,name\n1,ada\n2,bob\n3,cy\n')
+        db = str(tmp_path / 'out.db')
+
+        pipeline.Pipeline(
+            pipeline.read_csv(source),
+            [pipeline.map_rows(lambda row: {**row, 'name': row['name'].upper()}, 'upper'),
+             pipeline.filter_rows(lambda row: row['id'] != '2', 'skip_two')],
+            pipeline.SqliteSink(db, 'person', ['id', 'name']),
+            chunk_size=2,
+        ).run()
+
+        rows = sqlite3.connect(db).execute('SELECT id, name FROM person ORDER BY id').fetchall()
+        assert rows == [('1', 'ADA'), ('3', 'CY')]
+
+    def test_sqlite_to_jsonl(self, tmp_path):
+        """Test that query results are written as JSON lines."""
+        db = str(tmp_path / 'in.db')
+        with sqlite3.connect(db) as connection:
+            connection.execute('CREATE TABLE t (n INTEGER)')
+            connection.executemany('INSERT INTO t VALUES (?)', [(i,) for i in range(10)])
+        out = tmp_path / 'out.jsonl'
+
+        pipeline.Pipeline(pipeline.read_sqlite(db, 'SELECT n FROM t ORDER BY n', fetch_size=3),
+                          sink=pipeline.JsonlSink(out), chunk_size=4).run()
+
+        assert list(pipeline.read_jsonl(out)) == [{'n': i} for i in range(10)]
+
+    def test_lines_to_csv(self, tmp_path):
+        """Test that text lines can be parsed and written as CSV."""
+        source = tmp_path / 'in.txt'
+        source.write_text('a 1\nb 2\n')
+        out = tmp_path / 'out.csv'
+
+        pipeline.Pipeline(
+            pipeline.read_lines(source),
+            [pipeline.map_rows(lambda line: dict(zip(('key', 'value'), line.split(), strict=True)), 'parse')],
+            pipeline.CsvSink(out, ['key', 'value']),
+        ).run()
+
+        assert out.read_text().splitlines() == ['key,value', 'a,1', 'b,2']
+
+
+class TestBackpressure:
+    """Test that the bounded queues keep memory flat."""
+
+    def test_fast_source_waits_for_slow_sink(self):
+        """Test that the source never runs further ahead of the sink than the buffers allow."""
+        produced = 0
+        consumed = 0
+        lead = []
+
+        def source():
+            nonlocal produced
+            for i in range(5000):
+                produced += 1
+                yield i
+
+        def slow_write(rows):
+            nonlocal consumed
+            time.sleep(0.001)
+            consumed += len(rows)
+            lead.append(produced - consumed)
+
+        stats = pipeline.Pipeline(source(), [pipeline.map_rows(lambda n: n + 1, 'inc')],
+                                  pipeline.CallbackSink(slow_write), chunk_size=10, buffer_size=2).run()
+
+        assert consumed == 5000
+        # Two queues of 2 chunks, one chunk held by each stage, one being built
+        assert max(lead) <= (2 * 2 + 3) * 10
+        assert all(s.queue_max <= 2 for s in stats)
+
+
+class TestErrorsAndStats:
+    """Test failure handling, context propagation and stats logging."""
+
+    def test_transform_error_reraised(self):
+        """Test that an exception in a stage stops the pipeline and is re-raised."""
+        closed = threading.Event()
+        sink = pipeline.CallbackSink(lambda rows: None)
+        sink.close = closed.set
+
+        def explode(row):
+            if row == 50:
+                raise ValueError('bad row 50')
+            return row
+
+        with pytest.raises(ValueError, match='bad row 50'):
+            pipeline.Pipeline(iter(range(10 ** 9)), [pipeline.map_rows(explode)], sink,
+                              chunk_size=10, buffer_size=1).run()
+        assert closed.is_set()
+
+    def test_stage_threads_keep_log_context(self):
+        """Test that stages run with the caller's bound context."""
+        seen = []
+
+        def capture(row):
+            seen.append(structured_log.get_context().get('team'))
+            return row
+
+        with structured_log.bound(team='acad'):
+            pipeline.Pipeline(range(3), [pipeline.map_rows(capture)]).run()
+        assert seen == ['acad'] * 3
+
+    def test_per_stage_stats_logged(self, app_records):
+        """Test that rows, rows/s and queue depth are logged per stage."""
+        stats = pipeline.Pipeline(range(100), [pipeline.filter_rows(lambda n: n % 2, 'odd')],
+                                  chunk_size=10).run(logging.getLogger('test.pipeline'))
+
+        assert [(s.name, s.rows) for s in stats] == [('source', 100), ('odd', 50), ('callback', 50)]
+        messages = [r.getMessage() for r in app_records]
+        assert messages[0].startswith('Stage source: 100 rows')
+        assert 'input queue max' in messages[1]
+        assert messages[-1].startswith('Pipeline wrote 50 rows')
+        assert app_records[1].stage == 'odd' and app_records[1].stage_rows == 50
+
+
+class TestPipelineInMain:
+    """Test the application_pipeline hook."""
+
+    @patch('main.Pythena')
+    @patch('main.configure_logging')
+    def test_application_pipeline_runs(self, mock_configure_logging, mock_pythena, tmp_path):
+        """Test that a pipeline returned by application_pipeline is run for the tenant."""
+        mock_configure_logging.return_value = MagicMock()
+        mock_pythena.return_value.get_properties.return_value = {'property': {'name': 'value'}}
+        out = tmp_path / 'out.jsonl'
+
+        def build(properties):
+            return pipeline.Pipeline([{'n': 1}, {'n': 2}], sink=pipeline.JsonlSink(out))
+
+        with patch('main.application_pipeline', side_effect=build):
+            runner = click.testing.CliRunner()
+            result = runner.invoke(main.main, ['--team', 'acad'])
+
+        assert result.exit_code == 0
+        assert [json.loads(line) for line in out.read_text().splitlines()] == [{'n': 1}, {'n': 2}]
@@ -0,0 +1,98 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from unittest.mock import MagicMock, patch
+
+import click.testing
+import pytest
+
+import main
+import prefetch
+
+
+class TestPropertyFetch:
+    """Test the background fetch wrapper."""
+
+    def test_result_and_timings(self):
+        """Test that the fetch result is returned and timed."""
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            fetch = prefetch.PropertyFetch(executor, lambda: ('client', {'a': 'b'}))
+            assert fetch.result() == ('client', {'a': 'b'})
+
+        assert fetch.fetch_seconds is not None
+        assert fetch.wait_seconds is not None
+        assert 'Athena fetch took' in fetch.timings()
+
+    def test_exception_reraised_on_result(self):
+        """Test that a failed fetch raises where the result is awaited."""
+        def failing():
+            raise ConnectionError('athena down')
+
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            fetch = prefetch.PropertyFetch(executor, failing)
+            with pytest.raises(ConnectionError):
+                fetch.result()
+
+    def test_start_prefetch_runs_all_tenants(self):
+        """Test that a fetch is started for every tenant."""
+        executor, fetches = prefetch.start_prefetch(
+            [('dev', 'acad'), ('uat', 'ident')], lambda env, team: f'{team},{env}', max_workers=2
+        )
+        try:
+            assert fetches[('dev', 'acad')].result() == 'acad,dev'
+            assert fetches[('uat', 'ident')].result() == 'ident,uat'
+        finally:
+            executor.shutdown()
+
+
+class TestPrefetchInMain:
+    """Test that the Athena fetch overlaps with the logging setup."""
+
+    @patch('main.Pythena')
+    @patch('main.configure_logging')
+    def test_fetch_starts_before_logging_is_configured(self, mock_configure_logging, mock_pythena):
+        """Test that the fetch is already running while logging is being configured."""
+        fetch_started = threading.Event()
+
+        def get_properties():
+            fetch_started.set()
+            time.sleep(0.2)
+            return {'test': 'value'}
+
+        def configure_logging():
+            # The fetch must already be in flight while logging is set up
+            assert fetch_started.wait(2)
+            time.sleep(0.2)
+            return MagicMock()
+
+        mock_configure_logging.side_effect = configure_logging
+        mock_pythena.return_value.get_properties.side_effect = get_properties
+
+        start = time.monotonic()
+        runner = click.testing.CliRunner()
+        result = runner.invoke(main.main, ['--team', 'acad'])
+
+        assert result.exit_code == 0
+        assert time.monotonic() - start < 0.38
+
+    def test_pythena_loaded_once_by_concurrent_fetches(self, monkeypatch):
+        """Test that prefetch threads loading Pythena together import and time it once."""
+        report = MagicMock()
+
+        def timed_import(name):
+            time.sleep(0.05)
+            return MagicMock()
+
+        report.timed_import.side_effect = timed_import
+        monkeypatch.setattr(main, 'report', report)
+        saved = main.__dict__.pop('Pythena', None)
+        try:
+            with ThreadPoolExecutor(4) as pool:
+                loaded = list(pool.map(lambda _: main._load_pythena(), range(4)))
+        finally:
+            main.__dict__.pop('Pythena', None)
+            if saved is not None:
+                main.Pythena = saved
+
+        assert report.timed_import.call_count == 1
+        assert len({id(pythena) for pythena in loaded}) == 1
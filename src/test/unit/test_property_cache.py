@@ -0,0 +1,172 @@
+import os
+import tempfile
+import threading
+import time
+from unittest.mock import MagicMock, patch
+
+import click.testing
+import pytest
+
+import main
+import property_cache
+
+KEY = ('test', 'dev', 'acad', 'acad,dev')
+
+
+@pytest.fixture
+def cache_dir():
+    with tempfile.TemporaryDirectory() as path:
+        yield path
+
+
+class TestPropertyCacheStorage:
+    """Test the encrypted on-disk entries."""
+
+    def test_round_trip(self, cache_dir):
+        """Test that stored properties can be read back."""
+        cache = property_cache.PropertyCache(cache_dir, 'secret')
+        cache.store(KEY, {'database.url': 'dev-db-url'})
+
+        properties, age = cache.load(KEY)
+        assert properties == {'database.url': 'dev-db-url'}
+        assert age < 5
+
+    def test_encrypted_at_rest(self, cache_dir):
+        """Test that property values are not stored in plain text."""
+        cache = property_cache.PropertyCache(cache_dir, 'secret')
+        cache.store(KEY, {'database.password': 'hunter2'})
+
+        with open(cache.path_for(KEY), 'rb') as f:
+            assert b'hunter2' not in f.read()
+
+    def test_tampered_file_rejected(self, cache_dir):
+        """Test that a modified cache file fails the integrity check."""
+        cache = property_cache.PropertyCache(cache_dir, 'secret')
+        cache.store(KEY, {'a': 'b'})
+        path = cache.path_for(KEY)
+        with open(path, 'rb') as f:
+            blob = bytearray(f.read())
+        blob[30] ^= 0xFF
+        with open(path, 'wb') as f:
+            f.write(blob)
+
+        with pytest.raises(property_cache.CacheIntegrityError):
+            cache.load(KEY)
+
+    def test_other_secret_cannot_read(self, cache_dir):
+        """Test that an entry written with another secret is rejected."""
+        property_cache.PropertyCache(cache_dir, 'secret').store(KEY, {'a': 'b'})
+
+        with pytest.raises(property_cache.CacheIntegrityError):
+            property_cache.PropertyCache(cache_dir, 'other').load(KEY)
+
+
+    def test_entry_copied_to_other_key_rejected(self, cache_dir):
+        """Test that a valid entry copied over another tenant's entry is not served."""
+        cache = property_cache.PropertyCache(cache_dir, 'secret')
+        other_key = ('test', 'dev', 'iden', 'iden,dev')
+        cache.store(KEY, {'team': 'acad'})
+        cache.store(other_key, {'team': 'iden'})
+        os.replace(cache.path_for(KEY), cache.path_for(other_key))
+
+        with pytest.raises(property_cache.CacheIntegrityError):
+            cache.load(other_key)
+
+    def test_stats_counted_across_threads(self, cache_dir):
+        """Test that counters updated from many threads add up."""
+        cache = property_cache.PropertyCache(cache_dir, 'secret')
+        threads = [threading.Thread(target=lambda: [cache._count('hits') for _ in range(1000)]) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        assert cache.stats['hits'] == 8000
+
+
+class TestGetOrFetch:
+    """Test the cache lookup policy."""
+
+    def test_miss_fetches_and_stores(self, cache_dir):
+        """Test that a miss calls Athena and populates the cache."""
+        cache = property_cache.PropertyCache(cache_dir, 'secret')
+        fetch = MagicMock(return_value={'a': 'b'})
+
+        assert cache.get_or_fetch(KEY, fetch) == {'a': 'b'}
+        assert cache.get_or_fetch(KEY, fetch) == {'a': 'b'}
+        fetch.assert_called_once()
+        assert cache.stats['misses'] == 1
+        assert cache.stats['hits'] == 1
+
+    def test_refresh_bypasses_cache(self, cache_dir):
+        """Test that refresh always fetches."""
+        cache = property_cache.PropertyCache(cache_dir, 'secret')
+        cache.store(KEY, {'a': 'old'})
+
+        assert cache.get_or_fetch(KEY, lambda: {'a': 'new'}, refresh=True) == {'a': 'new'}
+        assert cache.load(KEY)[0] == {'a': 'new'}
+
+    def test_hit_revalidates_in_background(self, cache_dir):
+        """Test that an aging entry is served and refreshed in the background."""
+        cache = property_cache.PropertyCache(cache_dir, 'secret', revalidate_after=0)
+        cache.store(KEY, {'a': 'old'})
+
+        assert cache.get_or_fetch(KEY, lambda: {'a': 'new'}) == {'a': 'old'}
+        cache.close()
+        assert cache.load(KEY)[0] == {'a': 'new'}
+        assert cache.stats['revalidations'] == 1
+
+    def test_stale_entry_used_when_athena_fails(self, cache_dir):
+        """Test the last-known-good fallback when Athena errors out."""
+        cache = property_cache.PropertyCache(cache_dir, 'secret', ttl=0)
+        cache.store(KEY, {'a': 'last-good'})
+
+        def fetch():
+            raise ConnectionError('athena down')
+
+        assert cache.get_or_fetch(KEY, fetch) == {'a': 'last-good'}
+        assert cache.stats['stale_fallbacks'] == 1
+
+    def test_stale_entry_used_when_athena_is_slow(self, cache_dir):
+        """Test the last-known-good fallback when Athena does not answer in time."""
+        cache = property_cache.PropertyCache(cache_dir, 'secret', ttl=0, fetch_timeout=0.05)
+        cache.store(KEY, {'a': 'last-good'})
+        release = threading.Event()
+
+        def fetch():
+            release.wait(5)
+            return {'a': 'late'}
+
+        start = time.monotonic()
+        assert cache.get_or_fetch(KEY, fetch) == {'a': 'last-good'}
+        assert time.monotonic() - start < 2
+        release.set()
+        cache.close()
+
+
+class TestMainPropertyCache:
+    """Test the cache integration in main."""
+
+    def test_cache_disabled_without_cache_dir(self):
+        """Test that no cache is opened unless ATHENA_CACHE_DIR is set."""
+        with patch.dict(os.environ, {'ATHENA_SECRET': 'secret'}, clear=True):
+            assert property_cache.open_property_cache() is None
+
+    @patch('main.Pythena')
+    def test_refresh_config_flag(self, mock_pythena, cache_dir):
+        """Test that --refresh-config refetches even with a fresh cache entry."""
+        mock_pythena_instance = MagicMock()
+        mock_pythena_instance.get_properties.return_value = {'a': 'fresh'}
+        mock_pythena.return_value = mock_pythena_instance
+
+        env = {'ATHENA_SECRET': 'secret', 'ATHENA_CACHE_DIR': cache_dir}
+        with patch.dict(os.environ, env):
+            property_cache.open_property_cache().store(KEY, {'a': 'cached'})
+            runner = click.testing.CliRunner()
+
+            result = runner.invoke(main.main, ['--team', 'acad'])
+            assert result.exit_code == 0
+            mock_pythena_instance.get_properties.assert_not_called()
+
+            result = runner.invoke(main.main, ['--team', 'acad', '--refresh-config'])
+            assert result.exit_code == 0
+            mock_pythena_instance.get_properties.assert_called_once()
@@ -0,0 +1,125 @@
+import pickle
+from unittest.mock import MagicMock, patch
+
+import click.testing
+import pytest
+
+import main
+import property_store
+
+PROPERTIES = {
+    'database.url': 'dev-db-url',
+    'database.pool.size': '10',
+    'api.endpoint': 'dev-api-endpoint',
+    'batch.enabled': 'true',
+    'batch.timeout': '5m',
+    'batch.teams': 'acad, admsol,ident',
+}
+
+
+class TestFlattenProperties:
+    """Test normalization of the get_properties() payload."""
+
+    def test_flat_mapping(self):
+        """Test that a flat mapping is kept as is."""
+        assert property_store.flatten_properties({'a.b': 1}) == {'a.b': 1}
+
+    def test_nested_mapping(self):
+        """Test that nested mappings are joined with dots."""
+        assert property_store.flatten_properties({'a': {'b': 1, 'c': {'d': 2}}}) == {'a.b': 1, 'a.c.d': 2}
+
+    def test_property_sources_precedence(self):
+        """Test that earlier property sources win."""
+        payload = {
+            'propertySources': [
+                {'name': 'acad', 'source': {'a': 'team'}},
+                {'name': 'default', 'source': {'a': 'default', 'b': 'default'}},
+            ]
+        }
+        assert property_store.flatten_properties(payload) == {'a': 'team', 'b': 'default'}
+
+    def test_unsupported_payload(self):
+        """Test that a non-mapping payload is rejected."""
+        with pytest.raises(TypeError):
+            property_store.flatten_properties(['not', 'a', 'mapping'])
+
+
+class TestPropertyStore:
+    """Test lookups, prefix queries and typed accessors."""
+
+    def test_lookup(self):
+        """Test mapping access."""
+        store = property_store.PropertyStore(PROPERTIES)
+        assert store['database.url'] == 'dev-db-url'
+        assert store.get('missing') is None
+        assert len(store) == len(PROPERTIES)
+
+    def test_prefix_and_namespace(self):
+        """Test prefix and namespace queries."""
+        store = property_store.PropertyStore(PROPERTIES)
+        assert store.with_prefix('database.') == {'database.url': 'dev-db-url', 'database.pool.size': '10'}
+        database = store.namespace('database')
+        assert dict(database) == {'url': 'dev-db-url', 'pool.size': '10'}
+        assert store.with_prefix('nothing.') == {}
+
+    def test_typed_accessors(self):
+        """Test int, bool, duration and list coercion."""
+        store = property_store.PropertyStore(PROPERTIES)
+        assert store.get_int('database.pool.size') == 10
+        assert store.get_bool('batch.enabled') is True
+        assert store.get_duration('batch.timeout') == 300.0
+        assert store.get_list('batch.teams') == ['acad', 'admsol', 'ident']
+        assert store.get_int('missing', 3) == 3
+        with pytest.raises(KeyError):
+            store.get_int('missing')
+
+    def test_typed_accessors_are_memoized(self):
+        """Test that a value is parsed only once."""
+        store = property_store.PropertyStore(PROPERTIES)
+        with patch('property_store.parse_duration', wraps=property_store.parse_duration) as mock_parse:
+            store.get_duration('batch.timeout')
+            store.get_duration('batch.timeout')
+        assert mock_parse.call_count == 1
+
+    def test_returned_lists_cannot_change_the_store(self):
+        """Test that mutating a returned list does not affect later calls."""
+        store = property_store.PropertyStore(PROPERTIES)
+        store.get_list('batch.teams').append('other')
+        assert store.get_list('batch.teams') == ['acad', 'admsol', 'ident']
+
+    def test_invalid_values(self):
+        """Test that unparseable values raise ValueError."""
+        store = property_store.PropertyStore({'a': 'maybe', 'b': 'soon'})
+        with pytest.raises(ValueError):
+            store.get_bool('a')
+        with pytest.raises(ValueError):
+            store.get_duration('b')
+
+    def test_pickle_round_trip(self):
+        """Test that the store can be sent to worker processes."""
+        store = property_store.PropertyStore(PROPERTIES)
+        copy = pickle.loads(pickle.dumps(store))
+        assert dict(copy) == dict(store)
+
+    def test_from_athena_none(self):
+        """Test that a missing payload stays None."""
+        assert property_store.PropertyStore.from_athena(None) is None
+
+
+class TestPropertyStoreInMain:
+    """Test that main reads properties through the store."""
+
+    @patch('main.Pythena')
+    @patch('main.configure_logging')
+    def test_property_value_logged(self, mock_configure_logging, mock_pythena):
+        """Test that property.name is read from the store."""
+        mock_configure_logging.return_value = MagicMock()
+        mock_pythena.return_value.get_properties.return_value = {'property': {'name': 'nested-value'}}
+
+        with patch('main.get_logger') as mock_get_logger:
+            runner = click.testing.CliRunner()
+            result = runner.invoke(main.main, ['--team', 'acad'])
+
+        assert result.exit_code == 0
+        messages = [c.args[0] % c.args[1:] for c in mock_get_logger.return_value.info.call_args_list]
+        assert 'Property value: nested-value' in messages
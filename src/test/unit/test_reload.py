@@ -0,0 +1,225 @@
+import logging
+import os
+import pickle
+import time
+from unittest.mock import patch
+
+import click.testing
+import pytest
+
+import main
+from property_store import PropertyStore
+from reload import ConfigWatcher, LiveProperties, file_signature
+
+
+def wait_for(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if condition():
+            return True
+        time.sleep(0.02)
+    return False
+
+
+def write_config(path, level):
+    path.write_text(
+        'version: 1\n'
+        'disable_existing_loggers: false\n'
+        'handlers:\n'
+        '  console:\n'
+        '    class: logging.StreamHandler\n'
+        '    stream: ext://sys.stderr\n'
+        'loggers:\n'
+        '  test:\n'
+        f'    level: {level}\n'
+        '    handlers: [console]\n'
+        '    propagate: false\n'
+    )
+
+
+def bump_mtime(path):
+    st = os.stat(path)
+    os.utime(path, ns=(st.st_atime_ns, st.st_mtime_ns + 1_000_000_000))
+
+
+@pytest.fixture
+def app_records(capture_records):
+    return capture_records('test')
+
+
+class TestConfigWatcher:
+    """Test noticing config file changes."""
+
+    @pytest.mark.parametrize('use_inotify', [True, False])
+    def test_change_detected(self, tmp_path, use_inotify):
+        """Test that an in-place write and an atomic replace are both reported."""
+        path = tmp_path / 'log-config.yaml'
+        path.write_text('one')
+        changes = []
+        watcher = ConfigWatcher(str(path), changes.append, poll_interval=0.05, debounce=0.01, use_inotify=use_inotify)
+        watcher.start()
+        try:
+            assert watcher.mode == ('inotify' if use_inotify else 'poll')
+            path.write_text('two, longer')
+            assert wait_for(lambda: len(changes) == 1)
+
+            replacement = tmp_path / 'log-config.yaml.new'
+            replacement.write_text('three')
+            os.replace(replacement, path)
+            assert wait_for(lambda: len(changes) == 2)
+        finally:
+            watcher.stop()
+        assert changes == [str(path)] * 2
+
+    def test_unchanged_file_ignored(self, tmp_path):
+        """Test that check() only reports a new stat signature."""
+        path = tmp_path / 'log-config.yaml'
+        path.write_text('one')
+        changes = []
+        watcher = ConfigWatcher(str(path), changes.append, debounce=0)
+        assert not watcher.check()
+
+        bump_mtime(path)
+        assert watcher.check()
+        assert not watcher.check()
+        assert changes == [str(path)]
+
+    def test_deleted_file_not_reported(self, tmp_path):
+        """Test that a missing file (mid-replace) is not handed to on_change."""
+        path = tmp_path / 'log-config.yaml'
+        path.write_text('one')
+        changes = []
+        watcher = ConfigWatcher(str(path), changes.append, debounce=0)
+        path.unlink()
+        assert file_signature(str(path)) is None
+        assert not watcher.check()
+        assert changes == []
+
+
+class TestLiveProperties:
+    """Test refreshing properties in the background."""
+
+    def test_refresh_publishes_new_snapshot(self, app_records):
+        """Test that a refresh swaps in the new store and logs the changes."""
+        first = PropertyStore({'batch.size': '10', 'mode': 'full'})
+        second = PropertyStore({'batch.size': '20', 'mode': 'full', 'extra': 'x'})
+        live = LiveProperties(first, lambda: second, 60, 'test')
+
+        snapshot = live.snapshot()
+        assert live.refresh()
+        assert live.get_int('batch.size') == 20
+        assert snapshot['batch.size'] == '10'
+        assert live.version == 2
+        assert app_records[-1].properties_changed == 2
+        assert app_records[-1].reload_status == 'ok'
+
+    def test_failed_refresh_keeps_snapshot(self, app_records):
+        """Test that a fetch error or empty result keeps the current properties."""
+        store = PropertyStore({'mode': 'full'})
+
+        def fail():
+            raise ConnectionError('Athena unreachable')
+
+        live = LiveProperties(store, fail, 60, 'test')
+        assert not live.refresh()
+        live.fetch = lambda: None
+        assert not live.refresh()
+        assert live.snapshot() is store
+        assert live.stats == {'refreshes': 0, 'failures': 2}
+        assert app_records[-1].levelno == logging.WARNING
+
+    def test_background_refresh(self):
+        """Test that start() refreshes every interval until stopped."""
+        stores = iter(PropertyStore({'n': str(i)}) for i in range(1000))
+        live = LiveProperties(next(stores), lambda: next(stores), 0.01).start()
+        try:
+            assert wait_for(lambda: live.version >= 3)
+        finally:
+            live.stop()
+        version = live.version
+        time.sleep(0.05)
+        assert live.version == version
+
+    def test_pickles_as_current_snapshot(self):
+        """Test that worker processes receive a plain PropertyStore."""
+        live = LiveProperties(PropertyStore({'mode': 'full'}), lambda: None, 60)
+        copy = pickle.loads(pickle.dumps(live))
+        assert isinstance(copy, PropertyStore)
+        assert dict(copy) == {'mode': 'full'}
+
+
+class TestReloadLogConfig:
+    """Test re-applying the logging config in a running process."""
+
+    def test_reload_changes_level(self, tmp_path):
+        """Test that a reloaded config replaces the logger level and handlers."""
+        path = tmp_path / 'log-config.yaml'
+        write_config(path, 'WARNING')
+        try:
+            main.reload_log_config(str(path))
+            assert logging.getLogger('test').level == logging.WARNING
+            write_config(path, 'DEBUG')
+            main.reload_log_config(str(path))
+            assert logging.getLogger('test').level == logging.DEBUG
+        finally:
+            logging.getLogger('test').handlers = []
+
+    def test_invalid_config_keeps_current(self, tmp_path):
+        """Test that a broken file is rejected before the current config is touched."""
+        path = tmp_path / 'log-config.yaml'
+        write_config(path, 'WARNING')
+        try:
+            main.reload_log_config(str(path))
+            handlers = list(logging.getLogger('test').handlers)
+            path.write_text('version: 1\nhandlers:\n  bad:\n    class: no.such.Handler\n')
+            with pytest.raises(ValueError, match='Unable to configure handler'):
+                main.reload_log_config(str(path))
+            assert logging.getLogger('test').level == logging.WARNING
+            assert len(logging.getLogger('test').handlers) == len(handlers)
+        finally:
+            logging.getLogger('test').handlers = []
+
+    def test_foreign_handlers_kept(self, tmp_path, list_handler):
+        """Test that handlers the config did not create stay open and attached across a reload."""
+        path = tmp_path / 'log-config.yaml'
+        write_config(path, 'INFO')
+        app_logger = logging.getLogger('test')
+        later = logging.getLogger('test_reload.created_later')
+        attached, standalone = list_handler(), list_handler()
+        try:
+            main.reload_log_config(str(path))
+            app_logger.addHandler(attached)
+            path.write_text(path.read_text().replace('disable_existing_loggers: false', 'disable_existing_loggers: true'))
+            main.reload_log_config(str(path))
+
+            assert attached in app_logger.handlers
+            assert not later.disabled
+            assert any(ref() is attached for ref in logging._handlerList)
+            assert any(ref() is standalone for ref in logging._handlerList)
+            app_logger.info('after reload')
+            assert [r.getMessage() for r in attached.records] == ['after reload']
+        finally:
+            app_logger.handlers = []
+
+    def test_watch_config_in_main(self, tmp_path):
+        """Test that --watch-config reloads the config changed during the run."""
+        path = tmp_path / 'log-config.yaml'
+        write_config(path, 'INFO')
+        levels = []
+
+        def application_pipeline(properties):
+            write_config(path, 'DEBUG')
+            bump_mtime(path)
+            wait_for(lambda: logging.getLogger('test').level == logging.DEBUG)
+            levels.append(logging.getLogger('test').level)
+            return None
+
+        with patch.dict(os.environ, {'LOG_CONFIG_PATH': str(path)}), patch('main.Pythena') as mock_pythena, patch(
+            'main.application_pipeline', application_pipeline
+        ):
+            mock_pythena.return_value.get_properties.return_value = {'property': {'name': 'value'}}
+            runner = click.testing.CliRunner()
+            result = runner.invoke(main.main, ['--team', 'acad', '--watch-config'])
+
+        assert result.exit_code == 0
+        assert levels == [logging.DEBUG]
@@ -0,0 +1,235 @@
+import os
+import threading
+import time
+from unittest.mock import patch
+
+import click.testing
+import pytest
+
+import main
+import property_cache
+import resilient_fetch
+from resilient_fetch import CircuitBreaker, CircuitOpenError, FetchError, FetchTimeout, ResilientFetcher
+
+KEY = ('test', 'dev', 'acad', 'acad,dev')
+PAYLOAD = {'property': {'name': 'value'}}
+
+
+class FakeAthena:
+    """
+    Local stand-in for Athena that injects latency and errors.
+
+    Each get_properties() call takes the next step of the script:
+    ('ok', payload), ('delay', seconds, payload), ('error', exception) or ('hang',),
+    which blocks until release(). The last step repeats once the script is used up.
+    Instances are callable like the Pythena class, so the fake can be patched in as
+    main.Pythena.
+    """
+
+    def __init__(self, *script):
+        self.script = list(script)
+        self.calls = 0
+        self.released = threading.Event()
+        self._lock = threading.Lock()
+
+    def __call__(self, *args):
+        return self
+
+    def get_properties(self):
+        with self._lock:
+            step = self.script[min(self.calls, len(self.script) - 1)]
+            self.calls += 1
+        kind = step[0]
+        if kind == 'delay':
+            time.sleep(step[1])
+            return step[2]
+        if kind == 'error':
+            raise step[1]
+        if kind == 'hang':
+            self.released.wait()
+            return None
+        return step[1]
+
+    def release(self):
+        self.released.set()
+
+
+@pytest.fixture
+def fetcher():
+    return ResilientFetcher(attempt_timeout=0.3, total_timeout=2, retries=2, backoff_initial=0.01, backoff_max=0.02)
+
+
+@pytest.fixture
+def athena():
+    fakes = []
+
+    def make(*script):
+        fake = FakeAthena(*script)
+        fakes.append(fake)
+        return fake
+
+    yield make
+    for fake in fakes:
+        fake.release()
+
+
+class TestRetriesAndDeadlines:
+    """Test retrying failed and slow attempts within the deadlines."""
+
+    def test_error_retried(self, fetcher, athena):
+        """Test that a failed attempt is retried after a jittered backoff."""
+        fake = athena(('error', ConnectionError('reset by peer')), ('ok', PAYLOAD))
+        assert fetcher.fetch(KEY, fake.get_properties) == PAYLOAD
+        assert fake.calls == 2
+        assert fetcher.stats['retries'] == 1
+
+    def test_hung_attempt_abandoned(self, fetcher, athena):
+        """Test that an attempt past attempt_timeout is left behind and retried."""
+        fake = athena(('hang',), ('ok', PAYLOAD))
+        start = time.monotonic()
+        assert fetcher.fetch(KEY, fake.get_properties) == PAYLOAD
+        assert time.monotonic() - start < 1
+        assert fetcher.stats['timeouts'] == 1
+
+    def test_total_deadline(self, athena):
+        """Test that a fetch gives up at total_timeout whatever the retries left."""
+        fetcher = ResilientFetcher(attempt_timeout=0.2, total_timeout=0.5, retries=10, backoff_initial=0.01)
+        fake = athena(('hang',))
+        start = time.monotonic()
+        with pytest.raises(FetchTimeout):
+            fetcher.fetch(KEY, fake.get_properties)
+        assert time.monotonic() - start < 1
+
+    def test_errors_exhaust_retries(self, fetcher, athena):
+        """Test that the last error is chained once every attempt failed."""
+        fake = athena(('error', ConnectionError('unreachable')))
+        with pytest.raises(FetchError) as excinfo:
+            fetcher.fetch(KEY, fake.get_properties)
+        assert isinstance(excinfo.value.__cause__, ConnectionError)
+        assert fake.calls == 3
+
+    def test_none_is_an_answer(self, fetcher, athena):
+        """Test that a None payload (bad credentials) is returned, not retried."""
+        fake = athena(('ok', None))
+        assert fetcher.fetch(KEY, fake.get_properties) is None
+        assert fake.calls == 1
+
+
+class TestHedging:
+    """Test the hedged second request."""
+
+    def test_slow_attempt_hedged(self, fetcher, athena):
+        """Test that an attempt slower than the usual latency races a second one."""
+        for _ in range(resilient_fetch.HEDGE_MIN_SAMPLES):
+            fetcher.breaker(KEY).record_success(0.02)
+        fake = athena(('delay', 0.25, {'from': 'slow'}), ('ok', {'from': 'hedge'}))
+
+        start = time.monotonic()
+        assert fetcher.fetch(KEY, fake.get_properties) == {'from': 'hedge'}
+        assert time.monotonic() - start < 0.2
+        assert (fetcher.stats['hedges'], fetcher.stats['hedge_wins']) == (1, 1)
+        # The caller waited for the hedge delay too, not only for the hedge
+        assert fetcher.breaker(KEY).latencies[-1] >= 0.02
+
+    def test_stats_counted_across_threads(self, athena):
+        """Test that fetches running on several threads count every attempt."""
+        fetcher = ResilientFetcher(hedge_percentile=0)
+        fake = athena(('ok', PAYLOAD))
+        threads = [
+            threading.Thread(target=lambda: [fetcher.fetch(KEY, fake.get_properties) for _ in range(50)])
+            for _ in range(8)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        assert (fetcher.stats['fetches'], fetcher.stats['attempts']) == (400, 400)
+
+    def test_no_hedging_without_history(self, fetcher, athena):
+        """Test that nothing is hedged before there is a latency percentile."""
+        fake = athena(('delay', 0.05, PAYLOAD))
+        assert fetcher.fetch(KEY, fake.get_properties) == PAYLOAD
+        assert fetcher.stats['hedges'] == 0
+
+
+class TestCircuitBreaker:
+    """Test failing fast while Athena is degraded."""
+
+    def test_opens_then_half_opens(self, athena):
+        """Test that the breaker opens after the threshold and lets one trial through later."""
+        fetcher = ResilientFetcher(retries=0, failure_threshold=2, reset_timeout=60)
+        failing = athena(('error', ConnectionError('down')))
+        for _ in range(2):
+            with pytest.raises(FetchError):
+                fetcher.fetch(KEY, failing.get_properties)
+
+        with pytest.raises(CircuitOpenError):
+            fetcher.fetch(KEY, failing.get_properties)
+        assert failing.calls == 2
+
+        healthy = athena(('ok', PAYLOAD))
+        later = time.time() + 61
+        with patch('resilient_fetch.time.time', return_value=later):
+            assert fetcher.fetch(KEY, healthy.get_properties) == PAYLOAD
+        assert fetcher.breaker(KEY).state == resilient_fetch.CLOSED
+
+    def test_failed_trial_reopens(self):
+        """Test that a failed half-open trial opens the breaker again at once."""
+        breaker = CircuitBreaker(failure_threshold=1, reset_timeout=60)
+        breaker.record_failure()
+        with patch('resilient_fetch.time.time', return_value=time.time() + 61):
+            assert breaker.allow()
+            assert breaker.state == resilient_fetch.HALF_OPEN
+            breaker.record_failure()
+            assert breaker.state == resilient_fetch.OPEN
+            assert not breaker.allow()
+
+    def test_state_persisted_across_runs(self, tmp_path, athena):
+        """Test that the next run sees the breaker opened by this one."""
+        fake = athena(('error', ConnectionError('down')))
+        first = ResilientFetcher(retries=0, failure_threshold=1, breaker_dir=str(tmp_path))
+        with pytest.raises(FetchError):
+            first.fetch(KEY, fake.get_properties)
+
+        second = ResilientFetcher(retries=0, failure_threshold=1, breaker_dir=str(tmp_path))
+        with pytest.raises(CircuitOpenError):
+            second.fetch(KEY, fake.get_properties)
+        assert fake.calls == 1
+
+    def test_unreadable_state_starts_closed(self, tmp_path):
+        """Test that a corrupt state file does not block fetching."""
+        path = tmp_path / 'breaker.json'
+        path.write_text('{not json')
+        assert CircuitBreaker(str(path)).allow()
+
+
+class TestFetchInMain:
+    """Test the resilient fetch in main's property path."""
+
+    def test_transient_error_retried(self, athena):
+        """Test that a run survives one failed Athena call."""
+        fake = athena(('error', ConnectionError('reset by peer')), ('ok', PAYLOAD))
+        with patch('main.Pythena', fake):
+            runner = click.testing.CliRunner()
+            result = runner.invoke(main.main, ['--team', 'acad'])
+
+        assert result.exit_code == 0
+        assert fake.calls == 2
+
+    def test_open_breaker_falls_back_to_cached_snapshot(self, tmp_path, athena):
+        """Test that a stale cache entry is served at once while the breaker is open."""
+        fake = athena(('hang',))
+        env = {'ATHENA_SECRET': 'secret', 'ATHENA_CACHE_DIR': str(tmp_path / 'cache')}
+        with patch.dict(os.environ, env):
+            cache = property_cache.open_property_cache()
+        cache.ttl = 0
+        cache.store(KEY, {'a': 'last known good'})
+        fetcher = ResilientFetcher(failure_threshold=1)
+        fetcher.breaker(KEY).record_failure()
+
+        start = time.monotonic()
+        with patch('main._property_cache', cache), patch('main._athena_fetcher', fetcher):
+            assert main.fetch_properties(fake, KEY, False) == {'a': 'last known good'}
+        assert time.monotonic() - start < 1
+        assert fake.calls == 0
+        assert cache.stats['stale_fallbacks'] == 1
@@ -0,0 +1,205 @@
+import datetime
+import decimal
+import os
+import pickle
+
+import pytest
+
+import shared_properties
+import workers
+from property_store import PropertyStore
+from reload import LiveProperties
+from shared_properties import SharedPropertySnapshot, SharedPropertyView, encode_snapshot, read_version
+
+PROPERTIES = {
+    'property.name': 'value',
+    'database.url': 'jdbc:postgresql://db/acad',
+    'database.pool.size': '8',
+    'batch.size': 500,
+    'feature.enabled': True,
+    'retry.backoff': '250ms',
+    'tables': ['person', 'course'],
+    'empty': None,
+    'résumé.título': 'ünïcode',
+}
+
+
+@pytest.fixture
+def app_records(capture_records):
+    return capture_records('test')
+
+
+# Work functions run in spawned worker processes, so they live at module level
+
+
+def describe_properties(unit, properties):
+    return type(properties).__name__, getattr(properties, 'version', None), properties.get_int('batch.size')
+
+
+@pytest.fixture
+def shared(tmp_path):
+    snapshot = SharedPropertySnapshot(str(tmp_path / 'properties.snap'))
+    yield snapshot
+    snapshot.close()
+
+
+class TestSharedPropertyView:
+    """Test reading properties from the mapped snapshot layout."""
+
+    def test_same_as_property_store(self, shared):
+        """Test that lookups, iteration order and typed accessors match a PropertyStore."""
+        store = PropertyStore(PROPERTIES)
+        shared.publish(store)
+        view = shared.view()
+
+        assert dict(view) == dict(store)
+        assert list(view) == list(store)
+        assert len(view) == len(store)
+        assert view.get_int('batch.size') == 500
+        assert view.get_bool('feature.enabled') is True
+        assert view.get_duration('retry.backoff') == 0.25
+        assert view.get_list('tables') == ['person', 'course']
+        assert view['résumé.título'] == 'ünïcode'
+        assert 'empty' in view and view['empty'] is None
+
+    def test_missing_keys(self, shared):
+        """Test that missing and non-string keys are not found."""
+        shared.publish(PROPERTIES)
+        view = shared.view()
+        assert 'database' not in view
+        assert 42 not in view
+        assert view.get('nope', 'default') == 'default'
+        with pytest.raises(KeyError):
+            view.get_str('nope')
+
+    def test_prefix_queries(self, shared):
+        """Test the prefix and namespace queries over the mapped key table."""
+        shared.publish(PROPERTIES)
+        view = shared.view()
+        assert view.keys_with_prefix('database.') == ['database.pool.size', 'database.url']
+        assert view.with_prefix('batch') == {'batch.size': 500}
+        assert dict(view.namespace('database')) == {'pool.size': '8', 'url': 'jdbc:postgresql://db/acad'}
+
+    def test_empty_snapshot(self, shared):
+        """Test that a snapshot without properties can be read."""
+        shared.publish({})
+        view = shared.view()
+        assert len(view) == 0
+        assert view.keys_with_prefix('a') == []
+
+    def test_pickles_as_path(self, shared):
+        """Test that a pickled view carries the path, not the properties."""
+        shared.publish({'big': 'x' * 10_000})
+        data = pickle.dumps(shared.view())
+        assert len(data) < 1000
+        assert pickle.loads(data)['big'] == 'x' * 10_000
+
+    def test_not_a_snapshot(self, tmp_path):
+        """Test that other files are rejected."""
+        path = tmp_path / 'other.snap'
+        path.write_bytes(b'not a property snapshot, just some bytes')
+        with pytest.raises(ValueError, match='Not a property snapshot'):
+            SharedPropertyView(str(path))
+        with pytest.raises(ValueError, match='Not a property snapshot'):
+            read_version(str(path))
+
+
+class TestVersions:
+    """Test publishing newer snapshots."""
+
+    def test_readers_see_newer_version(self, shared):
+        """Test that a view keeps its version and detects a newer one."""
+        assert shared.publish({'a': '1'}) == 1
+        view = shared.view()
+        assert not view.is_stale()
+        assert view.latest() is view
+
+        assert shared.publish({'a': '2'}) == 2
+        assert view.is_stale()
+        assert view['a'] == '1'
+        latest = view.latest()
+        assert (latest.version, latest['a']) == (2, '2')
+
+    def test_versions_continue_from_existing_file(self, tmp_path):
+        """Test that a new publisher on the same path keeps the version stamp increasing."""
+        path = str(tmp_path / 'properties.snap')
+        SharedPropertySnapshot(path).publish({'a': '1'})
+        assert SharedPropertySnapshot(path).publish({'a': '2'}) == 2
+
+    def test_close_removes_own_file_only(self, tmp_path, shared):
+        """Test that close() removes a created file and views stay readable."""
+        created = SharedPropertySnapshot()
+        created.publish({'a': '1'})
+        view = created.view()
+        created.close()
+        assert not os.path.exists(created.path)
+        assert view['a'] == '1'
+        assert not view.is_stale()
+
+        shared.publish({'a': '1'})
+        shared.close()
+        assert os.path.exists(shared.path)
+
+    def test_live_properties_published(self, shared):
+        """Test that a LiveProperties listener publishes every refreshed snapshot."""
+        live = LiveProperties(PropertyStore({'a': '1'}), lambda: PropertyStore({'a': '2'}), 60)
+        shared.publish(live)
+        view = shared.view()
+        live.add_listener(shared.publish)
+
+        assert live.refresh()
+        assert view.latest()['a'] == '2'
+
+    def test_worker_switches_to_latest(self, shared, monkeypatch):
+        """Test that a worker picks up a newer snapshot before its next unit."""
+        shared.publish({'a': '1'})
+        monkeypatch.setattr(workers, '_worker_properties', shared.view())
+        shared.publish({'a': '2'})
+        old = workers._worker_properties
+        assert workers._latest_worker_properties()['a'] == '2'
+        assert workers.worker_properties().version == 2
+        # The replaced view's mapping is released
+        assert old._mmap.closed
+
+
+    def test_unserializable_value_rejected(self, shared):
+        """Test that values JSON cannot hold are refused instead of turned into strings."""
+        with pytest.raises(TypeError):
+            shared.publish({'start': datetime.date(2024, 1, 31), 'limit': decimal.Decimal('1.5')})
+        assert shared.version == 0
+
+
+class TestWorkerHandoff:
+    """Test handing the shared snapshot to worker processes."""
+
+    def test_workers_map_the_snapshot(self, monkeypatch, tmp_path):
+        """Test that workers receive a view of the snapshot, which is removed after the run."""
+        monkeypatch.setattr(shared_properties, 'SHM_DIR', str(tmp_path))
+        results = workers.run_partitioned(describe_properties, range(4), PropertyStore(PROPERTIES), workers=2)
+
+        assert results == [('SharedPropertyView', 1, 500)] * 4
+        assert os.listdir(tmp_path) == []
+
+    def test_unserializable_properties_pickled(self, app_records):
+        """Test that properties a snapshot cannot hold are pickled to the workers as before."""
+        properties = PropertyStore({'batch.size': '5', 'start': datetime.date(2024, 1, 31)})
+        results = workers.run_partitioned(describe_properties, range(2), properties, workers=2)
+        assert [name for name, _, _ in results] == ['PropertyStore'] * 2
+        assert any('not shared with the workers' in r.getMessage() for r in app_records)
+
+    def test_sharing_can_be_turned_off(self):
+        """Test that share_properties=False pickles the store as before."""
+        results = workers.run_partitioned(
+            describe_properties, range(2), PropertyStore({'batch.size': '5'}), workers=2, share_properties=False
+        )
+        assert [name for name, _, _ in results] == ['PropertyStore'] * 2
+
+
+class TestEncoding:
+    """Test the binary layout."""
+
+    def test_header(self):
+        """Test the magic, version stamp and count in the header."""
+        data = encode_snapshot({'b': 1, 'a': 2}, 7, published_at=1.5)
+        assert data.startswith(shared_properties.MAGIC)
+        assert shared_properties._HEADER.unpack_from(data, 0)[1:] == (7, 1.5, 2)
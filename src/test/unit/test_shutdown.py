@@ -0,0 +1,159 @@
+import logging
+import logging.handlers
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from unittest.mock import MagicMock, patch
+
+import click.testing
+
+import gelf_spool
+import main
+import shutdown
+
+SRC_PYTHON = os.path.dirname(shutdown.__file__)
+
+class _SlowHandler(logging.Handler):
+    """Handler whose flush takes `delay` seconds (or blocks until released)."""
+
+    def __init__(self, delay=0.0, release=None):
+        super().__init__()
+        self.delay = delay
+        self.release = release
+        self.closed = 0
+
+    def emit(self, record):
+        pass
+
+    def flush(self):
+        if self.release is not None:
+            self.release.wait()
+        time.sleep(self.delay)
+
+    def close(self):
+        self.closed += 1
+        super().close()
+
+
+class TestShutdownHandlers:
+    """Test the deadline-bounded handler shutdown."""
+
+    def test_unique_handlers(self):
+        """Test that a handler shared by two loggers is returned once."""
+        shared, own = logging.NullHandler(), logging.NullHandler()
+        first, second = MagicMock(handlers=[shared]), MagicMock(handlers=[own, shared])
+        assert shutdown.unique_handlers(first, second) == [shared, own]
+
+    def test_handlers_closed_concurrently(self):
+        """Test that slow handlers are flushed in parallel, not one after another."""
+        handlers = [_SlowHandler(delay=0.3) for _ in range(4)]
+        start = time.perf_counter()
+        results = shutdown.shutdown_handlers(handlers, timeout=5)
+        elapsed = time.perf_counter() - start
+
+        assert elapsed < 0.9
+        assert all(result.ok for result in results)
+        assert all(handler.closed == 1 for handler in handlers)
+
+    def test_hung_handler_times_out_with_pending_records(self):
+        """Test that a hung sink is reported with its pending records and does not block."""
+        release = threading.Event()
+        hung = _SlowHandler(release=release)
+        hung.pending_records = lambda: 7
+        hung.set_name('gelf')
+        try:
+            start = time.perf_counter()
+            results = shutdown.shutdown_handlers([hung, logging.NullHandler()], timeout=0.2)
+            assert time.perf_counter() - start < 1
+        finally:
+            release.set()
+
+        assert results[0].status == 'timed out'
+        assert results[0].pending == 7
+        assert 'gelf (_SlowHandler): timed out' in results[0].describe()
+        assert results[1].ok
+
+    def test_hung_handler_abandoned(self):
+        """Test that a timed-out handler is detached from its loggers and logging's shutdown list."""
+        release = threading.Event()
+        hung = _SlowHandler(release=release)
+        logger = logging.getLogger('test.shutdown.hung')
+        logger.addHandler(hung)
+        try:
+            shutdown.shutdown_handlers([hung], timeout=0.1)
+        finally:
+            release.set()
+            logger.removeHandler(hung)
+
+        assert hung not in logger.handlers
+        assert all(ref() is not hung for ref in logging._handlerList)
+
+    def test_interpreter_exits_after_timeout(self):
+        """Test that the atexit logging.shutdown() does not hang on a timed-out sink."""
+        code = (
+            'import logging, threading, shutdown\n'
+            'class Hung(logging.Handler):\n'
+            '    def emit(self, record): pass\n'
+            '    def flush(self): threading.Event().wait()\n'
+            'logging.getLogger("test").addHandler(Hung())\n'
+            'results = shutdown.shutdown_handlers(logging.getLogger("test").handlers, timeout=0.2)\n'
+            'print(results[0].status)\n'
+        )
+        result = subprocess.run(
+            [sys.executable, '-c', code],
+            env=dict(os.environ, PYTHONPATH=SRC_PYTHON),
+            capture_output=True,
+            text=True,
+            timeout=10,
+        )
+        assert result.returncode == 0
+        assert result.stdout.strip() == 'timed out'
+
+    def test_failing_handler_reported(self):
+        """Test that a handler raising on close is reported as failed."""
+        handler = logging.NullHandler()
+        handler.close = MagicMock(side_effect=OSError('broken pipe'))
+        result = shutdown.shutdown_handlers([handler], timeout=1)[0]
+        assert result.status == 'failed'
+        assert 'broken pipe' in result.error
+
+    def test_memory_handler_pending_records(self):
+        """Test that buffered MemoryHandler records are counted as pending."""
+        handler = logging.handlers.MemoryHandler(capacity=100)
+        handler.buffer = [MagicMock(), MagicMock()]
+        assert shutdown.pending_records(handler) == 2
+
+    def test_spool_pending_frames(self):
+        """Test that frames left in the GELF spool are counted."""
+        with tempfile.TemporaryDirectory() as path:
+            spool = gelf_spool.GelfSpool(path, segment_max_bytes=1024 * 1024)
+            for frame in (b'{"a":1}\x00', b'{"b":2}\x00', b'{"c":3}\x00'):
+                spool.append(frame)
+            spool.close()
+            assert spool.pending_frames() == 3
+
+
+class TestShutdownInMain:
+    """Test the shutdown reporting of the CLI."""
+
+    @patch('main.Pythena')
+    @patch('main.configure_logging')
+    def test_timed_out_sink_reported(self, mock_configure_logging, mock_pythena):
+        """Test that a sink still busy at the deadline is reported on stderr."""
+        mock_configure_logging.return_value = MagicMock()
+        mock_pythena.return_value.get_properties.return_value = {'test': 'value'}
+        release = threading.Event()
+        hung = _SlowHandler(release=release)
+
+        try:
+            with patch('logging.root.handlers', [hung]):
+                runner = click.testing.CliRunner()
+                result = runner.invoke(main.main, ['--team', 'acad', '--shutdown-timeout', '0.1'])
+        finally:
+            release.set()
+
+        assert result.exit_code == 0
+        assert 'Log shutdown: _SlowHandler: timed out' in result.output
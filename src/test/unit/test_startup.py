@@ -0,0 +1,110 @@
+import concurrent.futures
+import os
+import subprocess
+import sys
+import threading
+import time
+import types
+from unittest.mock import MagicMock, patch
+
+import click.testing
+
+import main
+import startup
+
+SRC_PYTHON = os.path.join(os.path.dirname(__file__), '..', '..', 'python')
+
+
+class TestStartupReport:
+    """Test the startup timing collector."""
+
+    def test_timed_import_records_new_modules(self):
+        """Test that a first import is recorded with its module count."""
+        report = startup.StartupReport()
+        sys.modules.pop('colorsys', None)
+
+        module = report.timed_import('colorsys')
+
+        assert module.__name__ == 'colorsys'
+        assert report.imports[0][0] == 'colorsys'
+        assert report.imports[0][2] >= 1
+
+    def test_already_imported_module_not_recorded(self):
+        """Test that modules already loaded are not reported again."""
+        report = startup.StartupReport()
+        report.timed_import('os')
+        assert report.imports == []
+
+    def test_concurrent_import_recorded_once(self):
+        """Test that threads importing the same module at once record it a single time."""
+        report = startup.StartupReport()
+
+        def slow_import(name):
+            time.sleep(0.05)
+            sys.modules[name] = types.ModuleType(name)
+            return sys.modules[name]
+
+        barrier = threading.Barrier(4)
+
+        def run():
+            barrier.wait()
+            return report.timed_import('test_startup_slow_module')
+
+        try:
+            with patch('startup.importlib.import_module', side_effect=slow_import):
+                with concurrent.futures.ThreadPoolExecutor(4) as pool:
+                    modules = [f.result() for f in [pool.submit(run) for _ in range(4)]]
+        finally:
+            sys.modules.pop('test_startup_slow_module', None)
+
+        assert len({id(module) for module in modules}) == 1
+        assert [name for name, _, _ in report.imports] == ['test_startup_slow_module']
+
+    def test_render_includes_imports_and_phases(self):
+        """Test that the rendered report lists imports, phases and totals."""
+        report = startup.StartupReport()
+        report.record_import('yaml', 0.012, 20)
+        report.mark('configure logging')
+
+        rendered = report.render()
+        assert 'yaml' in rendered
+        assert 'configure logging' in rendered
+        assert 'total' in rendered
+
+
+class TestLazyImports:
+    """Test that heavy dependencies stay out of the --help path."""
+
+    def test_help_does_not_import_heavy_dependencies(self):
+        """Test that importing main and running --help skips yaml, logging.config and Pythena."""
+        code = (
+            'import sys, main\n'
+            'try:\n'
+            '    main.main(["--help"])\n'
+            'except SystemExit:\n'
+            '    pass\n'
+            'heavy = [m for m in ("yaml", "logging.config", "pygelf", "vuit") if m in sys.modules]\n'
+            'print("HEAVY=" + ",".join(heavy))\n'
+        )
+        result = subprocess.run(
+            [sys.executable, '-c', code],
+            env=dict(os.environ, PYTHONPATH=SRC_PYTHON),
+            capture_output=True,
+            text=True,
+            check=True,
+        )
+        assert 'HEAVY=\n' in result.stdout
+
+    @patch('main.Pythena')
+    def test_startup_report_flag(self, mock_pythena):
+        """Test that --startup-report prints the phase timings."""
+        mock_pythena_instance = MagicMock()
+        mock_pythena_instance.get_properties.return_value = {'test': 'value'}
+        mock_pythena.return_value = mock_pythena_instance
+
+        runner = click.testing.CliRunner()
+        result = runner.invoke(main.main, ['--team', 'acad', '--startup-report'])
+
+        assert result.exit_code == 0
+        assert 'Startup report' in result.output
+        assert 'athena fetch' in result.output
@@ -0,0 +1,115 @@
+import asyncio
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+import structured_log
+
+
+@pytest.fixture
+def capture(capture_records):
+    return structured_log.get_logger('test.structured'), capture_records('test.structured')
+
+
+class _CountingArg:
+    """Counts how often it is turned into a string."""
+
+    def __init__(self):
+        self.calls = 0
+
+    def __str__(self):
+        self.calls += 1
+        return 'value'
+
+
+class TestStructuredLogger:
+    """Test the structured logging facade."""
+
+    def test_fields_and_context_become_record_attributes(self, capture):
+        """Test that bound context and keyword fields end up on the record."""
+        logger, records = capture
+        with structured_log.bound(env='dev', team='acad'):
+            logger.info('Loaded %d rows', 3, table='person')
+
+        record = records[0]
+        assert record.getMessage() == 'Loaded 3 rows'
+        assert (record.env, record.team, record.table) == ('dev', 'acad', 'person')
+
+    def test_formatting_is_lazy(self, capture):
+        """Test that arguments are not formatted when the level is disabled."""
+        logger, records = capture
+        arg = _CountingArg()
+
+        logger.debug('Debug %s', arg)
+        assert arg.calls == 0
+        assert records == []
+
+        logger.info('Info %s', arg)
+        assert records[0].getMessage() == 'Info value'
+        assert arg.calls >= 1
+
+    def test_caller_location_is_reported(self, capture):
+        """Test that filename and lineno point at the caller, not the facade."""
+        logger, records = capture
+        logger.info('where am I')
+        assert records[0].filename == 'test_structured_log.py'
+        assert records[0].funcName == 'test_caller_location_is_reported'
+
+    def test_reserved_field_names_are_renamed(self, capture):
+        """Test that a field clashing with a LogRecord attribute does not break logging."""
+        logger, records = capture
+        logger.info('clash', name='person', msg='hello')
+        assert records[0].name == 'test.structured'
+        assert (records[0].name_, records[0].msg_) == ('person', 'hello')
+
+    def test_exception_includes_traceback(self, capture):
+        """Test that exception() logs at ERROR with exc_info."""
+        logger, records = capture
+        try:
+            raise ValueError('boom')
+        except ValueError as e:
+            logger.exception('Failed: %s', e)
+        assert records[0].levelno == logging.ERROR
+        assert records[0].exc_info[0] is ValueError
+
+
+class TestContextPropagation:
+    """Test that bound context follows threads and tasks."""
+
+    def test_bound_is_restored(self):
+        """Test that bound() restores the previous context on exit."""
+        with structured_log.bound(run_id='r1'):
+            with structured_log.bound(team='acad'):
+                assert structured_log.get_context() == {'run_id': 'r1', 'team': 'acad'}
+            assert structured_log.get_context() == {'run_id': 'r1'}
+        assert structured_log.get_context() == {}
+
+    def test_submit_with_context(self):
+        """Test that the caller's context is visible in a pool thread."""
+        with ThreadPoolExecutor(max_workers=1) as pool:
+            with structured_log.bound(run_id='r1'):
+                future = structured_log.submit_with_context(pool, structured_log.get_context)
+            assert future.result() == {'run_id': 'r1'}
+            assert pool.submit(structured_log.get_context).result() == {}
+
+    def test_asyncio_tasks_inherit_context(self):
+        """Test that asyncio tasks see the context bound when they were created."""
+        async def child():
+            await asyncio.sleep(0)
+            return structured_log.get_context()
+
+        async def run():
+            with structured_log.bound(team='ident'):
+                task = asyncio.create_task(child())
+            # The task runs after the with block, in the context copied at creation
+            return await task
+
+        assert asyncio.run(run()) == {'team': 'ident'}
+
+    def test_run_id_from_environment(self, monkeypatch):
+        """Test that RUN_ID overrides the generated run id."""
+        monkeypatch.setenv('RUN_ID', 'automic-42')
+        assert structured_log.new_run_id() == 'automic-42'
+        monkeypatch.delenv('RUN_ID')
+        assert len(structured_log.new_run_id()) == 12
@@ -0,0 +1,106 @@
+import threading
+from unittest.mock import MagicMock, patch
+
+import click.testing
+
+import main
+import structured_log
+import tenants
+
+
+class TestTenantHelpers:
+    """Test tenant expansion, execution and summaries."""
+
+    def test_expand_tenants(self):
+        """Test that every team/env combination is produced once."""
+        result = tenants.expand_tenants(['acad', 'ident', 'acad'], ['dev', 'uat'])
+        assert result == [('dev', 'acad'), ('uat', 'acad'), ('dev', 'ident'), ('uat', 'ident')]
+
+    def test_run_tenants_runs_concurrently(self):
+        """Test that tenants run in parallel up to max_workers."""
+        barrier = threading.Barrier(3, timeout=5)
+
+        def run(env, team):
+            barrier.wait()
+            return 0
+
+        results = tenants.run_tenants([('dev', 'acad'), ('dev', 'admsol'), ('dev', 'ident')], run, max_workers=3)
+        assert [r.team for r in results] == ['acad', 'admsol', 'ident']
+        assert all(r.ok for r in results)
+
+    def test_exception_counts_as_failure(self):
+        """Test that an exception in one tenant does not stop the others."""
+        def run(env, team):
+            if team == 'admsol':
+                raise RuntimeError('boom')
+            return 0
+
+        results = tenants.run_tenants([('dev', 'acad'), ('dev', 'admsol')], run)
+        assert [r.exit_code for r in results] == [0, 1]
+        assert 'boom' in results[1].error
+
+    def test_summarize_aggregates_exit_code(self):
+        """Test that the aggregated exit code is non-zero when any tenant failed."""
+        results = [tenants.TenantResult('dev', 'acad', 0, 0.1), tenants.TenantResult('dev', 'ident', 1, 0.2)]
+        exit_code, lines = tenants.summarize(results)
+        assert exit_code == 1
+        assert '1 succeeded, 1 failed' in lines[0]
+        assert any('ident/dev: FAILED' in line for line in lines)
+
+
+class TestMultiTenantMain:
+    """Test the multi-tenant options of main."""
+
+    @patch('main.Pythena')
+    def test_all_teams(self, mock_pythena):
+        """Test that --all-teams runs every team with its own profile."""
+        mock_pythena_instance = MagicMock()
+        mock_pythena_instance.get_properties.return_value = {'test': 'value'}
+        mock_pythena.return_value = mock_pythena_instance
+
+        runner = click.testing.CliRunner()
+        result = runner.invoke(main.main, ['--all-teams', '--env', 'uat'])
+
+        assert result.exit_code == 0
+        profiles = sorted(call.args[3] for call in mock_pythena.call_args_list)
+        assert profiles == ['acad,uat', 'admsol,uat', 'ident,uat']
+
+    @patch('main.Pythena')
+    def test_multiple_teams_and_envs_with_one_failure(self, mock_pythena):
+        """Test that one failing tenant makes the aggregated exit code 1."""
+        def make_pythena(app, env, team, profiles):
+            instance = MagicMock()
+            instance.get_properties.return_value = None if team == 'ident' else {'test': 'value'}
+            return instance
+
+        mock_pythena.side_effect = make_pythena
+
+        runner = click.testing.CliRunner()
+        result = runner.invoke(main.main, ['--team', 'acad', '--team', 'ident', '--env', 'dev', '--env', 'prd'])
+
+        assert result.exit_code == 1
+        assert mock_pythena.call_count == 4
+
+    @patch('main.Pythena')
+    @patch('main.configure_logging')
+    def test_each_tenant_gets_its_own_context(self, mock_configure_logging, mock_pythena):
+        """Test that each tenant logs with its own env/team context."""
+        mock_configure_logging.return_value = MagicMock()
+        mock_pythena.return_value.get_properties.return_value = {'test': 'value'}
+
+        contexts = []
+
+        def record_context(msg, *args, **kwargs):
+            if 'Starting test' in msg:
+                context = structured_log.get_context()
+                contexts.append((context['team'], context['env'], context['run_id']))
+
+        with patch('main.get_logger') as mock_get_logger:
+            mock_get_logger.return_value.info.side_effect = record_context
+            runner = click.testing.CliRunner()
+            result = runner.invoke(main.main, ['--team', 'acad', '--team', 'admsol'])
+
+        assert result.exit_code == 0
+        assert sorted(c[:2] for c in contexts) == [('acad', 'dev'), ('admsol', 'dev')]
+        # The run id bound by main follows each tenant into its pool thread
+        assert contexts[0][2] == contexts[1][2]
@@ -0,0 +1,139 @@
+import logging
+import pstats
+from unittest.mock import MagicMock, patch
+
+import click.testing
+import pytest
+
+import main
+import structured_log
+import tracing
+
+
+@pytest.fixture
+def capture_logger(capture_records):
+    return logging.getLogger('test.tracing'), capture_records('test.tracing')
+
+
+class TestTracer:
+    """Test spans and their summary."""
+
+    def test_span_records_duration_and_status(self):
+        """Test that a span is recorded with its status, also when it fails."""
+        tracer = tracing.Tracer()
+        with tracer.span('ok'):
+            pass
+        with pytest.raises(ValueError):
+            with tracer.span('failing'):
+                raise ValueError('boom')
+
+        assert [(span.name, span.status) for span in tracer.spans] == [('ok', 'ok'), ('failing', 'error')]
+        assert all(span.seconds >= 0 for span in tracer.spans)
+
+    def test_span_logged_with_adapter_context(self, capture_logger):
+        """Test that the span fields are merged with the LoggerAdapter context."""
+        logger, records = capture_logger
+        adapter = logging.LoggerAdapter(logger, {'env': 'dev', 'team': 'acad'})
+        tracer = tracing.Tracer()
+
+        with tracer.span('athena_fetch', adapter, rows=3):
+            pass
+
+        record = records[0]
+        assert record.span == 'athena_fetch'
+        assert record.span_status == 'ok'
+        assert record.span_ms >= 0
+        assert record.rows == 3
+        assert (record.env, record.team) == ('dev', 'acad')
+
+    def test_traced_decorator(self):
+        """Test that the decorator names the span after the function by default."""
+        tracer = tracing.Tracer()
+
+        @tracer.traced()
+        def load_rows():
+            return 42
+
+        assert load_rows() == 42
+        assert tracer.spans[0].name == 'load_rows'
+
+    def test_span_record_points_at_caller(self, capture_logger):
+        """Test that span and summary records carry the file and function that ran the phase."""
+        logger, records = capture_logger
+        tracer = tracing.Tracer()
+
+        @tracer.traced('load_rows', logger)
+        def load_rows():
+            return 42
+
+        with tracer.span('athena_fetch', logger):
+            pass
+        with tracer.span('adapter', logging.LoggerAdapter(logger, {})):
+            pass
+        with tracer.span('structured', structured_log.get_logger(logger)):
+            pass
+        load_rows()
+        tracer.log_summary(structured_log.get_logger(logger))
+
+        assert len(records) == 8
+        for record in records:
+            assert (record.filename, record.funcName) == ('test_tracing.py', 'test_span_record_points_at_caller')
+
+    def test_summary_aggregates_by_name(self, capture_logger):
+        """Test that the summary groups spans by name and logs one line per phase."""
+        logger, records = capture_logger
+        tracer = tracing.Tracer()
+        for _ in range(3):
+            with tracer.span('application'):
+                pass
+
+        name, count, total, longest, errors = tracer.summary()[0]
+        assert (name, count, errors) == ('application', 3, 0)
+        assert longest <= total
+
+        tracer.log_summary(logger)
+        assert records[0].span_count == 3
+        assert 'Phase application: 3x' in records[0].getMessage()
+
+
+class TestTracingInMain:
+    """Test the spans and --profile option of the CLI."""
+
+    @patch('main.Pythena')
+    @patch('main.configure_logging')
+    def test_phases_are_traced(self, mock_configure_logging, mock_pythena):
+        """Test that every phase of a run is recorded as a span."""
+        mock_configure_logging.return_value = MagicMock()
+        mock_pythena.return_value.get_properties.return_value = {'test': 'value'}
+
+        runner = click.testing.CliRunner()
+        result = runner.invoke(main.main, ['--team', 'acad'])
+
+        assert result.exit_code == 0
+        names = [span.name for span in tracing.tracer.spans]
+        for phase in ('configure_logging', 'athena_fetch', 'application', 'shutdown_drain', 'shutdown_close'):
+            assert phase in names
+
+    @patch('main.Pythena')
+    @patch('main.configure_logging')
+    def test_profile_writes_pstats_file(self, mock_configure_logging, mock_pythena, tmp_path):
+        """Test that --profile writes a loadable pstats file."""
+        mock_configure_logging.return_value = MagicMock()
+        mock_pythena.return_value.get_properties.return_value = {'test': 'value'}
+        output = tmp_path / 'run.pstats'
+
+        runner = click.testing.CliRunner()
+        result = runner.invoke(main.main, ['--team', 'acad', '--profile', '--profile-output', str(output)])
+
+        assert result.exit_code == 0
+        assert 'Profile written to' in result.output
+        assert pstats.Stats(str(output)).total_calls > 0
+
+    def test_profiler_not_started_on_usage_error(self, tmp_path):
+        """Test that --profile without a team fails before a profiler is started."""
+        with patch('tracing.start_profiler') as start_profiler:
+            result = click.testing.CliRunner().invoke(main.main, ['--profile', '--profile-output', str(tmp_path / 'run.pstats')])
+
+        assert result.exit_code == 2
+        assert "Missing option '--team'" in result.output
+        start_profiler.assert_not_called()
@@ -0,0 +1,95 @@
+import os
+from unittest.mock import MagicMock, patch
+
+import click.testing
+import pytest
+
+import main
+import structured_log
+import workers
+from property_store import PropertyStore
+
+# Work functions run in spawned worker processes, so they live at module level
+
+
+def square_with_factor(unit, properties):
+    structured_log.get_logger('test').info('Processing unit %d', unit, unit=unit)
+    return unit * unit * properties.get_int('factor')
+
+
+def report_pid(unit, properties):
+    return os.getpid(), workers.worker_properties() is not None
+
+
+def fail_on_three(unit, properties):
+    if unit == 3:
+        raise ValueError('bad unit 3')
+    return unit
+
+
+@pytest.fixture
+def app_records(capture_records):
+    return capture_records('test')
+
+
+class TestRunPartitioned:
+    """Test the process-pool fan-out helper."""
+
+    def test_units_run_in_worker_processes(self, app_records):
+        """Test that units run in worker processes that received the properties."""
+        properties = PropertyStore({'factor': '2'})
+        results = workers.run_partitioned(report_pid, range(6), properties, workers=2)
+
+        assert len(results) == 6
+        pids = {pid for pid, _ in results}
+        assert os.getpid() not in pids
+        assert all(has_properties for _, has_properties in results)
+
+    def test_worker_logs_reach_parent_with_context(self, app_records):
+        """Test that worker records are funneled to the parent's handlers with the bound context."""
+        properties = PropertyStore({'factor': '3'})
+        with structured_log.bound(env='dev', team='acad'):
+            results = workers.run_partitioned(square_with_factor, [1, 2, 3], properties, workers=2)
+
+        assert results == [3, 12, 27]
+        unit_records = [r for r in app_records if r.getMessage().startswith('Processing unit')]
+        assert sorted(r.unit for r in unit_records) == [1, 2, 3]
+        assert all((r.env, r.team) == ('dev', 'acad') for r in unit_records)
+        assert all(r.process != os.getpid() for r in unit_records)
+
+    def test_per_worker_stats_logged(self, app_records):
+        """Test that per-worker throughput and a total are logged."""
+        workers.run_partitioned(square_with_factor, [1, 2], PropertyStore({'factor': '1'}), workers=1)
+
+        messages = [r.getMessage() for r in app_records]
+        assert any(m.startswith(f'Worker {os.getpid()}: 2 units') for m in messages)
+        assert any(m.startswith('Processed 2 units on 1 workers') for m in messages)
+
+    def test_first_error_reraised_after_all_units(self, app_records):
+        """Test that a failing unit is re-raised once the other units are done."""
+        with pytest.raises(ValueError, match='bad unit 3'):
+            workers.run_partitioned(fail_on_three, range(5), PropertyStore(), workers=2)
+
+        stats = [r for r in app_records if r.getMessage().startswith('Processed')]
+        assert '5 units' in stats[0].getMessage()
+
+
+class TestWorkersInMain:
+    """Test the --workers option."""
+
+    @patch('main.Pythena')
+    @patch('main.configure_logging')
+    def test_application_units_fan_out(self, mock_configure_logging, mock_pythena):
+        """Test that application units are handed to run_partitioned with the properties."""
+        mock_configure_logging.return_value = MagicMock()
+        mock_pythena.return_value.get_properties.return_value = {'factor': '2'}
+
+        with patch('main.application_units', return_value=[1, 2]), \
+                patch('workers.run_partitioned') as mock_run:
+            runner = click.testing.CliRunner()
+            result = runner.invoke(main.main, ['--team', 'acad', '--workers', '3'])
+
+        assert result.exit_code == 0
+        fn, units, properties, worker_count, _ = mock_run.call_args.args
+        assert (fn, units, worker_count) == (main.process_unit, [1, 2], 3)
+        assert properties.get_int('factor') == 2